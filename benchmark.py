@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# benchmark.py
+"""End-to-end benchmarks for PromptForge against the offline mock model.
+
+    python benchmark.py                          # full matrix, writes benchmark_results.json
+    python benchmark.py --quick --output new.json --compare benchmark_results.json
+
+Every scenario reports p50/p95/p99 latency, throughput, traced allocations
+and the process peak RSS; per-stage span histograms for the whole run are
+included under "stages". Scenarios and keys are written in a fixed order so
+two result files can be diffed directly.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from core import PromptForgeCore, PromptLogger as CorePromptLogger
+from meta_chain import GENERATION_MODES
+from llm_cache import response_cache
+from llm_clients import configure_backend
+from metrics import metrics
+from prompt_log import PromptLogger as JsonPromptLogger
+from prompt_manager import PromptManager
+from request_scheduler import scheduler
+from usage import usage
+
+FULL_MATRIX = {
+    "script_tokens": [500, 5000, 30000],
+    "subject_counts": [0, 3, 10],
+    "concurrency": [1, 4, 16],
+    "batch_sizes": [10, 50],
+    "saved_prompts": [100, 1000, 10000],
+    "log_entries": [200, 1000]
+}
+
+QUICK_MATRIX = {
+    "script_tokens": [500, 5000],
+    "subject_counts": [0, 5],
+    "concurrency": [1, 8],
+    "batch_sizes": [10],
+    "saved_prompts": [100, 1000],
+    "log_entries": [100]
+}
+
+NAMES = ["JOHN", "JANE", "MARLOWE", "VERA", "OSCAR", "LENA", "HUGO", "IRIS", "FELIX", "NADIA", "CLARA", "VICTOR"]
+PLACES = ["DETECTIVE'S OFFICE", "RAIN-SOAKED ALLEY", "POLICE PRECINCT", "HOTEL LOBBY", "HARBOUR WAREHOUSE", "JAZZ CLUB"]
+ACTIONS = ["sits at the desk, staring at crime scene photos", "lights a cigarette and waits", "paces by the window",
+           "checks the revolver twice", "reads a crumpled letter", "slips out through the back door"]
+KEYWORDS = ["detective", "rain", "neon", "close-up", "window", "zzz-no-match"]
+
+def percentile(values: List[float], q: float) -> float:
+    # Nearest-rank percentile, so small samples report a value that was actually observed
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, int(-(-q * len(ordered) // 100)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def peak_rss_kb() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS reports bytes, Linux kilobytes
+
+def make_script(tokens: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    scenes = []
+    length = 0
+    while length < tokens * 4:
+        first, second = rng.sample(NAMES, 2)
+        scene = (
+            f"INT. {rng.choice(PLACES)} - NIGHT\n\n"
+            f"{first}, {rng.choice(ACTIONS)}. {second} {rng.choice(ACTIONS)}.\n\n"
+            f"{second}\nWe need to talk about what happened at the harbour.\n\n"
+            f"{first}\nNot here. Not tonight."
+        )
+        scenes.append(scene)
+        length += len(scene) + 2
+    return "\n\n".join(scenes)
+
+def make_subjects(count: int) -> List[Dict[str, Any]]:
+    return [
+        {"name": NAMES[i % len(NAMES)].title(), "category": "Main Character" if i < 2 else "Supporting Character",
+         "description": f"A character seen across the night, number {i}.", "active": True}
+        for i in range(count)
+    ]
+
+def make_saved_prompts(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [
+        {
+            "prompt": f"{rng.choice(KEYWORDS[:-1])} {rng.choice(ACTIONS)} in the {rng.choice(PLACES).lower()}",
+            "style_prefix": "Film noir", "style_suffix": "high contrast", "camera_move": "Dolly in",
+            "camera_shot": rng.choice(["Close-up", "Wide shot", "Medium shot"]),
+            "components": {"shot_description": rng.choice(ACTIONS), "directors_notes": rng.choice(KEYWORDS[:-1])}
+        }
+        for _ in range(count)
+    ]
+
+class Benchmark:
+    def __init__(self, iterations: int, alloc_iterations: int):
+        self.iterations = iterations
+        self.alloc_iterations = alloc_iterations
+        self.results: List[Dict[str, Any]] = []
+
+    async def measure(self, name: str, params: Dict[str, Any], operation: Callable[[int], Awaitable[Any]],
+                      iterations: Optional[int] = None, concurrency: int = 1, items_per_op: int = 1) -> Dict[str, Any]:
+        iterations = iterations or self.iterations
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies: List[float] = []
+        errors = 0
+
+        async def timed(index: int) -> None:
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await operation(index)
+                except Exception:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(timed(i) for i in range(iterations)))
+        wall = time.perf_counter() - wall_start
+
+        # Allocations are traced in a separate, shorter pass so tracing does not skew the latencies
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        for i in range(iterations, iterations + self.alloc_iterations):
+            try:
+                await operation(i)
+            except Exception:
+                pass
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        result = {
+            "name": name,
+            "params": params,
+            "iterations": iterations,
+            "concurrency": concurrency,
+            "errors": errors,
+            "latency_ms": {
+                "p50": round(percentile(latencies, 50), 3),
+                "p95": round(percentile(latencies, 95), 3),
+                "p99": round(percentile(latencies, 99), 3),
+                "mean": round(sum(latencies) / len(latencies), 3),
+                "max": round(max(latencies), 3)
+            },
+            "throughput_per_s": round(iterations * items_per_op / wall, 3),
+            "wall_s": round(wall, 3),
+            "alloc": {
+                "peak_bytes": peak - baseline,
+                "retained_bytes_per_op": (current - baseline) // max(1, self.alloc_iterations)
+            },
+            "peak_rss_kb": peak_rss_kb()
+        }
+        self.results.append(result)
+        print(f"{name:<22} {json.dumps(params, sort_keys=True):<60} "
+              f"p50={result['latency_ms']['p50']:>9.2f}ms p95={result['latency_ms']['p95']:>9.2f}ms "
+              f"{result['throughput_per_s']:>9.2f}/s", flush=True)
+        return result
+
+async def run_suite(matrix: Dict[str, List[int]], bench: Benchmark, workdir: str, mode: str = "per_length") -> None:
+    core = PromptForgeCore()
+    core.generation_mode = mode
+    response_cache.bypass = True  # Every call reaches the model so the cache cannot hide regressions
+
+    for script_tokens in matrix["script_tokens"]:
+        script = make_script(script_tokens)
+        for subject_count in matrix["subject_counts"]:
+            core.subjects = make_subjects(subject_count)
+            for concurrency in matrix["concurrency"]:
+                async def generate(i: int) -> None:
+                    await core.generate_prompt(
+                        style="Film noir", highlighted_text="", shot_description=f"Shot {i}: the detective waits",
+                        directors_notes="Slow push in", script=script, stick_to_script=True, end_parameters="--ar 16:9"
+                    )
+
+                await bench.measure("generate_prompt", {"script_tokens": script_tokens, "subjects": subject_count},
+                                    generate, concurrency=concurrency)
+
+    core.subjects = make_subjects(3)
+    script = make_script(matrix["script_tokens"][0])
+    for batch_size in matrix["batch_sizes"]:
+        for concurrency in matrix["concurrency"]:
+            async def batch(i: int) -> None:
+                shots = [{"shot_description": f"Batch {i} shot {n}", "script": script, "stick_to_script": True}
+                         for n in range(batch_size)]
+                async for _ in core.generate_prompts_batch(shots, max_concurrency=concurrency):
+                    pass
+
+            await bench.measure("generate_prompts_batch", {"shots": batch_size, "max_concurrency": concurrency},
+                                batch, iterations=max(2, bench.iterations // 5), items_per_op=batch_size)
+
+    for script_tokens in matrix["script_tokens"]:
+        for concurrency in matrix["concurrency"]:
+            base_script = make_script(script_tokens)
+
+            async def subjects(i: int) -> None:
+                await core.generate_subjects(f"{base_script}\n\n(Revision {i})")
+
+            await bench.measure("generate_subjects", {"script_tokens": script_tokens}, subjects, concurrency=concurrency)
+
+    for count in matrix["saved_prompts"]:
+        manager = PromptManager(os.path.join(workdir, f"saved_prompts_{count}.json"))
+        manager.saved_prompts = make_saved_prompts(count)
+
+        async def search(i: int) -> None:
+            manager.search_prompts(KEYWORDS[i % len(KEYWORDS)])
+
+        await bench.measure("search_prompts", {"saved_prompts": count}, search, iterations=bench.iterations * 5)
+
+    for entries in matrix["log_entries"]:
+        for label, logger_class in (("core", CorePromptLogger), ("prompt_log", JsonPromptLogger)):
+            logger = logger_class(os.path.join(workdir, f"{label}_log_{entries}.json"))
+            inputs = {"shot_description": "The detective waits", "style_prefix": "Film noir", "length": "normal"}
+
+            async def log(i: int) -> None:
+                logger.log_prompt({**inputs, "index": i}, f"Generated prompt number {i} " * 8)
+
+            async def read(i: int) -> None:
+                logger.get_logs()
+
+            await bench.measure("log_prompt", {"logger": label, "entries": entries}, log, iterations=entries)
+            await bench.measure("get_logs", {"logger": label, "entries": entries}, read, iterations=10)
+
+def compare(current: Dict[str, Any], baseline_file: str) -> None:
+    with open(baseline_file, "r") as f:
+        baseline = json.load(f)
+    previous = {(r["name"], json.dumps(r["params"], sort_keys=True), r["concurrency"]): r for r in baseline["scenarios"]}
+    print(f"\nChange against {baseline_file} (negative latency and positive throughput are better):")
+    for result in current["scenarios"]:
+        before = previous.get((result["name"], json.dumps(result["params"], sort_keys=True), result["concurrency"]))
+        if before is None:
+            continue
+        deltas = []
+        for key in ("p50", "p95", "p99"):
+            old, new = before["latency_ms"][key], result["latency_ms"][key]
+            deltas.append(f"{key} {((new - old) / old * 100) if old else 0:+6.1f}%")
+        old, new = before["throughput_per_s"], result["throughput_per_s"]
+        deltas.append(f"throughput {((new - old) / old * 100) if old else 0:+6.1f}%")
+        print(f"{result['name']:<22} {json.dumps(result['params'], sort_keys=True):<50} c={result['concurrency']:<3} "
+              + "  ".join(deltas))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark PromptForge against the offline mock model")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier results file to print changes against")
+    parser.add_argument("--quick", action="store_true", help="Smaller matrix for a fast check")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--alloc-iterations", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--latency-distribution", default="lognormal")
+    parser.add_argument("--tokens-per-second", type=float, default=2000.0)
+    parser.add_argument("--rate-limit-error-rate", type=float, default=0.0)
+    parser.add_argument("--server-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--generation-mode", choices=GENERATION_MODES, default="per_length")
+    parser.add_argument("--respect-rate-limits", action="store_true",
+                        help="Keep the configured rate limits instead of lifting them for the run")
+    args = parser.parse_args()
+
+    mock_settings = {
+        "latency_ms": args.latency_ms,
+        "latency_jitter_ms": args.latency_jitter_ms,
+        "latency_distribution": args.latency_distribution,
+        "tokens_per_second": args.tokens_per_second,
+        "rate_limit_error_rate": args.rate_limit_error_rate,
+        "server_error_rate": args.server_error_rate,
+        "retry_after": 0.1,
+        "seed": args.seed
+    }
+    configure_backend("mock", **mock_settings)
+    if not args.respect_rate_limits:
+        scheduler.configure(requests_per_minute=1_000_000, tokens_per_minute=1_000_000_000)
+    scheduler.base_delay = 0.05  # Injected failures should cost retries, not whole seconds
+
+    matrix = QUICK_MATRIX if args.quick else FULL_MATRIX
+    bench = Benchmark(args.iterations, args.alloc_iterations)
+    output = os.path.abspath(args.output)
+    started = time.perf_counter()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="promptforge-bench-") as workdir:
+        # PromptForgeCore writes its logs, caches and saved prompts relative to the working directory
+        os.chdir(workdir)
+        try:
+            asyncio.run(run_suite(matrix, bench, workdir, args.generation_mode))
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "matrix": "quick" if args.quick else "full",
+            "iterations": args.iterations,
+            "mock_settings": mock_settings,
+            "generation_mode": args.generation_mode,
+            "duration_s": round(time.perf_counter() - started, 3),
+            "scheduler": scheduler.stats()
+        },
+        "scenarios": bench.results,
+        "stages": metrics.to_dict(),
+        "usage": usage.summary(),
+        "peak_rss_kb": peak_rss_kb()
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(bench.results)} scenarios to {output}")
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -29,6 +29,28 @@ class Config:
             'prompt_editor_geometry': '800x600',
             'prompt_editor_sash': '400'
         }
+        self.config['RATE_LIMITS'] = {
+            'requests_per_minute': '500',
+            'tokens_per_minute': '200000'
+        }
+        self.config['LLM'] = {
+            'backend': 'openai'
+        }
+        self.config['MOCK_LLM'] = {
+            'latency_ms': '300',
+            'latency_jitter_ms': '100',
+            'latency_distribution': 'lognormal',
+            'tokens_per_second': '60',
+            'rate_limit_error_rate': '0.0',
+            'server_error_rate': '0.0',
+            'retry_after': '1.0',
+            'seed': '0'
+        }
+        self.config['LOG_ROTATION'] = {
+            'max_bytes': '16777216',
+            'max_age_days': '30',
+            'compression': 'gzip'
+        }
         self.save_config()
 
     def save_config(self):
@@ -86,3 +108,37 @@ def get_openai_api_key():
 
 def get_langsmith_api_key():
     return config.get_api_key('langsmith_api_key')
+
+def get_rate_limits():
+    return {
+        'requests_per_minute': config.config.getfloat('RATE_LIMITS', 'requests_per_minute', fallback=500),
+        'tokens_per_minute': config.config.getfloat('RATE_LIMITS', 'tokens_per_minute', fallback=200000)
+    }
+
+def get_llm_backend():
+    # PROMPTFORGE_LLM_BACKEND=mock runs everything against the offline mock model
+    return os.environ.get('PROMPTFORGE_LLM_BACKEND') or config.config.get('LLM', 'backend', fallback='openai')
+
+def get_mock_llm_settings():
+    section = 'MOCK_LLM'
+    return {
+        'latency_ms': config.config.getfloat(section, 'latency_ms', fallback=300),
+        'latency_jitter_ms': config.config.getfloat(section, 'latency_jitter_ms', fallback=100),
+        'latency_distribution': config.config.get(section, 'latency_distribution', fallback='lognormal'),
+        'tokens_per_second': config.config.getfloat(section, 'tokens_per_second', fallback=60),
+        'rate_limit_error_rate': config.config.getfloat(section, 'rate_limit_error_rate', fallback=0.0),
+        'server_error_rate': config.config.getfloat(section, 'server_error_rate', fallback=0.0),
+        'retry_after': config.config.getfloat(section, 'retry_after', fallback=1.0),
+        'seed': config.config.getint(section, 'seed', fallback=0)
+    }
+
+def get_log_rotation_settings():
+    # A limit of 0 turns that trigger off; compression is gzip or lzma
+    section = 'LOG_ROTATION'
+    max_bytes = config.config.getint(section, 'max_bytes', fallback=16 * 1024 * 1024)
+    max_age_days = config.config.getfloat(section, 'max_age_days', fallback=30)
+    return {
+        'max_bytes': max_bytes or None,
+        'max_age': max_age_days * 86400 or None,
+        'compression': config.config.get(section, 'compression', fallback='gzip')
+    }
@@ -1,30 +1,78 @@
 # core.py
 
 import asyncio
-from typing import List, Dict, Optional, Tuple, Any, Union
+from typing import AsyncIterator, Callable, Iterator, List, Dict, Optional, Sequence, Tuple, Any
 from langchain_openai import ChatOpenAI
 from langchain.chains import LLMChain
 from langchain_community.chat_models import ChatOpenAI as CommunityChatOpenAI
-from meta_chain import MetaChain
+from meta_chain import MetaChain, GENERATION_MODES, MODEL_NAME, PROMPT_LENGTHS
 import logging
-from langchain_core.prompts import PromptTemplate
 import json
 import os
-from openai import AsyncOpenAI
 import json
 from datetime import datetime
 from styles import StyleManager
 import random
-from collections import deque
+from collections import OrderedDict, deque
+import hashlib
 from typing import Dict, Any
 
 
-from config import get_openai_api_key
+from config import get_llm_backend, get_log_rotation_settings, get_mock_llm_settings, get_rate_limits
+from llm_clients import configure_backend, get_chat_model, registry as llm_registry
+from llm_cache import response_cache
+from template_registry import templates
+from request_scheduler import scheduler, estimate_tokens
+from single_flight import single_flight
+from script_context import ScriptContextSelector
+from scene_pipeline import ScenePipeline, parse_scene_analysis, parse_scene_list
+from metrics import metrics
+from usage import UsageScope, usage
+from log_writer import BufferedLogWriter
+from prompt_log import LogCursor, PromptLogger as JsonLinesPromptLogger
+import csv
+import io
 
-# Get the API key from the config
-openai_api_key = get_openai_api_key()
+STAGE_CACHE_SIZE = 256  # Script context selections and per-length model outputs kept for regeneration
 
-client = AsyncOpenAI(api_key=openai_api_key)
+def _fingerprint(stage: str, *parts: Any) -> str:
+    return hashlib.sha256(json.dumps([stage, *parts], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+SUBJECTS_TEMPLATE = """
+        Analyze the following script excerpt and perform these tasks:
+
+        Identify key subjects (characters, locations, objects) crucial to the scene.
+        For each subject, provide:
+
+        A clear, concise name
+        A category (Character, Location, or Object)
+        A detailed description (50-100 words) that includes:
+        - Physical attributes (appearance, size, color, etc.)
+        - Emotional or atmospheric qualities
+        - Relevance to the scene or story
+        - Any unique features or characteristics
+
+        Ensure descriptions are consistent with the script but expand beyond explicitly stated details.
+        Present the information in a structured format for each subject:
+        Name: [Subject Name]
+        Category: [Category]
+        Description: [Detailed description]
+
+        Script excerpt: {script_text}
+        """
+
+templates.register("subjects", SUBJECTS_TEMPLATE, ["script_text"])
+templates.register("style_suffix", "Given the style '{style}', generate three distinct visual descriptors that characterize this style. Separate each descriptor with a comma:", ["style"])
+templates.register("style_details", "Given the style '{style}', generate three distinct and detailed visual descriptors that characterize this style. Focus on unique elements, color palettes, lighting, and overall atmosphere. Separate each descriptor with a semicolon:", ["style"])
+templates.register("parse_script", "Parse the following script into scenes. For each scene, identify the setting, characters present, and key actions:\n\n{script}\n\nParsed scenes:", ["script"])
+templates.register("analyze_scene", "Analyze the following scene and identify key visual elements, mood, and potential camera shots:\n\n{scene}\n\nAnalysis:", ["scene"])
+templates.register("scene_prompt", "Given the following scene analysis and director's style, generate a detailed visual prompt for an AI image generator:\n\nScene Analysis: {scene_analysis}\n\nDirector's Style: {director_style}\n\nVisual Prompt:", ["scene_analysis", "director_style"])
+
+# Settings applied locally to the model output; a batch shot may override any of them
+FORMATTING_FIELDS = ("camera_shot", "camera_move", "style_prefix", "style_suffix", "end_parameters")
+
+configure_backend(get_llm_backend(), **get_mock_llm_settings())
+scheduler.configure(**get_rate_limits())
 
 class Subject:
     CATEGORIES = ["Main Character", "Supporting Character", "Location", "Object"]
@@ -42,21 +90,32 @@ class StyleHandler:
     def __init__(self):
         self.prefix = ""
         self.suffix = ""
-        self.llm = ChatOpenAI(temperature=0.7)
+
+    # Looked up on each use so clients rebuilt after llm_registry.clear() (e.g. a new API key) are picked up
+    @property
+    def llm(self):
+        return get_chat_model(temperature=0.7)
+
+    @property
+    def style_chain(self) -> LLMChain:
+        return LLMChain(llm=self.llm, prompt=templates.get("style_suffix"))
 
     def set_prefix(self, prefix: str) -> None:
         self.prefix = prefix
         self.generate_suffix()
 
     async def generate_suffix(self) -> None:
-        style_chain = LLMChain(
-            llm=self.llm,
-            prompt=PromptTemplate(
-                input_variables=["style"],
-                template="Given the style '{style}', generate three distinct visual descriptors that characterize this style. Separate each descriptor with a comma:"
-            )
-        )
-        result = await style_chain.arun({"style": self.prefix})
+        prefix = self.prefix
+        with metrics.span("render_template", template="style_suffix"):
+            prompt_text = templates.render("style_suffix", style=prefix)
+        key = response_cache.make_key(prompt_text, self.llm.model_name, self.llm.temperature)
+
+        async def call() -> str:
+            with metrics.span("llm_call", template="style_suffix"):
+                return await self.style_chain.arun({"style": prefix})
+
+        with usage.label("style_suffix"):
+            result = await single_flight.do(key, lambda: scheduler.run(call, estimate_tokens(prompt_text)))
         self.suffix = result.strip()
 
     def get_full_style(self) -> str:
@@ -81,48 +140,43 @@ class ElementManager:
         return self.elements
 
 class ScriptParser:
-    def __init__(self):
-        self.llm = ChatOpenAI(temperature=0.3)
+    @property
+    def llm(self):
+        return get_chat_model(temperature=0.3)
+
+    @property
+    def parse_chain(self) -> LLMChain:
+        return LLMChain(llm=self.llm, prompt=templates.get("parse_script"))
 
     async def parse_script(self, script: str) -> List[Dict[str, Any]]:
-        parse_chain = LLMChain(
-            llm=self.llm,
-            prompt=PromptTemplate(
-                input_variables=["script"],
-                template="Parse the following script into scenes. For each scene, identify the setting, characters present, and key actions:\n\n{script}\n\nParsed scenes:"
-            )
+        result = await scheduler.run(
+            lambda: self.parse_chain.arun({"script": script}),
+            estimate_tokens(templates.render("parse_script", script=script))
         )
-        result = await parse_chain.arun({"script": script})
         return await self._structure_parsed_scenes(result)
 
     async def _structure_parsed_scenes(self, parsed_text: str) -> List[Dict[str, Any]]:
-        # Implement logic to convert the parsed text into a structured list of scenes
-        # This is a placeholder and should be implemented based on the actual output format
-        scenes = []
-        # Parse the text and populate the scenes list
-        return scenes
+        return parse_scene_list(parsed_text)
 
 class SceneAnalyzer:
-    def __init__(self):
-        self.llm = ChatOpenAI(temperature=0.3)
+    @property
+    def llm(self):
+        return get_chat_model(temperature=0.3)
+
+    @property
+    def analyze_chain(self) -> LLMChain:
+        return LLMChain(llm=self.llm, prompt=templates.get("analyze_scene"))
 
     async def analyze_scene(self, scene: Dict[str, Any]) -> Dict[str, Any]:
-        analyze_chain = LLMChain(
-            llm=self.llm,
-            prompt=PromptTemplate(
-                input_variables=["scene"],
-                template="Analyze the following scene and identify key visual elements, mood, and potential camera shots:\n\n{scene}\n\nAnalysis:"
-            )
+        scene_json = json.dumps(scene)
+        result = await scheduler.run(
+            lambda: self.analyze_chain.arun({"scene": scene_json}),
+            estimate_tokens(templates.render("analyze_scene", scene=scene_json))
         )
-        result = await analyze_chain.arun({"scene": json.dumps(scene)})
         return await self._structure_analysis(result)
 
     async def _structure_analysis(self, analysis_text: str) -> Dict[str, Any]:
-        # Implement logic to convert the analysis text into a structured dictionary
-        # This is a placeholder and should be implemented based on the actual output format
-        analysis = {}
-        # Parse the text and populate the analysis dictionary
-        return analysis
+        return parse_scene_analysis(analysis_text)
 
 class DirectorStyleDatabase:
     def __init__(self, styles_file: str = "director_styles.json"):
@@ -147,52 +201,109 @@ class DirectorStyleDatabase:
             json.dump(self.styles, f)
 
 class PromptGenerator:
-    def __init__(self, llm):
-        self.llm = llm
+    def __init__(self, llm=None):
+        self._llm = llm  # None looks the model up in the registry on each use
+
+    @property
+    def llm(self):
+        return self._llm or get_chat_model(temperature=0.7)
+
+    @property
+    def generate_chain(self) -> LLMChain:
+        return LLMChain(llm=self.llm, prompt=templates.get("scene_prompt"))
 
     async def generate_prompt(self, scene_analysis: Dict[str, Any], director_style: Dict[str, Any]) -> str:
-        generate_chain = LLMChain(
-            llm=self.llm,
-            prompt=PromptTemplate(
-                input_variables=["scene_analysis", "director_style"],
-                template="Given the following scene analysis and director's style, generate a detailed visual prompt for an AI image generator:\n\nScene Analysis: {scene_analysis}\n\nDirector's Style: {director_style}\n\nVisual Prompt:"
-            )
-        )
-        result = await generate_chain.arun({
+        inputs = {
             "scene_analysis": json.dumps(scene_analysis),
             "director_style": json.dumps(director_style)
-        })
+        }
+        result = await scheduler.run(
+            lambda: self.generate_chain.arun(inputs),
+            estimate_tokens(templates.render("scene_prompt", **inputs))
+        )
         return result
 
 class OutputFormatter:
+    HEADER = "Scene,Prompt\n"
+
+    def format_row(self, scene: Dict[str, Any], prompt: str) -> str:
+        # Quoted so commas and newlines in descriptions or prompts keep the columns intact
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerow([scene.get("description", ""), prompt])
+        return buffer.getvalue()
+
     def format_output(self, scenes: List[Dict[str, Any]], prompts: List[str]) -> str:
-        # Implement logic to format the scenes and prompts into a spreadsheet-like output
-        # This is a placeholder and should be implemented based on the desired output format
-        output = "Scene,Prompt\n"
-        for scene, prompt in zip(scenes, prompts):
-            output += f"{scene['description']},{prompt}\n"
-        return output
+        return self.HEADER + "".join(self.format_row(scene, prompt) for scene, prompt in zip(scenes, prompts))
+
+class PromptLogger(JsonLinesPromptLogger):
+    # Same JSON Lines file as prompt_log.PromptLogger, but appended from a background writer;
+    # call flush() before reading the file directly
+    def __init__(self, log_file="prompt_log.json", max_batch: int = 64, flush_interval: float = 0.5,
+                 max_bytes: Optional[int] = None, max_age: Optional[float] = None, compression: str = "gzip"):
+        # Rotation checks run on the writer thread after each batch, so they never race an append.
+        # The writer exists before prepare() runs, so a rotation due at startup is deferred to it too.
+        self.writer = BufferedLogWriter(log_file, max_batch=max_batch, flush_interval=flush_interval,
+                                        on_batch=self.after_append)
+        super().__init__(log_file, max_bytes=max_bytes, max_age=max_age, compression=compression)
+
+    def append(self, line: str) -> None:
+        self.writer.write(line)
+
+    def defer(self, task: Callable[[], None]) -> None:
+        # Compressing a segment can take seconds; never on the thread that created the logger
+        self.writer.submit(task)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        return self.writer.flush(timeout)
+
+    def close(self) -> None:
+        self.writer.close()
+
+    def get_logs(self, since=None, until=None) -> List[Dict[str, Any]]:
+        self.flush()
+        return super().get_logs(since, until)
+
+    def iter_logs(self, start: Optional[LogCursor] = None, limit: Optional[int] = None,
+                  filters: Optional[Dict[str, Any]] = None, reverse: bool = False,
+                  flush_timeout: Optional[float] = None) -> Iterator[Tuple[LogCursor, Dict[str, Any]]]:
+        # flush_timeout=0 never waits; lines still buffered then show up on a later call
+        self.flush(flush_timeout)
+        return super().iter_logs(start, limit, filters, reverse)
+
+class TemplateManager:
+    def __init__(self, template_file: str = "prompt_templates.json"):
+        self.template_file = template_file
+        self.templates = self._load_templates()
+
+    def save_template(self, name: str, components: Dict[str, Any]):
+        self.templates[name] = components
+        self._save_templates()
 
-class PromptLogger:
-    def __init__(self, log_file="prompt_log.json"):
-        self.log_file = log_file
+    def load_template(self, name: str) -> Dict[str, Any]:
+        return self.templates.get(name, {})
 
-    def log_prompt(self, inputs: Dict[str, Any], generated_prompt: str):
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "inputs": inputs,
-            "generated_prompt": generated_prompt
-        }
-        with open(self.log_file, "a") as f:
-            json.dump(log_entry, f)
-            f.write("\n")
+    def get_all_templates(self) -> Dict[str, Dict[str, Any]]:
+        return self.templates
+
+    def delete_template(self, name: str):
+        if name in self.templates:
+            del self.templates[name]
+            self._save_templates()
+
+    def update_template(self, name: str, components: Dict[str, Any]):
+        if name in self.templates:
+            self.templates[name] = components
+            self._save_templates()
+
+    def _save_templates(self):
+        with open(self.template_file, 'w') as f:
+            json.dump(self.templates, f)
 
-    def get_logs(self):
-        logs = []
-        with open(self.log_file, "r") as f:
-            for line in f:
-                logs.append(json.loads(line))
-        return logs
+    def _load_templates(self) -> Dict[str, Dict[str, Any]]:
+        if os.path.exists(self.template_file):
+            with open(self.template_file, 'r') as f:
+                return json.load(f)
+        return {}
 
 class PromptForgeCore:
     def __init__(self):
@@ -204,24 +315,25 @@ class PromptForgeCore:
         self.highlighted_text = ""
         self.stick_to_script = False
         self.subjects: List[Dict[str, Any]] = []
-        self.prompt_logger = PromptLogger("prompt_log.json")
+        self.prompt_logger = PromptLogger("prompt_log.json", **get_log_rotation_settings())
         self._initialize_saved_prompts()
-
-    def _initialize_saved_prompts(self):
-        if not os.path.exists("saved_prompts.json") or os.path.getsize("saved_prompts.json") == 0:
-            with open("saved_prompts.json", "w") as f:
-                json.dump([], f)
         self.temperature = 0.7  # Default temperature
         self.style_prefix = ""
         self.style_suffix = ""
         self.end_parameters = ""
         self.camera_shot = ""
         self.camera_move = ""
+        self.max_concurrency = None  # None lets all prompt lengths run at once
+        self.generation_mode = "per_length"  # "single_call" for one combined JSON request, "fast" for one detailed call
+        self.script_context = ScriptContextSelector(token_budget=1500)  # Script tokens sent per call
+        self.scene_pipeline: Optional[ScenePipeline] = None  # Built on first script analysis
+        self.stage_outputs: OrderedDict = OrderedDict()  # Stage fingerprint -> output, see _run_shot
+        self.last_batch_id: Optional[str] = None  # Pass to get_usage_summary for the latest batch's totals
         self.history = deque(maxlen=10)  # Store last 10 states
         self.future = deque(maxlen=10)  # Store undone states for redo
         
-        # Initialize LLM
-        self.llm = ChatOpenAI(temperature=0.7)
+        # The response cache shared with MetaChain
+        self.response_cache = response_cache
         
         # Initialize StyleHandler
         self.style_handler = StyleHandler()
@@ -229,93 +341,41 @@ class PromptForgeCore:
         # Initialize TemplateManager
         self.template_manager = TemplateManager()
 
-    async def generate_subjects(self, script_text: str) -> List[Dict[str, Any]]:
-        prompt = f"""
-        Analyze the following script excerpt and perform these tasks:
-
-        Identify key subjects (characters, locations, objects) crucial to the scene.
-        For each subject, provide:
-
-        A clear, concise name
-        A category (Character, Location, or Object)
-        A detailed description (50-100 words) that includes:
-        - Physical attributes (appearance, size, color, etc.)
-        - Emotional or atmospheric qualities
-        - Relevance to the scene or story
-        - Any unique features or characteristics
-
-        Ensure descriptions are consistent with the script but expand beyond explicitly stated details.
-        Present the information in a structured format for each subject:
-        Name: [Subject Name]
-        Category: [Category]
-        Description: [Detailed description]
-
-        Script excerpt: {script_text}
-        """
-
-        try:
-            response = await self.llm.agenerate([prompt])
-            subjects_text = response.generations[0][0].text
-
-            subjects = []
-            current_subject = {}
-            for line in subjects_text.split('\n'):
-                line = line.strip()
-                if line.startswith('Name:'):
-                    if current_subject:
-                        subjects.append(current_subject)
-                    current_subject = {'name': line.split(':', 1)[1].strip()}
-                elif line.startswith('Category:'):
-                    current_subject['category'] = line.split(':', 1)[1].strip()
-                elif line.startswith('Description:'):
-                    current_subject['description'] = line.split(':', 1)[1].strip()
-                elif current_subject and 'description' in current_subject:
-                    current_subject['description'] += ' ' + line
-
-            if current_subject:
-                subjects.append(current_subject)
-
-            return subjects
-        except Exception as e:
-            logging.error(f"Error generating subjects: {str(e)}")
-            raise
-
-    def add_subject(self, name: str, category: str, description: str):
-        self.subjects.append({
-            'name': name,
-            'category': category,
-            'description': description,
-            'active': True
-        })
-
-    def generate_subjects(self, script_text: str) -> List[Dict[str, Any]]:
-        prompt = f"""
-        Analyze the following script excerpt and perform these tasks:
+    @property
+    def llm(self):
+        return get_chat_model(temperature=0.7)
 
-        Identify key subjects (characters, locations, objects) crucial to the scene.
-        For each subject, provide:
-
-        A clear, concise name
-        A category (Character, Location, or Object)
-        A detailed description (50-100 words) that includes:
-        - Physical attributes (appearance, size, color, etc.)
-        - Emotional or atmospheric qualities
-        - Relevance to the scene or story
-        - Any unique features or characteristics
+    @property
+    def style_details_chain(self) -> LLMChain:
+        return LLMChain(llm=self.llm, prompt=templates.get("style_details"))
 
-        Ensure descriptions are consistent with the script but expand beyond explicitly stated details.
-        Present the information in a structured format for each subject:
-        Name: [Subject Name]
-        Category: [Category]
-        Description: [Detailed description]
+    def _save_state(self, state=None):
+        if state is None:
+            state = self._get_current_state()
+        self.history.append(state)
+        self.future.clear()  # Clear redo stack when a new action is performed
 
-        Script excerpt: {script_text}
-        """
+    def _initialize_saved_prompts(self):
+        if not os.path.exists("saved_prompts.json") or os.path.getsize("saved_prompts.json") == 0:
+            with open("saved_prompts.json", "w") as f:
+                json.dump([], f)
 
-        try:
-            response = self.llm.generate([prompt])
-            subjects_text = response.generations[0][0].text
+    async def generate_subjects(self, script_text: str) -> List[Dict[str, Any]]:
+        with metrics.span("generate_subjects"):
+            return await self._generate_subjects(script_text)
+
+    async def _generate_subjects(self, script_text: str) -> List[Dict[str, Any]]:
+        with metrics.span("render_template", template="subjects"):
+            prompt = templates.render("subjects", script_text=script_text)
+        cache_key = self.response_cache.make_key(prompt, self.llm.model_name, self.llm.temperature)
+        subjects_text = self.response_cache.get(cache_key)
+        if subjects_text is None:
+            with usage.label("subjects"):
+                subjects_text = await single_flight.do(cache_key, lambda: self._request_subjects(cache_key, prompt))
+        else:
+            usage.record_cached()
 
+        with metrics.span("parse_subjects"):
             subjects = []
             current_subject = {}
             for line in subjects_text.split('\n'):
@@ -331,84 +391,60 @@ class PromptForgeCore:
             if current_subject:
                 subjects.append(current_subject)
 
-            return subjects
-        except Exception as e:
-            logging.error(f"Error generating subjects: {str(e)}")
-            return []
-
-    def add_subject(self, name: str, category: str, description: str):
-        self.subjects.append({
-            'name': name,
-            'category': category,
-            'description': description,
-            'active': True
-        })
-
-    async def generate_subjects(self, script_text: str) -> List[Dict[str, Any]]:
-        prompt = f"""
-        Analyze the following script excerpt and perform these tasks:
-
-        Identify key subjects (characters, locations, objects) crucial to the scene.
-        For each subject, provide:
-
-        A clear, concise name
-        A category (Character, Location, or Object)
-        A detailed description (50-100 words) that includes:
-        - Physical attributes (appearance, size, color, etc.)
-        - Emotional or atmospheric qualities
-        - Relevance to the scene or story
-        - Any unique features or characteristics
-
-        Ensure descriptions are consistent with the script but expand beyond explicitly stated details.
-        Present the information in a structured format for each subject:
-        Name: [Subject Name]
-        Category: [Category]
-        Description: [Detailed description]
-
-        Script excerpt: {script_text}
-        """
-
-        response = await self.llm.agenerate([prompt])
-        subjects_text = response.generations[0][0].text
+        return subjects
 
-        subjects = []
-        current_subject = {}
-        for line in subjects_text.split('\n'):
-            if line.startswith('Name:'):
-                if current_subject:
-                    subjects.append(current_subject)
-                current_subject = {'name': line.split(':', 1)[1].strip()}
-            elif line.startswith('Category:'):
-                current_subject['category'] = line.split(':', 1)[1].strip()
-            elif line.startswith('Description:'):
-                current_subject['description'] = line.split(':', 1)[1].strip()
+    async def _request_subjects(self, cache_key: str, prompt: str) -> str:
+        async def call():
+            with metrics.span("llm_call", template="subjects"):
+                return await self.llm.ainvoke(prompt)
+
+        response = await scheduler.run(call, estimate_tokens(prompt))
+        subjects_text = response.content
+        self.response_cache.set(cache_key, subjects_text)
+        return subjects_text
+
+    async def generate_style_details(self, prefix: str) -> str:
+        # Async so rate-limit pauses and retry backoff wait on the event loop rather than blocking the UI
+        with metrics.span("render_template", template="style_details"):
+            prompt_text = templates.render("style_details", style=prefix)
+        cache_key = self.response_cache.make_key(prompt_text, self.llm.model_name, self.llm.temperature)
+        result = self.response_cache.get(cache_key)
+        if result is None:
+            chain = self.style_details_chain
+
+            async def call() -> str:
+                with metrics.span("llm_call", template="style_details"):
+                    return await chain.arun({"style": prefix})
+
+            async def request() -> str:
+                details = await scheduler.run(call, estimate_tokens(prompt_text))
+                self.response_cache.set(cache_key, details)
+                return details
+
+            with usage.label("style_details"):
+                result = await single_flight.do(cache_key, request)
+        else:
+            usage.record_cached()
+        return result.strip()
 
-        if current_subject:
-            subjects.append(current_subject)
+    async def refine_prompt(self, prompt: str, feedback: str) -> str:
+        return await self.meta_chain.arefine_prompt(prompt, feedback, self.temperature)
 
-        return subjects
+    async def generate_variations(self, prompt: str, num_variations: int = 3) -> List[str]:
+        return await self.meta_chain.agenerate_variations(prompt, num_variations, self.temperature)
 
-    def add_subject(self, name: str, category: str, description: str):
-        self.subjects.append({
-            'name': name,
-            'category': category,
-            'description': description,
-            'active': True
-        })
+    def get_logs(self, since=None, until=None):
+        return self.prompt_logger.get_logs(since, until)
 
-    def generate_style_details(self, prefix: str) -> str:
-        style_chain = LLMChain(
-            llm=self.llm,
-            prompt=PromptTemplate(
-                input_variables=["style"],
-                template="Given the style '{style}', generate three distinct and detailed visual descriptors that characterize this style. Focus on unique elements, color palettes, lighting, and overall atmosphere. Separate each descriptor with a semicolon:"
-            )
-        )
-        result = style_chain.run({"style": prefix})
-        return result.strip()
+    def iter_logs(self, start: Optional[LogCursor] = None, limit: Optional[int] = None,
+                  filters: Optional[Dict[str, Any]] = None, reverse: bool = False,
+                  flush_timeout: Optional[float] = None) -> Iterator[Tuple[LogCursor, Dict[str, Any]]]:
+        # One page of prompt log entries; pass the last cursor back as start for the next one
+        return self.prompt_logger.iter_logs(start, limit, filters, reverse, flush_timeout)
 
-    def get_logs(self):
-        return self.prompt_logger.get_logs()
+    def close(self) -> None:
+        # Writes out any buffered log entries; call on shutdown
+        self.prompt_logger.close()
 
     def set_style(self, style: str) -> None:
         self._save_state()
@@ -428,12 +464,6 @@ class PromptForgeCore:
         self.script = full_script.strip()
         self.stick_to_script = stick_to_script
 
-    def _save_state(self, state=None):
-        if state is None:
-            state = self._get_current_state()
-        self.history.append(state)
-        self.future.clear()  # Clear redo stack when a new action is performed
-
     def undo(self):
         if len(self.history) > 1:  # Keep at least one state in history
             current_state = self.history.pop()
@@ -477,129 +507,239 @@ class PromptForgeCore:
             'camera_move': self.camera_move
         }
 
-class TemplateManager:
-    def __init__(self, template_file: str = "prompt_templates.json"):
-        self.template_file = template_file
-        self.templates = self._load_templates()
-
-    def save_template(self, name: str, components: Dict[str, Any]):
-        self.templates[name] = components
-        self._save_templates()
-
-    def load_template(self, name: str) -> Dict[str, Any]:
-        return self.templates.get(name, {})
+    async def generate_prompt(self, style: str, highlighted_text: str, shot_description: str, directors_notes: str, script: str, stick_to_script: bool, end_parameters: str,
+                              on_chunk: Optional[Callable[[str, str], None]] = None,
+                              lengths: Optional[Sequence[str]] = None, mode: Optional[str] = None) -> Dict[str, str]:
+        # lengths limits generation to e.g. ["detailed"]; by default all of PROMPT_LENGTHS are returned.
+        # mode overrides generation_mode for this call only.
+        try:
+            shot = self._interactive_shot(style, highlighted_text, shot_description, directors_notes, script,
+                                          stick_to_script, end_parameters, lengths, mode)
+            return await self._generate_shot_prompts(shot, on_chunk=on_chunk)
+        except Exception as e:
+            logging.exception("Error in PromptForgeCore.generate_prompt")
+            raise
 
-    def get_all_templates(self) -> Dict[str, Dict[str, Any]]:
-        return self.templates
+    async def prefetch_prompt(self, style: str, highlighted_text: str, shot_description: str, directors_notes: str,
+                              script: str, stick_to_script: bool, end_parameters: str,
+                              lengths: Optional[Sequence[str]] = None, mode: Optional[str] = None) -> Dict[str, Any]:
+        # A speculative generate_prompt: nothing is logged unless the result is passed to
+        # adopt_prefetched, and its usage stays under "speculative" until then. Its model calls
+        # are never shared with normal ones, so cancelling it cancels them and nobody else pays for it.
+        shot = self._interactive_shot(style, highlighted_text, shot_description, directors_notes, script,
+                                      stick_to_script, end_parameters, lengths, mode or self.generation_mode)
+        formatting = self._get_formatting({"end_parameters": end_parameters})
+        with usage.speculative() as run_usage, single_flight.namespace("speculative"):
+            prompts = await self._generate_shot_prompts(shot, formatting, log=False)
+        return {"prompts": prompts, "shot": shot, "formatting": formatting, "usage": run_usage}
+
+    def adopt_prefetched(self, prefetched: Dict[str, Any]) -> Dict[str, str]:
+        # Moves the usage of a prefetch_prompt result to the caller and logs it, as generate_prompt would have
+        usage.adopt(prefetched["usage"])
+        with metrics.span("log_prompt"):
+            self._log_prompt_generation(prefetched["prompts"], prefetched["shot"], prefetched["formatting"],
+                                        prefetched["usage"], prefetched["shot"]["mode"])
+        return prefetched["prompts"]
+
+    def _interactive_shot(self, style: str, highlighted_text: str, shot_description: str, directors_notes: str,
+                          script: str, stick_to_script: bool, end_parameters: str,
+                          lengths: Optional[Sequence[str]], mode: Optional[str]) -> Dict[str, Any]:
+        return {
+            "lengths": lengths,
+            "mode": mode,
+            "style": style,
+            "highlighted_text": highlighted_text,
+            "shot_description": shot_description,
+            "directors_notes": directors_notes,
+            "script": script,
+            "stick_to_script": stick_to_script,
+            "end_parameters": end_parameters,
+            "active_subjects": [subject for subject in self.subjects if subject.get('active', False)]
+        }
 
-    def delete_template(self, name: str):
-        if name in self.templates:
-            del self.templates[name]
-            self._save_templates()
+    async def generate_prompts_batch(self, shots: List[Dict[str, Any]], max_concurrency: int = 4,
+                                     mode: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        # Yields {"index", "prompts", "error", "usage", "batch_id"} for each shot in completion order, not input order.
+        # mode applies to every shot without a "mode" of its own; "fast" makes one model call per shot.
+        semaphore = asyncio.Semaphore(max_concurrency)
+        batch_usage = usage.new_batch()
+        self.last_batch_id = batch_usage.name
+
+        async def run(index: int, shot_spec: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                with usage.scope(batch_usage), usage.scope() as shot_usage:
+                    try:
+                        # End parameters belong to the shot; the interactive session's are never applied to it
+                        formatting = self._get_formatting({**shot_spec, "end_parameters": shot_spec.get("end_parameters", "")})
+                        prompts = await self._generate_shot_prompts(self._normalize_shot(shot_spec, mode), formatting)
+                        error = None
+                    except Exception as e:
+                        logging.error(f"Error generating prompts for shot {index}: {str(e)}")
+                        prompts, error = None, str(e)
+                return {"index": index, "prompts": prompts, "error": error,
+                        "usage": shot_usage.to_dict(), "batch_id": batch_usage.name}
+
+        tasks = [asyncio.create_task(run(index, shot_spec)) for index, shot_spec in enumerate(shots)]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _normalize_shot(self, shot_spec: Dict[str, Any], mode: Optional[str] = None) -> Dict[str, Any]:
+        # Subjects may be given as subject dicts or as names of subjects already in the project
+        subjects = shot_spec.get("subjects")
+        if subjects is None:
+            active_subjects = [subject for subject in self.subjects if subject.get('active', False)]
+        else:
+            known = {subject['name']: subject for subject in self.subjects}
+            active_subjects = [known[s] if isinstance(s, str) else s for s in subjects
+                               if not isinstance(s, str) or s in known]
+        return {
+            "style": shot_spec.get("style", ""),
+            "highlighted_text": shot_spec.get("highlighted_text", ""),
+            "shot_description": shot_spec.get("shot_description", ""),
+            "directors_notes": shot_spec.get("directors_notes", shot_spec.get("notes", "")),
+            "script": shot_spec.get("script", ""),
+            "stick_to_script": shot_spec.get("stick_to_script", False),
+            "end_parameters": shot_spec.get("end_parameters", ""),
+            "active_subjects": active_subjects,
+            "lengths": shot_spec.get("lengths"),
+            "mode": shot_spec.get("mode", mode)
+        }
 
-    def update_template(self, name: str, components: Dict[str, Any]):
-        if name in self.templates:
-            self.templates[name] = components
-            self._save_templates()
+    def _get_formatting(self, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        formatting = {
+            "camera_shot": self.camera_shot,
+            "camera_move": self.camera_move,
+            "style_prefix": self.style_prefix,
+            "style_suffix": self.style_suffix,
+            "end_parameters": self.end_parameters
+        }
+        if overrides:
+            formatting.update({key: overrides[key] for key in FORMATTING_FIELDS if key in overrides})
+        return formatting
+
+    async def _generate_shot_prompts(self, shot: Dict[str, Any], formatting: Optional[Dict[str, str]] = None,
+                                     on_chunk: Optional[Callable[[str, str], None]] = None,
+                                     log: bool = True) -> Dict[str, str]:
+        with metrics.span("shot"), usage.scope() as shot_usage:
+            return await self._run_shot(shot, formatting, on_chunk, shot_usage, log)
+
+    async def _run_shot(self, shot: Dict[str, Any], formatting: Optional[Dict[str, str]],
+                        on_chunk: Optional[Callable[[str, str], None]], shot_usage: UsageScope,
+                        log: bool = True) -> Dict[str, str]:
+        formatting = formatting or self._get_formatting({"end_parameters": shot['end_parameters']})
+
+        lengths = shot.get('lengths') or PROMPT_LENGTHS
+        unknown = [length for length in lengths if length not in PROMPT_LENGTHS]
+        if unknown:
+            raise ValueError(f"Unknown prompt length(s): {', '.join(unknown)}")
+        mode = shot.get('mode') or self.generation_mode
+        if mode not in GENERATION_MODES:
+            raise ValueError(f"Unknown generation mode: {mode}")
+
+        # Each stage is keyed on a fingerprint of the inputs it reads. Camera shot and move, style
+        # prefix and suffix and end parameters are only applied afterwards by _format_prompt, so
+        # changing them reuses the stored model output without any API call.
+        full_script = ""
+        if shot['stick_to_script']:
+            # Only the passages relevant to this shot are sent, so input size stays flat as the script grows
+            context_key = _fingerprint("script_context", shot['script'], shot['highlighted_text'],
+                                       shot['active_subjects'], shot['shot_description'],
+                                       self.script_context.token_budget)
+            full_script = self._stage_output(context_key)
+            if full_script is None:
+                with metrics.span("script_context"):
+                    full_script = self.script_context.select(
+                        shot['script'], shot['highlighted_text'], shot['active_subjects'], shot['shot_description']
+                    )
+                self._store_stage_output(context_key, full_script)
+
+        model_inputs = {
+            "active_subjects": shot['active_subjects'],
+            "style": shot['style'],
+            "shot_description": shot['shot_description'],
+            "directors_notes": shot['directors_notes'],
+            "highlighted_text": shot['highlighted_text'],
+            "full_script": full_script
+        }
+        # In fast mode only the detailed prompt comes from the model; the others are derived from it below
+        model_lengths = ("detailed",) if mode == "fast" else lengths
+        settings = [self.temperature, mode, MODEL_NAME, llm_registry.backend, llm_registry.mock_settings]
+        model_keys = {length: _fingerprint("model", model_inputs, settings, length) for length in model_lengths}
+        full_prompt = {}
+        for length in model_lengths:
+            reused = self._stage_output(model_keys[length])
+            if reused is not None:
+                full_prompt[length] = reused
+                if on_chunk is not None:
+                    on_chunk(length, reused)
+
+        missing = [length for length in model_lengths if length not in full_prompt]
+        if missing:
+            # Generate prompts using MetaChain
+            generated = await self.meta_chain.generate_prompt(
+                **model_inputs,
+                temperature=self.temperature,
+                max_concurrency=self.max_concurrency,
+                mode=mode,
+                on_chunk=on_chunk,
+                lengths=missing
+            )
+            for length in missing:
+                self._store_stage_output(model_keys[length], generated[length])
+                full_prompt[length] = generated[length]
 
-    def _save_templates(self):
-        with open(self.template_file, 'w') as f:
-            json.dump(self.templates, f)
+        if mode == "fast":
+            full_prompt = self.meta_chain.complete_fast(full_prompt["detailed"], lengths, on_chunk)
 
-    def _load_templates(self) -> Dict[str, Dict[str, Any]]:
-        if os.path.exists(self.template_file):
-            with open(self.template_file, 'r') as f:
-                return json.load(f)
-        return {}
+        # Process and format the generated prompts; this appends the end parameters once
+        prompts = self._process_generated_prompts(full_prompt, formatting)
 
-class PromptForgeCore:
-    def __init__(self):
-        self.meta_chain = MetaChain(self)
-        self.style_manager = StyleManager()
-        self.shot_description = ""
-        self.directors_notes = ""
-        self.script = ""
-        self.highlighted_text = ""
-        self.stick_to_script = False
-        self.subjects: List[Dict[str, Any]] = []
-        self.prompt_logger = PromptLogger("prompt_log.json")
-        self._initialize_saved_prompts()
-        self.temperature = 0.7  # Default temperature
-        self.style_prefix = ""
-        self.style_suffix = ""
-        self.end_parameters = ""
-        self.camera_shot = ""
-        self.camera_move = ""
-        self.history = deque(maxlen=10)  # Store last 10 states
-        self.future = deque(maxlen=10)  # Store undone states for redo
-        
-        # Initialize LLM
-        self.llm = ChatOpenAI(temperature=0.7)
-        
-        # Initialize StyleHandler
-        self.style_handler = StyleHandler()
+        # Log the inputs and generated outputs
+        if log:
+            with metrics.span("log_prompt"):
+                self._log_prompt_generation(prompts, shot, formatting, shot_usage, mode)
         
-        # Initialize TemplateManager
-        self.template_manager = TemplateManager()
-
-    def _save_state(self, state=None):
-        if state is None:
-            state = self._get_current_state()
-        self.history.append(state)
-        self.future.clear()  # Clear redo stack when a new action is performed
+        return prompts
+
+    def _stage_output(self, key: str) -> Optional[str]:
+        # Honours the response cache's bypass, so forced fresh calls are not answered from here either
+        if self.response_cache.bypass:
+            return None
+        output = self.stage_outputs.get(key)
+        if output is not None:
+            self.stage_outputs.move_to_end(key)
+        return output
 
-    def _initialize_saved_prompts(self):
-        if not os.path.exists("saved_prompts.json") or os.path.getsize("saved_prompts.json") == 0:
-            with open("saved_prompts.json", "w") as f:
-                json.dump([], f)
+    def _store_stage_output(self, key: str, output: str) -> None:
+        self.stage_outputs[key] = output
+        self.stage_outputs.move_to_end(key)
+        while len(self.stage_outputs) > STAGE_CACHE_SIZE:
+            self.stage_outputs.popitem(last=False)
 
-    async def generate_prompt(self, style: str, highlighted_text: str, shot_description: str, directors_notes: str, script: str, stick_to_script: bool, end_parameters: str) -> Dict[str, str]:
-        try:
-            active_subjects = [subject for subject in self.subjects if subject.get('active', False)]
-            
-            # Generate prompts using MetaChain
-            full_prompt = await self.meta_chain.generate_prompt(
-                active_subjects=active_subjects,
-                style=style,
-                shot_description=shot_description,
-                directors_notes=directors_notes,
-                highlighted_text=highlighted_text,
-                full_script=script if stick_to_script else "",
-                temperature=self.temperature
-            )
-            
-            # Process and format the generated prompts
-            prompts = self._process_generated_prompts(full_prompt)
-            
-            # Add end_parameters to each prompt
-            for key in prompts:
-                prompts[key] = f"{prompts[key]} {end_parameters}".strip()
-            
-            # Log the inputs and generated outputs
-            self._log_prompt_generation(prompts, locals())
-            
-            return prompts
-        except Exception as e:
-            logging.exception("Error in PromptForgeCore.generate_prompt")
-            raise
-
-    def _process_generated_prompts(self, full_prompt: Dict[str, str]) -> Dict[str, str]:
+    def _process_generated_prompts(self, full_prompt: Dict[str, str], formatting: Optional[Dict[str, str]] = None) -> Dict[str, str]:
         return {
-            "Concise Prompt": self._format_prompt(full_prompt['concise']),
-            "Normal Prompt": self._format_prompt(full_prompt['normal']),
-            "Detailed Prompt": self._format_prompt(full_prompt['detailed'])
+            f"{length.capitalize()} Prompt": self._format_prompt(full_prompt[length], formatting)
+            for length in PROMPT_LENGTHS if length in full_prompt
         }
 
-    def _format_prompt(self, prompt: str) -> str:
-        formatted = prompt.strip()
-        if self.camera_shot:
-            formatted = f"{self.camera_shot} of {formatted}"
-        if self.camera_move:
-            formatted = f"{self.camera_move} to {formatted}"
-        formatted = f"{self.style_prefix} {formatted} {self.style_suffix}".strip()
-        return f"{formatted} {self.end_parameters}".strip()
-
-    def _log_prompt_generation(self, prompts: Dict[str, str], inputs: Dict[str, Any]):
+    def _format_prompt(self, prompt: str, formatting: Optional[Dict[str, str]] = None) -> str:
+        with metrics.span("format_prompt"):
+            formatting = formatting or self._get_formatting()
+            formatted = prompt.strip()
+            if formatting['camera_shot']:
+                formatted = f"{formatting['camera_shot']} of {formatted}"
+            if formatting['camera_move']:
+                formatted = f"{formatting['camera_move']} to {formatted}"
+            formatted = f"{formatting['style_prefix']} {formatted} {formatting['style_suffix']}".strip()
+            return f"{formatted} {formatting['end_parameters']}".strip()
+
+    def _log_prompt_generation(self, prompts: Dict[str, str], inputs: Dict[str, Any], formatting: Optional[Dict[str, str]] = None,
+                               shot_usage: Optional[UsageScope] = None, mode: Optional[str] = None):
+        formatting = formatting or self._get_formatting()
         log_inputs = {
             "shot_description": inputs['shot_description'],
             "style": inputs['style'],
@@ -609,35 +749,30 @@ class PromptForgeCore:
             "active_subjects": [s['name'] for s in inputs['active_subjects']],
             "end_parameters": inputs['end_parameters'],
             "temperature": self.temperature,
-            "style_prefix": self.style_prefix,
-            "style_suffix": self.style_suffix,
-            "camera_shot": self.camera_shot,
-            "camera_move": self.camera_move
+            "mode": mode or self.generation_mode,
+            "style_prefix": formatting['style_prefix'],
+            "style_suffix": formatting['style_suffix'],
+            "camera_shot": formatting['camera_shot'],
+            "camera_move": formatting['camera_move']
         }
         for length, prompt in prompts.items():
-            self.prompt_logger.log_prompt({**log_inputs, "length": length}, prompt)
-
-    def _generate_concise_prompt(self, full_prompt: Union[str, Dict[str, str]]) -> str:
-        if isinstance(full_prompt, dict):
-            # Assuming the prompt is stored in a 'text' key
-            prompt_text = full_prompt.get('text', '')
-        else:
-            prompt_text = str(full_prompt)
-        
-        # Extract the first sentence or up to 100 characters
-        concise = prompt_text.split('.')[0]
-        return concise[:100] + ('...' if len(concise) > 100 else '')
-
-    def _generate_normal_prompt(self, full_prompt: Union[str, Dict[str, str]]) -> str:
-        if isinstance(full_prompt, dict):
-            # Assuming the prompt is stored in a 'text' key
-            prompt_text = full_prompt.get('text', '')
-        else:
-            prompt_text = str(full_prompt)
-        
-        # Extract the first paragraph or up to 250 characters
-        normal = prompt_text.split('\n\n')[0]
-        return normal[:250] + ('...' if len(normal) > 250 else '')
+            self.prompt_logger.log_prompt({**log_inputs, "length": length}, prompt,
+                                          self._length_usage(shot_usage, length, mode))
+
+    @staticmethod
+    def _length_usage(shot_usage: Optional[UsageScope], length: str, mode: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        # Per-length calls are logged against their own entry; a single combined call is shared by all three,
+        # as is the detailed call in fast mode
+        if shot_usage is None:
+            return None
+        own = shot_usage.label_totals(length.split()[0].lower())
+        if own is not None:
+            return own
+        combined = shot_usage.label_totals("detailed" if mode == "fast" else "combined")
+        return {**combined, "shared_call": True} if combined else None
+
+    def get_usage_summary(self, batch_id: Optional[str] = None) -> Dict[str, Any]:
+        return usage.summary(batch_id)
 
     def save_prompt(self, prompt: str, components: Dict[str, Any]) -> None:
         self.meta_chain.prompt_manager.save_prompt(
@@ -683,7 +818,23 @@ class PromptForgeCore:
     def get_director_styles(self) -> List[str]:
         return list(self.meta_chain.director_styles.keys())
 
+    def _get_scene_pipeline(self) -> ScenePipeline:
+        if self.scene_pipeline is None:
+            self.scene_pipeline = ScenePipeline(
+                ScriptParser(), SceneAnalyzer(), PromptGenerator(), OutputFormatter()
+            )
+        return self.scene_pipeline
+
+    async def stream_scene_prompts(self, script_content: str, director_style: str) -> AsyncIterator[Dict[str, Any]]:
+        # Rows arrive in script order while later scenes are still being parsed and analysed
+        style = {"name": director_style, **self.meta_chain.director_styles.get(director_style, {})}
+        async for row in self._get_scene_pipeline().run(script_content, style):
+            yield row
+
     async def analyze_script(self, script_content: str, director_style: str) -> str:
-        return await self.meta_chain.generate_prompt_spreadsheet(script_content, director_style)
+        output = [OutputFormatter.HEADER]
+        async for row in self.stream_scene_prompts(script_content, director_style):
+            output.append(row["row"])
+        return "".join(output)
 
 # End of PromptForgeCore class
@@ -0,0 +1,149 @@
+# llm_cache.py
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+class LLMResponseCache:
+    """Two-tier cache of model responses keyed on the rendered prompt, model and temperature.
+
+    Recent entries live in an in-memory LRU; every entry is also written to
+    cache_dir, which is trimmed oldest-first once it exceeds max_disk_bytes.
+    Setting bypass forces fresh model calls while still refreshing the cache.
+    """
+
+    def __init__(self, cache_dir: str = ".llm_cache", max_memory_entries: int = 256,
+                 max_disk_bytes: int = 50 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.bypass = False
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @staticmethod
+    def make_key(prompt_text: str, model: str, temperature: float) -> str:
+        payload = json.dumps([model, float(temperature), prompt_text], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if self.bypass:
+                self.bypassed += 1
+                return None
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+            value = self._read_disk(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, value)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._remember(key, value)
+            self._write_disk(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if os.path.isdir(self.cache_dir):
+                for name in os.listdir(self.cache_dir):
+                    if name.endswith(".json"):
+                        os.remove(os.path.join(self.cache_dir, name))
+            self._disk_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._get_disk_bytes()
+            }
+
+    def _remember(self, key: str, value: str) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)["response"]
+            os.utime(path)  # Refresh mtime so eviction stays least-recently-used
+            return value
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Discarding unreadable cache entry {path}: {e}")
+            return None
+
+    def _write_disk(self, key: str, value: str) -> None:
+        path = self._path(key)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"response": value}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._disk_bytes = self._get_disk_bytes() + os.path.getsize(path) - previous
+        except OSError as e:
+            logging.warning(f"Could not write cache entry {path}: {e}")
+            return
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _get_disk_bytes(self) -> int:
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+        return self._disk_bytes
+
+    def _disk_entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, name, stat.st_size))
+        return entries
+
+    def _evict_disk(self) -> None:
+        # Trim to 90% of the budget so a full cache doesn't rescan on every write
+        target = self.max_disk_bytes * 0.9
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, _, size in entries)
+        for _, name, size in entries:
+            if total <= target:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+        self._disk_bytes = total
+
+response_cache = LLMResponseCache()
@@ -0,0 +1,209 @@
+# llm_clients.py
+
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import LLMResult
+from langchain_openai import ChatOpenAI
+from openai import AsyncOpenAI
+
+from config import get_openai_api_key
+from mock_llm import MockChatModel
+from usage import UsageTracker, usage
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+DEFAULT_TIMEOUT = 60.0
+BACKENDS = ("openai", "mock")
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Reports the token usage of every model call to a UsageTracker.
+
+    Runs inline in the caller's context so the usage scopes of the current
+    task apply. Calls whose response carries no usage are estimated from the
+    prompt and reply text.
+    """
+
+    run_inline = True
+
+    def __init__(self, tracker: UsageTracker):
+        self.tracker = tracker
+        self._runs: Dict[Any, Tuple[str, str]] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: Any, **kwargs: Any) -> None:
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model") or (serialized or {}).get("kwargs", {}).get("model_name", "unknown")
+        prompt_text = "\n".join(str(message.content) for batch in messages for message in batch)
+        self._runs[run_id] = (model, prompt_text)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: Any, **kwargs: Any) -> None:
+        model, prompt_text = self._runs.pop(run_id, ("unknown", ""))
+        llm_output = response.llm_output or {}
+        model = llm_output.get("model_name") or model
+        for generations in response.generations:
+            for generation in generations:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                token_usage = llm_output.get("token_usage")
+                if metadata:
+                    self.tracker.record(model, metadata.get("input_tokens", 0), metadata.get("output_tokens", 0))
+                elif token_usage:
+                    self.tracker.record(model, token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0))
+                else:
+                    self.tracker.record_estimate(model, prompt_text, generation.text)
+
+    def on_llm_error(self, error: BaseException, *, run_id: Any, **kwargs: Any) -> None:
+        self._runs.pop(run_id, None)
+
+class LLMClientRegistry:
+    """Process-wide cache of chat model clients sharing one keep-alive HTTP transport.
+
+    Clients are keyed by (model, temperature, timeout). Every client reuses the
+    same httpx connection pools, so repeated calls skip the TCP/TLS handshake.
+    The async pool is bound to the event loop that first uses it. With the
+    "mock" backend every chat model is an offline MockChatModel instead.
+    """
+
+    def __init__(self, max_connections: int = 20, max_keepalive_connections: int = 10,
+                 keepalive_expiry: float = 30.0):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self._lock = threading.Lock()
+        self.usage_callback = UsageCallbackHandler(usage)
+        self.backend = "openai"
+        self.mock_settings: Dict[str, Any] = {}
+        self._chat_models: Dict[Tuple[str, float, float], BaseChatModel] = {}
+        self._openai_clients: Dict[Optional[str], AsyncOpenAI] = {}
+        self._http_client: Optional[httpx.Client] = None
+        self._http_async_client: Optional[httpx.AsyncClient] = None
+        self.hits = 0
+        self.misses = 0
+        self.requests_sent = 0
+
+    def _count_request(self, request: httpx.Request) -> None:
+        self.requests_sent += 1
+
+    async def _count_async_request(self, request: httpx.Request) -> None:
+        self.requests_sent += 1
+
+    @property
+    def http_client(self) -> httpx.Client:
+        if self._http_client is None:
+            self._http_client = httpx.Client(
+                limits=self.limits,
+                event_hooks={"request": [self._count_request]}
+            )
+        return self._http_client
+
+    @property
+    def http_async_client(self) -> httpx.AsyncClient:
+        if self._http_async_client is None:
+            self._http_async_client = httpx.AsyncClient(
+                limits=self.limits,
+                event_hooks={"request": [self._count_async_request]}
+            )
+        return self._http_async_client
+
+    def configure_backend(self, backend: str, **mock_settings: Any) -> None:
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown LLM backend {backend!r}, expected one of {BACKENDS}")
+        with self._lock:
+            self.backend = backend
+            self.mock_settings = mock_settings
+            self._chat_models.clear()
+
+    def get_chat_model(self, model: str = DEFAULT_MODEL, temperature: float = 0.7,
+                       timeout: float = DEFAULT_TIMEOUT) -> BaseChatModel:
+        key = (model, float(temperature), float(timeout))
+        with self._lock:
+            llm = self._chat_models.get(key)
+            if llm is not None:
+                self.hits += 1
+                return llm
+            self.misses += 1
+            if self.backend == "mock":
+                llm = MockChatModel(model_name=model, temperature=temperature, callbacks=[self.usage_callback],
+                                    **self.mock_settings)
+            else:
+                llm = ChatOpenAI(
+                    model_name=model,
+                    temperature=temperature,
+                    request_timeout=timeout,
+                    max_retries=0,  # Retries are handled by request_scheduler
+                    stream_usage=True,  # The last streamed chunk carries the token counts
+                    callbacks=[self.usage_callback],
+                    api_key=_api_key(),
+                    http_client=self.http_client,
+                    http_async_client=self.http_async_client
+                )
+            self._chat_models[key] = llm
+            return llm
+
+    def get_openai_client(self, api_key: Optional[str] = None) -> AsyncOpenAI:
+        with self._lock:
+            client = self._openai_clients.get(api_key)
+            if client is None:
+                client = AsyncOpenAI(api_key=api_key or _api_key(), max_retries=0, http_client=self.http_async_client)
+                self._openai_clients[api_key] = client
+            return client
+
+    def clear(self) -> None:
+        # Drop cached clients (e.g. after the API key changes) but keep the open connections
+        with self._lock:
+            self._chat_models.clear()
+            self._openai_clients.clear()
+
+    async def aclose(self) -> None:
+        self.clear()
+        if self._http_async_client is not None:
+            await self._http_async_client.aclose()
+            self._http_async_client = None
+        if self._http_client is not None:
+            self._http_client.close()
+            self._http_client = None
+
+    def pool_stats(self) -> Dict[str, Any]:
+        stats = {
+            "clients": len(self._chat_models) + len(self._openai_clients),
+            "hits": self.hits,
+            "misses": self.misses,
+            "requests_sent": self.requests_sent,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections
+        }
+        for name, client in (("sync", self._http_client), ("async", self._http_async_client)):
+            connections = _pool_connections(client)
+            stats[f"{name}_connections"] = len(connections)
+            stats[f"{name}_idle_connections"] = sum(1 for c in connections if c.is_idle())
+        return stats
+
+def _api_key() -> Optional[str]:
+    # Read when a client is built rather than at import, so a key saved in the UI is picked up
+    return os.environ.get("OPENAI_API_KEY") or get_openai_api_key()
+
+def _pool_connections(client) -> list:
+    # httpx does not expose its pool publicly; read the httpcore pool if it is there
+    if client is None:
+        return []
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    return list(getattr(pool, "connections", []))
+
+registry = LLMClientRegistry()
+
+def configure_backend(backend: str, **mock_settings: Any) -> None:
+    registry.configure_backend(backend, **mock_settings)
+
+def get_chat_model(model: str = DEFAULT_MODEL, temperature: float = 0.7,
+                   timeout: float = DEFAULT_TIMEOUT) -> BaseChatModel:
+    return registry.get_chat_model(model, temperature, timeout)
+
+def get_openai_client(api_key: Optional[str] = None) -> AsyncOpenAI:
+    return registry.get_openai_client(api_key)
+
+def pool_stats() -> Dict[str, Any]:
+    return registry.pool_stats()
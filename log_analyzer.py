@@ -1,26 +1,245 @@
+import argparse
 import json
+import math
+from array import array
+from bisect import bisect_left
+from collections import Counter
 from pprint import pprint
 from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # Optional; the report falls back to plain Python
+    np = None
+
+from prompt_log import as_timestamp, iter_entries_backwards, iter_log_entries
+
+def iter_recent_entries(log_file: str, since) -> Iterator[dict]:
+    """Yields entries newer than since, newest first.
+
+    The active file is read backwards and reading stops at the first older entry, so
+    only the window is ever read. If the window reaches past the active file, the rotated
+    segments that overlap it are read one at a time.
+    """
+    since = as_timestamp(since)
+    for entry in iter_entries_backwards(log_file):
+        timestamp = entry.get("timestamp") if isinstance(entry, dict) else None
+        if not timestamp:
+            continue
+        if timestamp < since:
+            return
+        yield entry
+
+def query_log(log_file="prompt_log.json", since=None, until=None) -> Iterator[dict]:
+    # Rotated segments are picked by their time index, and the active file is entered through its offset index
+    return iter_log_entries(log_file, since, until)
+
+def print_entry(entry: dict) -> None:
+    print(f"Timestamp: {entry['timestamp']}")
+    print("Inputs:")
+    pprint(entry['inputs'])
+    print("\nGenerated Prompt:")
+    print(entry['generated_prompt'])
+    print("\n" + "="*50 + "\n")
 
 def analyze_log(log_file="prompt_log.json", hours=24):
-    current_time = datetime.now()
-    with open(log_file, "r") as f:
-        logs = [json.loads(line) for line in f]
-    
-    # Sort logs by timestamp, most recent first
-    logs.sort(key=lambda x: x['timestamp'], reverse=True)
-    
-    for entry in logs:
-        log_time = datetime.fromisoformat(entry['timestamp'])
-        if current_time - log_time <= timedelta(hours=hours):
-            print(f"Timestamp: {entry['timestamp']}")
-            print("Inputs:")
-            pprint(entry['inputs'])
-            print("\nGenerated Prompt:")
-            print(entry['generated_prompt'])
-            print("\n" + "="*50 + "\n")
-        else:
-            break  # Stop when we reach logs older than specified hours
+    # Most recent first, stopping at the first entry older than the window
+    for entry in iter_recent_entries(log_file, datetime.now() - timedelta(hours=hours)):
+        print_entry(entry)
+
+CATEGORY_FIELDS = ("style", "camera_shot", "camera_move", "length", "mode")
+USAGE_FIELDS = ("input_tokens", "output_tokens", "total_tokens", "cost_usd")
+PERCENTILES = (50, 90, 95, 99)
+WORD_BUCKETS = (10, 20, 30, 50, 75, 100, 150, 200, 300)
+
+class LogColumns:
+    """Prompt log entries reduced to one typed array per field, filled in a single pass.
+
+    Categorical fields are stored as integer codes into a per-field list of values,
+    numbers as doubles with NaN where an entry did not record them. Entries are
+    not kept, so memory grows by a few dozen bytes per entry.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.first = None
+        self.last = None
+        self.values: Dict[str, List[str]] = {field: [] for field in CATEGORY_FIELDS + ("hour",)}
+        self._codes_of: Dict[str, Dict[str, int]] = {field: {} for field in self.values}
+        self.codes: Dict[str, array] = {field: array("i") for field in self.values}
+        self.prompt_words = array("i")
+        self.prompt_chars = array("i")
+        self.numbers: Dict[str, array] = {field: array("d") for field in USAGE_FIELDS + ("latency_ms",)}
+
+    def _code(self, field, value):
+        codes = self._codes_of[field]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.values[field])
+            self.values[field].append(value)
+        return code
+
+    def add(self, entry: dict) -> None:
+        inputs = entry.get("inputs") or {}
+        timestamp = entry.get("timestamp") or ""
+        for field in CATEGORY_FIELDS:
+            value = inputs.get(field)
+            self.codes[field].append(self._code(field, "" if value is None else str(value)))
+        self.codes["hour"].append(self._code("hour", timestamp[:13]))
+        prompt = entry.get("generated_prompt")
+        prompt = prompt if isinstance(prompt, str) else ""
+        self.prompt_words.append(len(prompt.split()))
+        self.prompt_chars.append(len(prompt))
+        entry_usage = entry.get("usage") or {}
+        for field in USAGE_FIELDS:
+            self.numbers[field].append(_as_number(entry_usage.get(field)))
+        self.numbers["latency_ms"].append(_as_number(entry.get("latency_ms", entry_usage.get("latency_ms"))))
+        if timestamp:
+            if self.first is None or timestamp < self.first:
+                self.first = timestamp
+            if self.last is None or timestamp > self.last:
+                self.last = timestamp
+        self.rows += 1
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[dict]) -> "LogColumns":
+        columns = cls()
+        for entry in entries:
+            if isinstance(entry, dict):
+                columns.add(entry)
+        return columns
+
+def _as_number(value):
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else math.nan
+
+def _percentile(ordered, q):
+    # Linear interpolation between closest ranks, the same method as numpy.percentile's default;
+    # the two can still differ in the last bits, as numpy computes the step differently
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def _distribution(values, use_numpy):
+    # min/mean/percentiles/max of a numeric column, ignoring NaN; None if it has no values
+    if use_numpy:
+        column = np.frombuffer(values, dtype=np.float64 if values.typecode == "d" else np.int32)
+        column = column[~np.isnan(column)] if values.typecode == "d" else column
+        if not column.size:
+            return None
+        stats = {"count": int(column.size), "min": float(column.min()), "mean": float(column.mean())}
+        for q, value in zip(PERCENTILES, np.percentile(column, PERCENTILES)):
+            stats[f"p{q}"] = float(value)
+        stats["max"] = float(column.max())
+        return stats
+    ordered = sorted(value for value in values if value == value)
+    if not ordered:
+        return None
+    stats = {"count": len(ordered), "min": float(ordered[0]), "mean": math.fsum(ordered) / len(ordered)}
+    for q in PERCENTILES:
+        stats[f"p{q}"] = float(_percentile(ordered, q))
+    stats["max"] = float(ordered[-1])
+    return stats
+
+def _code_counts(codes, size, use_numpy):
+    if use_numpy:
+        return [int(count) for count in np.bincount(np.frombuffer(codes, dtype=np.int32), minlength=size)]
+    counter = Counter(codes)
+    return [counter[code] for code in range(size)]
+
+def _word_histogram(words, use_numpy):
+    # Entries per bucket of WORD_BUCKETS, each counting prompts of up to that many words; None is the overflow
+    if use_numpy:
+        slots = np.searchsorted(WORD_BUCKETS, np.frombuffer(words, dtype=np.int32), side="left")
+        counts = np.bincount(slots, minlength=len(WORD_BUCKETS) + 1)
+    else:
+        counts = [0] * (len(WORD_BUCKETS) + 1)
+        for count in words:
+            counts[bisect_left(WORD_BUCKETS, count)] += 1
+    return [{"upto": bound, "count": int(count)} for bound, count in zip(WORD_BUCKETS + (None,), counts)]
+
+def build_report(columns: LogColumns, use_numpy: Optional[bool] = None) -> Dict[str, Any]:
+    use_numpy = np is not None if use_numpy is None else use_numpy
+    counts = {}
+    for field in CATEGORY_FIELDS:
+        per_value = zip(columns.values[field], _code_counts(columns.codes[field], len(columns.values[field]), use_numpy))
+        counts[field] = dict(sorted(((value or "(none)", n) for value, n in per_value), key=lambda item: (-item[1], item[0])))
+    by_hour = dict(sorted((hour, n) for hour, n in zip(columns.values["hour"],
+                   _code_counts(columns.codes["hour"], len(columns.values["hour"]), use_numpy)) if hour))
+    per_hour = None
+    if by_hour:
+        peak_hour = max(by_hour, key=lambda hour: (by_hour[hour], hour))
+        per_hour = {"active_hours": len(by_hour), "mean": sum(by_hour.values()) / len(by_hour),
+                    "peak": by_hour[peak_hour], "peak_hour": peak_hour, "by_hour": by_hour}
+    usage_stats = {field: _distribution(values, use_numpy) for field, values in columns.numbers.items()}
+    return {
+        "entries": columns.rows,
+        "first": columns.first,
+        "last": columns.last,
+        "counts": counts,
+        "prompt_words": {**(_distribution(columns.prompt_words, use_numpy) or {}),
+                         "histogram": _word_histogram(columns.prompt_words, use_numpy)},
+        "prompt_chars": _distribution(columns.prompt_chars, use_numpy),
+        "per_hour": per_hour,
+        # Entries whose usage is marked shared_call repeat the one call made for all lengths of a shot
+        "usage": {field: stats for field, stats in usage_stats.items() if stats is not None},
+    }
+
+def _format_number(value):
+    if isinstance(value, float) and not value.is_integer():
+        return f"{value:.4g}" if abs(value) < 1 else f"{value:.1f}"
+    return f"{int(value)}" if isinstance(value, float) else str(value)
+
+def _format_table(rows, headers):
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    lines = [headers, ["-" * width for width in widths]] + list(rows)
+    return "\n".join("  ".join(str(cell).ljust(width) for cell, width in zip(line, widths)).rstrip() for line in lines)
+
+def format_report(report: Dict[str, Any], top: int = 10) -> str:
+    sections = [f"Entries: {report['entries']}  ({report['first']} .. {report['last']})"]
+    for field, counts in report["counts"].items():
+        rows = [(value, n, f"{100 * n / report['entries']:.1f}%") for value, n in list(counts.items())[:top]]
+        if len(counts) > top:
+            rows.append((f"({len(counts) - top} more)", sum(list(counts.values())[top:]), ""))
+        sections.append(f"By {field}:\n" + _format_table(rows, (field, "entries", "share")))
+    stat_names = ("count", "min", "mean") + tuple(f"p{q}" for q in PERCENTILES) + ("max",)
+    distributions = [("prompt_words", report["prompt_words"]), ("prompt_chars", report["prompt_chars"])]
+    distributions += list(report["usage"].items())
+    rows = [(name,) + tuple(_format_number(stats[key]) for key in stat_names)
+            for name, stats in distributions if stats and "count" in stats]
+    if rows:
+        sections.append("Distributions:\n" + _format_table(rows, ("field",) + stat_names))
+    histogram = [(f"<= {bucket['upto']}" if bucket["upto"] else f"> {WORD_BUCKETS[-1]}", bucket["count"])
+                 for bucket in report["prompt_words"]["histogram"]]
+    sections.append("Prompt words:\n" + _format_table(histogram, ("words", "entries")))
+    per_hour = report["per_hour"]
+    if per_hour:
+        sections.append(f"Per hour: {per_hour['mean']:.1f} mean over {per_hour['active_hours']} active hours, "
+                        f"peak {per_hour['peak']} at {per_hour['peak_hour']}")
+    return "\n\n".join(sections)
+
+def report_log(log_file="prompt_log.json", since=None, until=None, use_numpy: Optional[bool] = None) -> Dict[str, Any]:
+    # One pass over the log (rotated segments included), keeping only the column arrays
+    return build_report(LogColumns.from_entries(query_log(log_file, since, until)), use_numpy)
+
+def main():
+    parser = argparse.ArgumentParser(description="Show prompt log entries")
+    parser.add_argument("--log-file", default="prompt_log.json")
+    parser.add_argument("--hours", type=float, default=24, help="Show the last N hours, newest first")
+    parser.add_argument("--since", help="ISO timestamp; with --until, shows that range oldest first")
+    parser.add_argument("--until", help="ISO timestamp")
+    parser.add_argument("--report", choices=("table", "json"),
+                        help="Summarise the whole log (or --since/--until range) instead of printing entries")
+    args = parser.parse_args()
+    if args.report:
+        report = report_log(args.log_file, args.since, args.until)
+        print(json.dumps(report, indent=2) if args.report == "json" else format_report(report))
+    elif args.since or args.until:
+        for entry in query_log(args.log_file, args.since, args.until):
+            print_entry(entry)
+    else:
+        analyze_log(args.log_file, args.hours)
 
 if __name__ == "__main__":
-    analyze_log()
+    main()
@@ -0,0 +1,124 @@
+# log_writer.py
+
+import atexit
+import logging
+import queue
+import threading
+import time
+import weakref
+from typing import Callable, List, Optional
+
+_STOP = object()
+_writers: "weakref.WeakSet[BufferedLogWriter]" = weakref.WeakSet()
+
+class BufferedLogWriter:
+    """Appends lines to a file from a background thread, so callers never wait on disk I/O.
+
+    write() only enqueues. Queued lines are written in batches when max_batch
+    lines are waiting, flush_interval seconds after the oldest one arrived,
+    and on flush(), close() or interpreter exit. on_batch, if given, is called
+    on the writer thread with each batch after it is written, and submit()
+    queues other work on the file to run there in order with the writes.
+    """
+
+    def __init__(self, path: str, max_batch: int = 64, flush_interval: float = 0.5,
+                 on_batch: Optional[Callable[[List[str]], None]] = None):
+        self.path = path
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.on_batch = on_batch
+        self.lines_written = 0
+        self.batches_written = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def write(self, line: str) -> None:
+        self._put(line)
+
+    def submit(self, task: Callable[[], None]) -> None:
+        # Runs task on the writer thread once the lines written before it are on disk, so slow work
+        # on the file (such as compressing it) never holds up the caller
+        self._put(task)
+
+    def _put(self, item) -> None:
+        with self._lock:
+            if self._closed:
+                raise ValueError(f"Log writer for {self.path} is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"log-writer:{self.path}", daemon=True)
+                self._thread.start()
+                _writers.add(self)
+        self._queue.put(item)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        # Blocks until every line written before the call is on disk; False if the timeout ran out
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        pending: List[str] = []
+        waiters: List[threading.Event] = []
+        deadline = None
+        while True:
+            try:
+                item = self._queue.get(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None  # The oldest pending line has waited flush_interval
+            if isinstance(item, str):
+                pending.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(pending) < self.max_batch:
+                    continue
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            self._write(pending)
+            pending = []
+            deadline = None
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+            if item is _STOP:
+                return
+            if callable(item):
+                try:
+                    item()
+                except Exception:
+                    logging.exception(f"Error in background task for {self.path}")
+
+    def _write(self, lines: List[str]) -> None:
+        if not lines:
+            return
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+            self.lines_written += len(lines)
+            self.batches_written += 1
+        except OSError:
+            logging.exception(f"Could not write {len(lines)} log entries to {self.path}")
+            return
+        if self.on_batch is not None:
+            try:
+                self.on_batch(lines)
+            except Exception:
+                logging.exception(f"Error after writing log entries to {self.path}")
+
+@atexit.register
+def _close_all() -> None:
+    for writer in list(_writers):
+        writer.close(timeout=5)
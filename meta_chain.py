@@ -2,17 +2,99 @@
 
 # meta_chain.py
 
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
 from langchain_core.runnables import RunnableSequence
-from langchain.chains import LLMChain
+import asyncio
 import json
-from typing import List, Dict, Optional
+import re
+import time
+from typing import AsyncIterator, Callable, List, Dict, Optional, Sequence, Tuple
 import logging
 import os
 from prompt_manager import PromptManager
+from llm_clients import get_chat_model
+from llm_cache import response_cache
+from template_registry import templates
+from request_scheduler import scheduler, estimate_tokens
+from single_flight import single_flight
+from metrics import metrics
+from usage import usage
+from prompt_summarizer import WORD_BUDGETS, summarize_prompt
 from meta_chain_exceptions import PromptGenerationError, ScriptAnalysisError, ModelInvocationError
 
+PROMPT_LENGTHS = ("concise", "normal", "detailed")
+GENERATION_MODES = ("per_length", "single_call", "fast")  # fast: one detailed call, shorter lengths summarised locally
+MODEL_NAME = "gpt-4o-mini"
+# One focus per parallel variation request, so each sample asks for something different
+VARIATION_FOCUSES = ("lighting", "composition", "atmosphere", "color palette", "camera angle", "texture and detail",
+                     "time of day", "weather", "lens and depth of field", "movement")
+PROMPT_INPUTS = ["style", "shot_description", "directors_notes", "highlighted_text", "full_script", "subject_info", "end_parameters"]
+
+LENGTH_PROMPT_TEMPLATE = """
+        Generate a {length} prompt based on the following information:
+        Subjects: {subject_info}
+        Shot Description: {shot_description}
+        Director's Notes: {directors_notes}
+        Highlighted Script: {highlighted_text}
+        
+        Full Script: {full_script}
+        
+        The prompt should follow this structure:
+        {style} [Subject] [Action/Pose] in [Context/Setting], [Time of Day], [Weather Conditions], [Composition], [Foreground Elements], [Background Elements], [Mood/Atmosphere], [Props/Objects], [Environmental Effects] {end_parameters}
+
+        Important: Describe the scene positively. Don't use phrases like "no additional props" or "no objects present". Instead, focus on what is in the scene.
+
+        {length} Prompt:
+        """
+
+MULTI_LENGTH_PROMPT_TEMPLATE = """
+        Generate three prompts of different lengths based on the following information:
+        Subjects: {subject_info}
+        Shot Description: {shot_description}
+        Director's Notes: {directors_notes}
+        Highlighted Script: {highlighted_text}
+        Full Script: {full_script}
+
+        Each prompt should follow this structure:
+        {style} [Subject] [Action/Pose] in [Context/Setting], [Time of Day], [Weather Conditions], [Composition], [Foreground Elements], [Background Elements], [Mood/Atmosphere], [Props/Objects], [Environmental Effects] {end_parameters}
+
+        Important: Describe the scene positively. Don't use phrases like "no additional props" or "no objects present". Instead, focus on what is in the scene.
+
+        Respond with only a JSON object, without any other text, using exactly these keys:
+        {{"concise": "<concise prompt, about 20 words>", "normal": "<normal prompt, about 50 words>", "detailed": "<detailed prompt, about 100 words>"}}
+        """
+
+REFINE_PROMPT_TEMPLATE = """
+            Initial Prompt: {initial_prompt}
+            
+            User Feedback: {feedback}
+            
+            Based on the initial prompt and the user's feedback, generate a refined visual prompt that addresses the feedback while maintaining the core elements of the original prompt.
+            
+            Refined Prompt:
+            """
+
+PROMPT_VARIATIONS_TEMPLATE = """
+            Base Prompt: {base_prompt}
+            
+            Generate {num_variations} variations of the above prompt, each maintaining the core elements but with different focuses or slight alterations in style or atmosphere.
+            
+            Variations:
+            """
+
+PROMPT_VARIATION_TEMPLATE = """
+            Base Prompt: {base_prompt}
+            
+            Generate one variation of the above prompt that keeps its core elements but shifts the emphasis toward {focus}. This is variation {number} of {total}.
+            
+            Variation:
+            """
+
+templates.register("length_prompt", LENGTH_PROMPT_TEMPLATE, PROMPT_INPUTS + ["length"])
+templates.register("multi_length_prompt", MULTI_LENGTH_PROMPT_TEMPLATE, PROMPT_INPUTS)
+templates.register("refine_prompt", REFINE_PROMPT_TEMPLATE, ["initial_prompt", "feedback"])
+templates.register("prompt_variations", PROMPT_VARIATIONS_TEMPLATE, ["base_prompt", "num_variations"])
+templates.register("prompt_variation", PROMPT_VARIATION_TEMPLATE, ["base_prompt", "focus", "number", "total"])
+
 class DirectorStyle:
     def __init__(self, name: str, camera_techniques: List[str], visual_aesthetics: List[str], 
                  pacing: str, shot_compositions: List[str]):
@@ -44,84 +126,336 @@ class DirectorStyle:
 class MetaChain:
     def __init__(self, core):
         self.core = core
-        self.llm = None  # Initialize as None
+        self.temperature = None  # Set by generate_prompt and stream_prompt
+        self.last_stream_stats = {}
+        self.cache = response_cache
+        self.single_flight = single_flight
         self.director_styles = {"Default": {}}  # Add more styles as needed
         self.prompt_manager = PromptManager()
 
     def _initialize_llm(self, temperature: float):
-        self.llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=temperature)
+        self.temperature = temperature
+
+    @property
+    def llm(self):
+        # Looked up on each use so a client rebuilt after the API key changes is picked up
+        return get_chat_model(MODEL_NAME, self.temperature) if self.temperature is not None else None
 
     async def generate_prompt(self, active_subjects: list = None,
                               style: str = "", shot_description: str = "", directors_notes: str = "",
                               highlighted_text: str = "", full_script: str = "", end_parameters: str = "",
-                              temperature: float = 0.7) -> Dict[str, str]:
+                              temperature: float = 0.7, max_concurrency: Optional[int] = None,
+                              mode: str = "per_length",
+                              on_chunk: Optional[Callable[[str, str], None]] = None,
+                              lengths: Optional[Sequence[str]] = None) -> Dict[str, str]:
         try:
+            if mode not in GENERATION_MODES:
+                raise ValueError(f"Unknown generation mode: {mode}")
+            lengths = self._check_lengths(lengths)
+
             self._initialize_llm(temperature)
-            subject_info = self._format_subject_info(active_subjects)
-            
-            templates = {
-                "concise": self._get_prompt_template("concise (about 20 words)"),
-                "normal": self._get_prompt_template("normal (about 50 words)"),
-                "detailed": self._get_prompt_template("detailed (about 100 words)")
-            }
-
-            results = {}
-            for length, template in templates.items():
-                chain = RunnableSequence(template | self.llm)
-                try:
-                    result = await chain.ainvoke({
-                        "style": style,
-                        "shot_description": shot_description,
-                        "directors_notes": directors_notes,
-                        "highlighted_text": highlighted_text,
-                        "full_script": full_script,
-                        "subject_info": subject_info,
-                        "end_parameters": end_parameters,
-                        "length": length
-                    })
-                    results[length] = self._post_process_prompt(result.content.strip(), style, end_parameters)
-                except Exception as e:
-                    raise ModelInvocationError(f"Error invoking model for {length} prompt: {str(e)}")
+            inputs = self._build_inputs(active_subjects, style, shot_description, directors_notes,
+                                        highlighted_text, full_script, end_parameters)
 
-            return results
+            if mode == "fast":
+                return await self._generate_fast(inputs, max_concurrency, on_chunk, lengths)
+
+            if mode == "single_call":
+                results = await self._generate_single_call(inputs)
+                if results is not None:
+                    return {length: results[length] for length in lengths}
+                logging.warning("Single-call response was not valid JSON; falling back to per-length generation")
+
+            if on_chunk is not None:
+                return await self._generate_streamed(inputs, max_concurrency, on_chunk, lengths)
+            return await self._generate_per_length(inputs, max_concurrency, lengths)
         except Exception as e:
             logging.exception("Error in MetaChain.generate_prompt")
             raise PromptGenerationError(f"Failed to generate prompt: {str(e)}")
 
-    def _post_process_prompt(self, prompt: str, style: str, end_parameters: str) -> str:
-        prompt = prompt.replace("Concise Prompt:", "").replace("Normal Prompt:", "").replace("Detailed Prompt:", "").strip()
-        if end_parameters in prompt:
-            prompt = prompt.replace(end_parameters, "").strip()
-        return prompt
+    async def stream_prompt(self, active_subjects: list = None,
+                            style: str = "", shot_description: str = "", directors_notes: str = "",
+                            highlighted_text: str = "", full_script: str = "", end_parameters: str = "",
+                            temperature: float = 0.7,
+                            max_concurrency: Optional[int] = None,
+                            lengths: Optional[Sequence[str]] = None) -> AsyncIterator[Tuple[str, str]]:
+        lengths = self._check_lengths(lengths)
+        self._initialize_llm(temperature)
+        inputs = self._build_inputs(active_subjects, style, shot_description, directors_notes,
+                                    highlighted_text, full_script, end_parameters)
+        async for event in self._stream_lengths(inputs, max_concurrency, lengths):
+            yield event
 
-    def _get_prompt_template(self, length: str) -> PromptTemplate:
-        base_template = """
-        Generate a {length} prompt based on the following information:
-        Subjects: {subject_info}
-        Shot Description: {shot_description}
-        Director's Notes: {directors_notes}
-        Highlighted Script: {highlighted_text}
-        """
+    @staticmethod
+    def _check_lengths(lengths: Optional[Sequence[str]]) -> Tuple[str, ...]:
+        if lengths is None:
+            return PROMPT_LENGTHS
+        unknown = [length for length in lengths if length not in PROMPT_LENGTHS]
+        if unknown:
+            raise ValueError(f"Unknown prompt length(s): {', '.join(unknown)}")
+        return tuple(length for length in PROMPT_LENGTHS if length in lengths)
 
-        # Only include Full Script if it's not empty (i.e., when stick_to_script is True)
-        base_template += """
-        Full Script: {full_script}
-        """ if "{full_script}" else ""
+    async def _stream_lengths(self, inputs: Dict[str, str], max_concurrency: Optional[int] = None,
+                              lengths: Sequence[str] = PROMPT_LENGTHS) -> AsyncIterator[Tuple[str, str]]:
+        # Each length streams into a shared queue so chunks are yielded as soon as any model emits them
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        queue: asyncio.Queue = asyncio.Queue()
+        started = time.perf_counter()
+        first_token: Dict[str, float] = {}
+        self.last_stream_stats = {"time_to_first_token": first_token, "total_seconds": None}
 
-        base_template += """
-        The prompt should follow this structure:
-        {style} [Subject] [Action/Pose] in [Context/Setting], [Time of Day], [Weather Conditions], [Composition], [Foreground Elements], [Background Elements], [Mood/Atmosphere], [Props/Objects], [Environmental Effects] {end_parameters}
+        async def pump(length: str) -> None:
+            with metrics.span("render_template", template="length_prompt"):
+                prompt_text = templates.render("length_prompt", **inputs, length=length)
+            llm = self.llm
+            key = self._cache_key(prompt_text, llm)
+            streamed = False
 
-        Important: Describe the scene positively. Don't use phrases like "no additional props" or "no objects present". Instead, focus on what is in the scene.
+            async def timed_stream():
+                # Timed per attempt, so scheduler waits and retry backoff are not counted as model time
+                with metrics.span("llm_stream", template="length_prompt", model=llm.model_name):
+                    async for chunk in llm.astream(prompt_text):
+                        yield chunk
 
-        {length} Prompt:
-        """
+            async def stream_uncached() -> str:
+                nonlocal streamed
+                streamed = True
+                if semaphore is not None:
+                    await semaphore.acquire()
+                try:
+                    parts = []
+                    async for chunk in scheduler.stream(timed_stream, estimate_tokens(prompt_text)):
+                        if chunk.content:
+                            if length not in first_token:
+                                first_token[length] = time.perf_counter() - started
+                                metrics.observe("promptforge_time_to_first_token_seconds", first_token[length])
+                            parts.append(chunk.content)
+                            await queue.put((length, chunk.content))
+                    content = "".join(parts)
+                    self.cache.set(key, content)
+                    usage.attribute_inputs(inputs, prompt_text)
+                    return content
+                finally:
+                    if semaphore is not None:
+                        semaphore.release()
+
+            try:
+                with usage.label(length):
+                    content = self.cache.get(key)
+                    if content is None:
+                        content = await self.single_flight.do(key, stream_uncached)
+                    else:
+                        usage.record_cached()
+                if not streamed:
+                    # Served from the cache or from an identical request already in flight
+                    first_token[length] = time.perf_counter() - started
+                    await queue.put((length, content))
+            except Exception as e:
+                await queue.put((length, ModelInvocationError(f"Error invoking model for {length} prompt: {str(e)}")))
+            finally:
+                await queue.put((length, None))
+
+        tasks = [asyncio.create_task(pump(length)) for length in lengths]
+        errors = []
+        try:
+            remaining = len(tasks)
+            while remaining:
+                length, item = await queue.get()
+                if item is None:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    logging.error(str(item))
+                    errors.append(item)
+                else:
+                    yield length, item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        self.last_stream_stats["total_seconds"] = time.perf_counter() - started
+        logging.info(f"Prompt stream finished; time to first token: {first_token}")
+        self._raise_length_errors(errors)
+
+    async def _generate_streamed(self, inputs: Dict[str, str], max_concurrency: Optional[int],
+                                 on_chunk: Callable[[str, str], None],
+                                 lengths: Sequence[str] = PROMPT_LENGTHS) -> Dict[str, str]:
+        parts: Dict[str, List[str]] = {length: [] for length in lengths}
+        async for length, chunk in self._stream_lengths(inputs, max_concurrency, lengths):
+            parts[length].append(chunk)
+            on_chunk(length, chunk)
+        return {
+            length: self._post_process_prompt("".join(chunks).strip(), inputs["style"], inputs["end_parameters"])
+            for length, chunks in parts.items()
+        }
+
+    async def _generate_fast(self, inputs: Dict[str, str], max_concurrency: Optional[int],
+                             on_chunk: Optional[Callable[[str, str], None]],
+                             lengths: Sequence[str] = PROMPT_LENGTHS) -> Dict[str, str]:
+        if on_chunk is not None:
+            detailed = (await self._generate_streamed(inputs, max_concurrency, on_chunk, ("detailed",)))["detailed"]
+        else:
+            detailed = (await self._generate_per_length(inputs, max_concurrency, ("detailed",)))["detailed"]
+        return self.complete_fast(detailed, lengths, on_chunk)
+
+    def complete_fast(self, detailed: str, lengths: Sequence[str] = PROMPT_LENGTHS,
+                      on_chunk: Optional[Callable[[str, str], None]] = None) -> Dict[str, str]:
+        # The fast-mode result for lengths given the detailed prompt; the shorter ones are sent to on_chunk whole
+        derived = self.derive_lengths(detailed, [length for length in lengths if length != "detailed"])
+        if on_chunk is not None:
+            for length, prompt in derived.items():
+                on_chunk(length, prompt)
+        return {length: detailed if length == "detailed" else derived[length] for length in lengths}
+
+    @staticmethod
+    def derive_lengths(detailed: str, lengths: Sequence[str]) -> Dict[str, str]:
+        # Shorter prompts cut down from a detailed one without a model call
+        derived = {}
+        for length in lengths:
+            with metrics.span("summarize", length=length):
+                derived[length] = summarize_prompt(detailed, WORD_BUDGETS[length])
+        return derived
+
+    def _build_inputs(self, active_subjects: Optional[list], style: str, shot_description: str,
+                      directors_notes: str, highlighted_text: str, full_script: str,
+                      end_parameters: str) -> Dict[str, str]:
+        with metrics.span("format_subjects"):
+            subject_info = self._format_subject_info(active_subjects)
+        return {
+            "style": style,
+            "shot_description": shot_description,
+            "directors_notes": directors_notes,
+            "highlighted_text": highlighted_text,
+            "full_script": full_script,
+            "subject_info": subject_info,
+            "end_parameters": end_parameters
+        }
 
-        return PromptTemplate(
-            input_variables=["style", "shot_description", "directors_notes", "highlighted_text", "full_script", "subject_info", "end_parameters", "length"],
-            template=base_template
+    @staticmethod
+    def _raise_length_errors(errors: List[BaseException]) -> None:
+        if len(errors) == 1:
+            raise errors[0]
+        if errors:
+            raise ModelInvocationError("; ".join(str(e) for e in errors))
+
+    async def _generate_per_length(self, inputs: Dict[str, str], max_concurrency: Optional[int] = None,
+                                   lengths: Sequence[str] = PROMPT_LENGTHS) -> Dict[str, str]:
+        # All lengths go out at once; the optional semaphore caps how many are in flight
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        async def invoke(length: str) -> str:
+            with metrics.span("render_template", template="length_prompt"):
+                prompt_text = templates.render("length_prompt", **inputs, length=length)
+            try:
+                with usage.label(length):
+                    if semaphore is None:
+                        content = await self._invoke_cached(prompt_text, inputs)
+                    else:
+                        async with semaphore:
+                            content = await self._invoke_cached(prompt_text, inputs)
+                return self._post_process_prompt(content.strip(), inputs["style"], inputs["end_parameters"])
+            except Exception as e:
+                raise ModelInvocationError(f"Error invoking model for {length} prompt: {str(e)}")
+
+        outcomes = await asyncio.gather(
+            *(invoke(length) for length in lengths),
+            return_exceptions=True
         )
 
+        results = {}
+        errors = []
+        for length, outcome in zip(lengths, outcomes):
+            if isinstance(outcome, BaseException):
+                logging.error(str(outcome))
+                errors.append(outcome)
+            else:
+                results[length] = outcome
+
+        self._raise_length_errors(errors)
+        return results
+
+    async def _generate_single_call(self, inputs: Dict[str, str]) -> Optional[Dict[str, str]]:
+        with metrics.span("render_template", template="multi_length_prompt"):
+            prompt_text = templates.render("multi_length_prompt", **inputs)
+        try:
+            with usage.label("combined"):
+                content = await self._invoke_cached(prompt_text, inputs)
+        except Exception as e:
+            raise ModelInvocationError(f"Error invoking model for combined prompt: {str(e)}")
+
+        parsed = self._parse_multi_length_response(content)
+        if parsed is None:
+            return None
+        return {
+            length: self._post_process_prompt(prompt, inputs["style"], inputs["end_parameters"])
+            for length, prompt in parsed.items()
+        }
+
+    def _cache_key(self, prompt_text: str, llm=None) -> str:
+        llm = llm or self.llm
+        return self.cache.make_key(prompt_text, llm.model_name, llm.temperature)
+
+    async def _invoke_cached(self, prompt_text: str, inputs: Optional[Dict[str, str]] = None, llm=None,
+                             cache: bool = True) -> str:
+        # llm defaults to the handle set up by generate_prompt; other callers pass their own.
+        # cache=False always sends a fresh request, for samples that are meant to differ between calls.
+        llm = llm or self.llm
+        key = self._cache_key(prompt_text, llm)
+        if cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                usage.record_cached()
+                return cached
+
+        async def call():
+            # Timed per attempt, so scheduler waits and retry backoff are not counted as model time
+            with metrics.span("llm_call", model=llm.model_name):
+                return await llm.ainvoke(prompt_text)
+
+        async def invoke() -> str:
+            result = await scheduler.run(call, estimate_tokens(prompt_text))
+            if cache:
+                self.cache.set(key, result.content)
+            if inputs:
+                usage.attribute_inputs(inputs, prompt_text)
+            return result.content
+
+        if not cache:
+            return await invoke()
+        # Identical requests already on the wire are joined instead of sent again
+        return await self.single_flight.do(key, invoke)
+
+    @staticmethod
+    def _parse_multi_length_response(text: str) -> Optional[Dict[str, str]]:
+        # Models often wrap JSON in code fences or add a sentence around it, so only
+        # the outermost {...} block is parsed and key spelling is normalised
+        text = re.sub(r"```(?:json)?", "", text or "", flags=re.IGNORECASE)
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            return None
+        try:
+            data = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(data, dict):
+            return None
+
+        prompts = {}
+        for key, value in data.items():
+            length = str(key).lower().replace("prompt", "").strip(" _-:")
+            if length in PROMPT_LENGTHS and isinstance(value, str) and value.strip():
+                prompts[length] = value.strip()
+
+        if set(prompts) != set(PROMPT_LENGTHS):
+            return None
+        return {length: prompts[length] for length in PROMPT_LENGTHS}
+
+    def _post_process_prompt(self, prompt: str, style: str, end_parameters: str) -> str:
+        with metrics.span("post_process"):
+            prompt = prompt.replace("Concise Prompt:", "").replace("Normal Prompt:", "").replace("Detailed Prompt:", "").strip()
+            if end_parameters in prompt:
+                prompt = prompt.replace(end_parameters, "").strip()
+            return prompt
+
     def _format_subject_info(self, active_subjects: List[Dict]) -> str:
         if not active_subjects:
             return "No active subjects"
@@ -170,45 +504,70 @@ class MetaChain:
         
         return output
 
-    def refine_prompt(self, initial_prompt: str, feedback: str) -> str:
-        refine_template = PromptTemplate(
-            input_variables=["initial_prompt", "feedback"],
-            template="""
-            Initial Prompt: {initial_prompt}
-            
-            User Feedback: {feedback}
-            
-            Based on the initial prompt and the user's feedback, generate a refined visual prompt that addresses the feedback while maintaining the core elements of the original prompt.
-            
-            Refined Prompt:
-            """
-        )
+    def _configured_llm(self, temperature: Optional[float] = None):
+        # The model at the core's temperature unless one is given, independent of any generate_prompt call
+        return get_chat_model(MODEL_NAME, self.core.temperature if temperature is None else temperature)
+
+    async def arefine_prompt(self, initial_prompt: str, feedback: str, temperature: Optional[float] = None) -> str:
+        # Uses its own model handle, so it is safe alongside generate_prompt and other refinements
+        with metrics.span("render_template", template="refine_prompt"):
+            prompt_text = templates.render("refine_prompt", initial_prompt=initial_prompt, feedback=feedback)
+        try:
+            with usage.label("refine"):
+                content = await self._invoke_cached(prompt_text, llm=self._configured_llm(temperature))
+        except Exception as e:
+            raise ModelInvocationError(f"Error invoking model for refined prompt: {str(e)}")
+        return content.replace("Refined Prompt:", "").strip()
+
+    async def agenerate_variations(self, base_prompt: str, num_variations: int = 3,
+                                   temperature: Optional[float] = None) -> List[str]:
+        # One request per variation, all in flight together; each asks for a different focus.
+        # Never answered from the cache, so asking again gives new samples.
+        llm = self._configured_llm(temperature)
+
+        async def variation(number: int) -> str:
+            focus = VARIATION_FOCUSES[(number - 1) % len(VARIATION_FOCUSES)]
+            with metrics.span("render_template", template="prompt_variation"):
+                prompt_text = templates.render("prompt_variation", base_prompt=base_prompt, focus=focus,
+                                               number=number, total=num_variations)
+            with usage.label("variation"):
+                content = await self._invoke_cached(prompt_text, llm=llm, cache=False)
+            return re.sub(r"^\s*(?:Variation\s*\d*\s*:|\d+[.)])\s*", "", content.strip(), flags=re.IGNORECASE)
 
-        refine_chain = RunnableSequence(refine_template | self.llm)
-        result = refine_chain.invoke({
+        outcomes = await asyncio.gather(*(variation(n) for n in range(1, num_variations + 1)), return_exceptions=True)
+        variations = [outcome for outcome in outcomes if not isinstance(outcome, BaseException) and outcome]
+        errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+        for error in errors:
+            logging.error(f"Error generating prompt variation: {str(error)}")
+        if not variations and errors:
+            raise ModelInvocationError(f"Error invoking model for prompt variations: {str(errors[0])}")
+        return variations
+
+    def refine_prompt(self, initial_prompt: str, feedback: str) -> str:
+        # Blocking; prefer arefine_prompt from the UI event loop
+        refine_chain = RunnableSequence(templates.get("refine_prompt") | self._configured_llm())
+        inputs = {
             "initial_prompt": initial_prompt,
             "feedback": feedback
-        })
+        }
+        result = scheduler.run_sync(
+            lambda: refine_chain.invoke(inputs),
+            estimate_tokens(templates.render("refine_prompt", **inputs))
+        )
 
         return result.content
 
     def generate_variations(self, base_prompt: str, num_variations: int = 3) -> List[str]:
-        variation_template = PromptTemplate(
-            input_variables=["base_prompt", "num_variations"],
-            template="""
-            Base Prompt: {base_prompt}
-            
-            Generate {num_variations} variations of the above prompt, each maintaining the core elements but with different focuses or slight alterations in style or atmosphere.
-            
-            Variations:
-            """
-        )
-
-        variation_chain = RunnableSequence(variation_template | self.llm)
-        result = variation_chain.invoke({
+        # Blocking; prefer agenerate_variations from the UI event loop
+        variation_chain = RunnableSequence(templates.get("prompt_variations") | self._configured_llm())
+        inputs = {
             "base_prompt": base_prompt,
             "num_variations": num_variations
-        })
+        }
+        result = scheduler.run_sync(
+            lambda: variation_chain.invoke(inputs),
+            estimate_tokens(templates.render("prompt_variations", **inputs))
+        )
 
         # Parse the results into a list of variations
         variations = result.content.split('\n')
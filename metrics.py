@@ -0,0 +1,143 @@
+# metrics.py
+
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+STAGE_METRIC = "promptforge_stage_seconds"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # The last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        # Linear interpolation inside the bucket holding the q-th observation, as Prometheus does
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= target:
+                lower = self.buckets[i - 1] if i else 0.0
+                if i == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[i] - lower) * (target - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+class MetricsRegistry:
+    """In-process histograms keyed by metric name and labels.
+
+    span() times a block into promptforge_stage_seconds{stage=...}, marking
+    whether it raised. Snapshots can be rendered as Prometheus text or JSON.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.enabled = True
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, stage: str, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.observe(STAGE_METRIC, time.perf_counter() - start, stage=stage, status=status, **labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def to_dict(self) -> Dict[str, List[Dict[str, Any]]]:
+        with self._lock:
+            result = {}
+            for name, series in sorted(self._histograms.items()):
+                result[name] = [
+                    {
+                        "labels": dict(key),
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "p50": histogram.quantile(0.5),
+                        "p95": histogram.quantile(0.95),
+                        "p99": histogram.quantile(0.99),
+                        "buckets": {_format_bound(bound): count for bound, count
+                                    in zip(histogram.buckets + (math.inf,), _cumulative(histogram.counts))}
+                    }
+                    for key, histogram in sorted(series.items())
+                ]
+            return result
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(series.items()):
+                    for bound, count in zip(histogram.buckets + (math.inf,), _cumulative(histogram.counts)):
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', _format_bound(bound)),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str, fmt: str = "json") -> None:
+        text = self.to_prometheus() if fmt == "prometheus" else self.to_json()
+        with open(path, "w") as f:
+            f.write(text)
+
+def _cumulative(counts: List[int]) -> List[int]:
+    total = 0
+    result = []
+    for count in counts:
+        total += count
+        result.append(total)
+    return result
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == math.inf else f"{bound:g}"
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in key)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + "}"
+
+metrics = MetricsRegistry()
@@ -0,0 +1,244 @@
+# mock_llm.py
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from script_context import count_tokens
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+SUBJECTS = ["detective", "weathered sailor", "young violinist", "masked courier", "old librarian", "street artist"]
+ACTIONS = ["leaning against a doorframe", "reading a crumpled letter", "running through the crowd",
+           "staring out of a rain-streaked window", "lighting a cigarette", "turning sharply toward the camera"]
+SETTINGS = ["a cramped office", "a neon-lit alley", "an empty train platform", "a candle-lit study",
+            "a rooftop garden", "a fog-bound harbour"]
+TIMES = ["at dusk", "just after midnight", "in the early morning", "at golden hour", "under a noon sun"]
+WEATHER = ["light rain", "heavy fog", "clear skies", "drifting snow", "a rising storm"]
+COMPOSITIONS = ["rule-of-thirds framing", "a low-angle close-up", "a symmetrical wide shot",
+                "a shallow depth of field", "a Dutch angle medium shot"]
+MOODS = ["tense and brooding", "quietly hopeful", "melancholic", "dreamlike", "charged with suspense"]
+DETAILS = ["dust motes drifting in a shaft of light", "reflections pooling on wet pavement",
+           "a flickering desk lamp", "steam curling from a coffee cup", "torn posters peeling from brick",
+           "shadows cutting across the floor", "a clock frozen at quarter past three"]
+CATEGORIES = ["Main Character", "Supporting Character", "Location", "Object"]
+LENGTH_WORDS = {"concise": 20, "normal": 50, "detailed": 100}
+MAX_TRACKED_PROMPTS = 4096  # Attempt counters kept for retries; the least recently used are dropped
+
+class MockLLMError(Exception):
+    """An injected API failure carrying the status code and headers a real client error would."""
+
+    def __init__(self, message: str, status_code: int, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.headers = headers or {}
+
+class MockRateLimitError(MockLLMError):
+    def __init__(self, retry_after: float):
+        super().__init__("Mock rate limit exceeded", 429, {"retry-after": f"{retry_after:g}"})
+
+class MockServerError(MockLLMError):
+    def __init__(self):
+        super().__init__("Mock internal server error", 500)
+
+class MockChatModel(BaseChatModel):
+    """Offline stand-in for ChatOpenAI returning deterministic, template-shaped replies.
+
+    The reply depends only on the prompt, model name, temperature and seed.
+    Latency is a sampled time to first token plus the reply length divided by
+    tokens_per_second. A share of calls can fail with a 429 (with Retry-After)
+    or a 500. Retries of the same prompt draw new latencies and failures, so
+    a retried call can succeed.
+    """
+
+    model_name: str = "mock-chat"
+    temperature: float = 0.7
+    latency_ms: float = 300.0
+    latency_jitter_ms: float = 100.0
+    latency_distribution: str = "lognormal"
+    tokens_per_second: float = 60.0
+    rate_limit_error_rate: float = 0.0
+    server_error_rate: float = 0.0
+    retry_after: float = 1.0
+    seed: int = 0
+
+    _attempts: "OrderedDict[str, int]" = PrivateAttr(default_factory=OrderedDict)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "mock-chat"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "temperature": self.temperature, "seed": self.seed}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        prompt = self._prompt_text(messages)
+        first_token, text = self._plan(prompt)
+        time.sleep(first_token + self._generation_time(text))
+        return self._result(prompt, text)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        prompt = self._prompt_text(messages)
+        first_token, text = self._plan(prompt)
+        await asyncio.sleep(first_token + self._generation_time(text))
+        return self._result(prompt, text)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        prompt = self._prompt_text(messages)
+        first_token, text = self._plan(prompt)
+        time.sleep(first_token)
+        pieces = self._pieces(text)
+        for i, piece in enumerate(pieces):
+            chunk = self._chunk(piece, prompt, text if i == len(pieces) - 1 else None)
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+            time.sleep(self._generation_time(piece))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        prompt = self._prompt_text(messages)
+        first_token, text = self._plan(prompt)
+        await asyncio.sleep(first_token)
+        pieces = self._pieces(text)
+        for i, piece in enumerate(pieces):
+            chunk = self._chunk(piece, prompt, text if i == len(pieces) - 1 else None)
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+            await asyncio.sleep(self._generation_time(piece))
+
+    @staticmethod
+    def _prompt_text(messages: List[BaseMessage]) -> str:
+        return "\n".join(m.content if isinstance(m.content, str) else json.dumps(m.content) for m in messages)
+
+    def _digest(self, prompt: str) -> str:
+        return hashlib.sha256(json.dumps([self.seed, self.model_name, self.temperature, prompt]).encode("utf-8")).hexdigest()
+
+    def _plan(self, prompt: str) -> tuple:
+        # Raises an injected failure or returns (time to first token, reply text)
+        digest = self._digest(prompt)
+        with self._lock:
+            attempt = self._attempts.get(digest, 0)
+            self._attempts[digest] = attempt + 1
+            self._attempts.move_to_end(digest)
+            if len(self._attempts) > MAX_TRACKED_PROMPTS:
+                self._attempts.popitem(last=False)
+        rng = random.Random(f"{digest}:{attempt}")
+        roll = rng.random()
+        if roll < self.rate_limit_error_rate:
+            raise MockRateLimitError(self.retry_after)
+        if roll < self.rate_limit_error_rate + self.server_error_rate:
+            raise MockServerError()
+        return self._sample_latency(rng), respond(prompt, random.Random(digest))
+
+    def _sample_latency(self, rng: random.Random) -> float:
+        mean, jitter = self.latency_ms, self.latency_jitter_ms
+        if self.latency_distribution == "fixed" or jitter <= 0 or mean <= 0:
+            value = mean
+        elif self.latency_distribution == "uniform":
+            value = rng.uniform(mean - jitter, mean + jitter)
+        elif self.latency_distribution == "normal":
+            value = rng.gauss(mean, jitter)
+        elif self.latency_distribution == "lognormal":
+            # Parameterised so the samples have the configured mean and standard deviation
+            sigma = math.sqrt(math.log(1 + (jitter / mean) ** 2))
+            value = rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+        else:
+            raise ValueError(f"Unknown latency distribution {self.latency_distribution!r}, expected one of {LATENCY_DISTRIBUTIONS}")
+        return max(0.0, value) / 1000
+
+    def _generation_time(self, text: str) -> float:
+        return count_tokens(text) / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    @staticmethod
+    def _pieces(text: str) -> List[str]:
+        return re.findall(r"\S+\s*|\s+", text)
+
+    @staticmethod
+    def _usage(prompt: str, text: str) -> Dict[str, int]:
+        usage = {"input_tokens": count_tokens(prompt), "output_tokens": count_tokens(text)}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return usage
+
+    def _chunk(self, piece: str, prompt: str, full_text: Optional[str]) -> ChatGenerationChunk:
+        # Like ChatOpenAI with stream_usage, the final chunk carries the token counts
+        if full_text is None:
+            return ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        return ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=self._usage(prompt, full_text)))
+
+    def _result(self, prompt: str, text: str) -> ChatResult:
+        usage = self._usage(prompt, text)
+        message = AIMessage(
+            content=text,
+            usage_metadata=usage,
+            response_metadata={
+                "model_name": self.model_name,
+                "token_usage": {
+                    "prompt_tokens": usage["input_tokens"],
+                    "completion_tokens": usage["output_tokens"],
+                    "total_tokens": usage["total_tokens"]
+                }
+            }
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+def _visual_prompt(rng: random.Random, words: int) -> str:
+    parts = [f"A {rng.choice(SUBJECTS)} {rng.choice(ACTIONS)} in {rng.choice(SETTINGS)}", rng.choice(TIMES),
+             rng.choice(WEATHER), rng.choice(COMPOSITIONS), rng.choice(MOODS)]
+    details = DETAILS[:]
+    rng.shuffle(details)
+    while len(" ".join(parts).split()) < words:
+        parts.append(details.pop() if details else rng.choice(COMPOSITIONS + MOODS))
+    return ", ".join(parts)
+
+def respond(prompt: str, rng: random.Random) -> str:
+    """Builds a reply shaped like what the given PromptForge prompt asks for."""
+    if '"concise"' in prompt and "JSON" in prompt:
+        return json.dumps({length: _visual_prompt(rng, words) for length, words in LENGTH_WORDS.items()})
+    if "Category: [Category]" in prompt:
+        return "\n\n".join(
+            f"Name: {name.title()}\nCategory: {rng.choice(CATEGORIES)}\nDescription: {_visual_prompt(rng, 50)}."
+            for name in rng.sample(SUBJECTS, 3)
+        )
+    if "into scenes" in prompt:
+        return "\n\n".join(
+            f"Scene {i}:\nSetting: {rng.choice(SETTINGS).capitalize()}, {rng.choice(TIMES)}\n"
+            f"Characters present: {', '.join(s.title() for s in rng.sample(SUBJECTS, 2))}\n"
+            f"Key actions: The {rng.choice(SUBJECTS)} is {rng.choice(ACTIONS)}."
+            for i in range(1, rng.randint(2, 4) + 1)
+        )
+    if "Analyze the following scene" in prompt:
+        return (f"Key visual elements:\n- {rng.choice(DETAILS)}\n- {rng.choice(DETAILS)}\n"
+                f"Mood: {rng.choice(MOODS)}\nPotential camera shots: {', '.join(rng.sample(COMPOSITIONS, 2))}")
+    if "Generate one variation" in prompt:
+        return _visual_prompt(rng, 30)
+    variations = re.search(r"Generate (\d+) variations", prompt)
+    if variations:
+        return "\n".join(f"{i}. {_visual_prompt(rng, 30)}" for i in range(1, int(variations.group(1)) + 1))
+    if "visual descriptors" in prompt:
+        return ("; " if "semicolon" in prompt else ", ").join(rng.sample(DETAILS, 3))
+    if "key entities" in prompt:
+        return "\n".join(f"{name.title()}: {_visual_prompt(rng, 20)}" for name in rng.sample(SUBJECTS, 3))
+    if "summary of the context" in prompt:
+        return f"The story unfolds in {rng.choice(SETTINGS)} {rng.choice(TIMES)}; the atmosphere is {rng.choice(MOODS)}."
+    length = re.search(r"Generate an? (concise|normal|detailed) prompt", prompt)
+    return _visual_prompt(rng, LENGTH_WORDS[length.group(1)] if length else 50)
@@ -1,38 +1,638 @@
+import bisect
+import gzip
+import io
 import json
-from datetime import datetime
+import logging
+import lzma
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+# Prompt logs are JSON Lines: one entry object per line, appended and never rewritten.
+# Files from before that were a single JSON array; they are converted on first use.
+# Once the active file is too big or too old it is rotated into a compressed segment
+# (prompt_log.json.000001.gz, ...). Each segment's first and last timestamps are kept in
+# the prompt_log.json.index.json sidecar, so time-bounded reads only open segments that overlap.
+
+COMPRESSIONS = {"gzip": (".gz", gzip.open), "lzma": (".xz", lzma.open)}
+BLOCK_SIZE = 64 * 1024
+INDEX_STRIDE = 1024 * 1024  # Bytes of log between samples in the offset index
+# Held while a rotation moves entries between files and while a reader takes its snapshot
+# of the index and files (see _open_sources), so the two always agree on where each entry is
+_rotation_lock = threading.RLock()
+SEGMENT_CACHE_BYTES = 32 * 1024 * 1024  # Decompressed segments kept in memory for paging backwards
+_segment_cache = OrderedDict()
+_segment_cache_lock = threading.Lock()
+
+class LogCursor(NamedTuple):
+    # The count-th entry with this timestamp, so cursors stay valid when the file they were read from is rotated
+    timestamp: str
+    count: int
+
+def is_array_file(log_file):
+    with open(log_file, "rb") as file:
+        start = file.read(64).lstrip()
+    return start.startswith(b"[")
+
+def _decode_lines(lines, log_file):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            if not line.endswith("\n"):
+                # No newline after it: a write cut short by a crash
+                logging.warning(f"Ignoring incomplete last entry in {log_file}")
+            else:
+                logging.warning(f"Skipping unreadable entry on line {number} of {log_file}")
+
+def _iter_file_entries(log_file):
+    # Also reads array-format files, including ones that JSON lines were appended to afterwards
+    try:
+        file = open(log_file, "rb")
+    except FileNotFoundError:
+        return
+    yield from _iter_open_file_entries(file, log_file)
+
+def _iter_open_file_entries(file, log_file):
+    # Same as _iter_file_entries for a file already open in binary mode; closes it when done
+    with file:
+        is_array = file.read(64).lstrip().startswith(b"[")
+        file.seek(0)
+        text = io.TextIOWrapper(file, encoding="utf-8")
+        if not is_array:
+            yield from _decode_lines(text, log_file)
+            return
+        stripped = text.read().lstrip()
+    try:
+        entries, end = json.JSONDecoder().raw_decode(stripped)
+    except json.JSONDecodeError:
+        logging.warning(f"Could not read the entry array at the start of {log_file}")
+        return
+    yield from entries
+    yield from _decode_lines(stripped[end:].splitlines(keepends=True), log_file)
+
+def as_timestamp(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def _parse_line(line: bytes) -> Optional[dict]:
+    try:
+        entry = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None  # A partial line left by a crash, or an unreadable one
+    return entry if isinstance(entry, dict) else None
+
+def iter_lines_backwards(path, block_size: int = BLOCK_SIZE, end: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+    """Yields (offset, line) for the lines of a file last first, reading fixed-size blocks back from end.
+
+    path may also be a file already open in binary mode, which is closed when done.
+    """
+    with (open(path, "rb") if isinstance(path, str) else path) as f:
+        position = f.seek(0, os.SEEK_END) if end is None else end
+        remainder = b""
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            lines = (f.read(step) + remainder).split(b"\n")
+            remainder = lines.pop(0)  # May continue in the previous block
+            offset = position + len(remainder) + 1
+            starts = []
+            for line in lines:
+                starts.append(offset)
+                offset += len(line) + 1
+            for start, line in zip(reversed(starts), reversed(lines)):
+                if line.strip():
+                    yield start, line
+        if remainder.strip():
+            yield 0, remainder
+
+def read_lines_before(path: str, end: Optional[int] = None, limit: int = 200) -> Tuple[List[str], Optional[int]]:
+    # Up to limit text lines before byte offset end (None for the end of file), newest first,
+    # with the offset to pass as end for the page before them
+    lines = []
+    for offset, line in iter_lines_backwards(path, end=end):
+        lines.append(line.decode("utf-8", "replace").rstrip("\r"))
+        end = offset
+        if len(lines) >= limit:
+            break
+    return lines, end
+
+def read_lines_after(path: str, start: int) -> Tuple[List[str], int]:
+    # Complete text lines appended since byte offset start, with the offset to continue from;
+    # starts over if the file has been truncated or replaced by a shorter one
+    with open(path, "rb") as f:
+        if f.seek(0, os.SEEK_END) < start:
+            start = 0
+        f.seek(start)
+        data = f.read()
+    complete = data.rfind(b"\n") + 1
+    return data[:complete].decode("utf-8", "replace").splitlines(), start + complete
+
+class OffsetIndex:
+    """Sparse byte offset -> timestamp samples of a JSON Lines log, for jumping to a time range.
+
+    A sample is taken at the first line after every stride bytes. Samples are kept
+    in a sidecar file and extended as the log grows. They are rebuilt when the log
+    is replaced, for example by rotation. Timestamps are assumed to increase along
+    the file, as they do for appended entries.
+    """
+
+    def __init__(self, log_file: str, stride: int = INDEX_STRIDE, index_file: Optional[str] = None):
+        self.log_file = log_file
+        self.stride = stride
+        self.index_file = index_file or f"{log_file}.offsets.json"
+        self.samples: List[Tuple[str, int]] = []  # (timestamp, offset), in file order
+        self.indexed_bytes = 0
+        self.file_id = None
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if data.get("stride") == self.stride:
+            self.samples = [tuple(sample) for sample in data["samples"]]
+            self.indexed_bytes = data["indexed_bytes"]
+            self.file_id = data["file_id"]
+
+    def _save(self) -> None:
+        with open(f"{self.index_file}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"stride": self.stride, "file_id": self.file_id, "indexed_bytes": self.indexed_bytes,
+                       "samples": self.samples}, f)
+        os.replace(f"{self.index_file}.tmp", self.index_file)
+
+    def refresh(self) -> None:
+        # Samples only the bytes appended since the last refresh
+        try:
+            stat = os.stat(self.log_file)
+        except FileNotFoundError:
+            self.samples, self.indexed_bytes, self.file_id = [], 0, None
+            return
+        if stat.st_ino != self.file_id or stat.st_size < self.indexed_bytes:
+            self.samples, self.indexed_bytes, self.file_id = [], 0, stat.st_ino
+        if stat.st_size == self.indexed_bytes:
+            return
+        with open(self.log_file, "rb") as f:
+            f.seek(self.indexed_bytes)
+            offset = self.indexed_bytes
+            last_sample = self.samples[-1][1] if self.samples else -self.stride
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Still being written; sampled on a later refresh
+                if offset - last_sample >= self.stride:
+                    entry = _parse_line(line)
+                    if entry is not None and entry.get("timestamp"):
+                        self.samples.append((entry["timestamp"], offset))
+                        last_sample = offset
+                offset += len(line)
+        self.indexed_bytes = offset
+        self._save()
+
+    def seek_offset(self, since) -> int:
+        # Starts one sample early, so entries written slightly out of order are not missed
+        position = bisect.bisect_left([timestamp for timestamp, _ in self.samples], as_timestamp(since))
+        return self.samples[position - 2][1] if position >= 2 else 0
+
+    def end_offset(self, until) -> Optional[int]:
+        # An offset past every entry up to until, one sample late for the same reason; None for the end of file
+        position = bisect.bisect_right([timestamp for timestamp, _ in self.samples], as_timestamp(until))
+        return self.samples[position + 1][1] if position + 1 < len(self.samples) else None
+
+    def covers(self, file) -> bool:
+        # Whether the samples describe this open file, rather than one that has since replaced it
+        return os.fstat(file.fileno()).st_ino == self.file_id
+
+    def iter_range(self, since=None, until=None, file=None) -> Iterator[dict]:
+        """Yields entries of the log file with since <= timestamp <= until, oldest first.
+
+        file is an already open binary handle on the log to read instead, closed when done.
+        """
+        since, until = as_timestamp(since), as_timestamp(until)
+        self.refresh()
+        if file is None:
+            try:
+                file = open(self.log_file, "rb")
+            except FileNotFoundError:
+                return
+        with file as f:
+            f.seek(self.seek_offset(since) if since and self.covers(f) else 0)
+            for line in f:
+                entry = _parse_line(line)
+                timestamp = entry.get("timestamp") if entry else None
+                if not timestamp or (since and timestamp < since):
+                    continue
+                if until and timestamp > until:
+                    return
+                yield entry
+
+def _segment_path(log_file, segment):
+    return os.path.join(os.path.dirname(log_file), segment["file"])
+
+def _open_sources(log_file):
+    """Returns the segment index and open binary handles on the rotating and active files.
+
+    They are taken together under the rotation lock, so each entry is in exactly one of
+    them. The handles keep their contents readable even if a rotation moves or
+    compresses the files while they are being read.
+    """
+    with _rotation_lock:
+        segments = load_segment_index(log_file)
+        files = {}
+        for path in (f"{log_file}.rotating", log_file):
+            try:
+                files[path] = open(path, "rb")
+            except FileNotFoundError:
+                pass
+    return segments, files
+
+def iter_log_entries(log_file, since=None, until=None):
+    """Yields entries oldest first from the rotated segments and then the active file.
+
+    since and until (datetimes or ISO strings) keep only entries inside that window,
+    and segments whose time range lies wholly outside it are not opened at all.
+    """
+    since, until = as_timestamp(since), as_timestamp(until)
+    segments, files = _open_sources(log_file)
+    sources = []
+    for segment in segments:
+        if since and segment.get("last") and segment["last"] < since:
+            continue
+        if until and segment.get("first") and segment["first"] > until:
+            continue
+        sources.append(_iter_segment_entries(_segment_path(log_file, segment)))
+    for path, file in files.items():
+        if path == log_file and since and not file.read(64).lstrip().startswith(b"["):
+            # The offset index skips straight to since in the active file
+            sources.append(OffsetIndex(log_file).iter_range(since, until, file))
+        else:
+            file.seek(0)
+            sources.append(_iter_open_file_entries(file, path))
+    try:
+        for entries in sources:
+            for entry in entries:
+                if since or until:
+                    timestamp = entry.get("timestamp") if isinstance(entry, dict) else None
+                    if not timestamp or (since and timestamp < since) or (until and timestamp > until):
+                        continue
+                yield entry
+    finally:
+        # Handles whose entries were never reached, when the caller stopped early
+        for file in files.values():
+            file.close()
+
+def iter_segment_entries(log_file, segment):
+    # Entries of one rotated segment, oldest first
+    return _iter_segment_entries(_segment_path(log_file, segment))
+
+def _iter_segment_entries(path):
+    opener = next(opener for suffix, opener in COMPRESSIONS.values() if path.endswith(suffix))
+    try:
+        with opener(path, "rt", encoding="utf-8") as file:
+            yield from _decode_lines(file, path)
+    except FileNotFoundError:
+        logging.warning(f"Log segment {path} is listed in the index but missing")
+
+def _open_segment_plain(log_file, segment, cache=False):
+    """Returns a binary file with a segment's decompressed lines, for iter_lines_backwards, or None if it is missing.
+
+    The segment is decompressed a block at a time into a temporary file, so memory stays at one
+    block whatever its size. With cache, the result is also kept in memory while the cached
+    segments fit in SEGMENT_CACHE_BYTES, so paging back through a segment decompresses it once.
+    """
+    path = _segment_path(log_file, segment)
+    key = (path, segment.get("source"))
+    with _segment_cache_lock:
+        if key in _segment_cache:
+            _segment_cache.move_to_end(key)
+            return io.BytesIO(_segment_cache[key])
+    plain = _decompress_segment(path)
+    if plain is None or not cache:
+        return plain
+    size = plain.seek(0, os.SEEK_END)
+    if size > SEGMENT_CACHE_BYTES:
+        return plain
+    plain.seek(0)
+    data = plain.read()
+    plain.close()
+    with _segment_cache_lock:
+        _segment_cache[key] = data
+        while sum(len(cached) for cached in _segment_cache.values()) > SEGMENT_CACHE_BYTES:
+            _segment_cache.popitem(last=False)
+    return io.BytesIO(data)
+
+def _decompress_segment(path):
+    opener = next(opener for suffix, opener in COMPRESSIONS.values() if path.endswith(suffix))
+    plain = tempfile.TemporaryFile()
+    try:
+        with opener(path, "rb") as source:
+            shutil.copyfileobj(source, plain, BLOCK_SIZE)
+    except FileNotFoundError:
+        plain.close()
+        logging.warning(f"Log segment {path} is listed in the index but missing")
+        return None
+    return plain
+
+def read_log_entries(log_file, since=None, until=None):
+    return list(iter_log_entries(log_file, since, until))
+
+def iter_entries_backwards(log_file, until=None, cache=False):
+    # Entries newest first: the active file read backwards from just past until, then older files.
+    # until (a datetime or ISO string) only bounds where reading starts; entries are not filtered by it.
+    # cache keeps decompressed segments for later calls (see _open_segment_plain), e.g. for paging.
+    until = as_timestamp(until)
+    segments, files = _open_sources(log_file)
+    try:
+        active = files.get(log_file)
+        if active is not None and active.read(64).lstrip().startswith(b"["):
+            active.seek(0)
+            yield from reversed(list(_iter_open_file_entries(active, log_file)))
+        elif active is not None:
+            index = OffsetIndex(log_file) if until else None
+            end = index.end_offset(until) if index and index.covers(active) else None
+            yield from filter(None, (_parse_line(line) for _, line in iter_lines_backwards(active, end=end)))
+        rotating = files.get(f"{log_file}.rotating")
+        if rotating is not None:
+            yield from filter(None, (_parse_line(line) for _, line in iter_lines_backwards(rotating)))
+    finally:
+        for file in files.values():
+            file.close()
+    for segment in reversed(segments):
+        if until and segment.get("first") and segment["first"] > until:
+            continue
+        plain = _open_segment_plain(log_file, segment, cache)
+        if plain is not None:
+            yield from filter(None, (_parse_line(line) for _, line in iter_lines_backwards(plain)))
+
+def _with_cursors(entries):
+    last, count = None, 0
+    for entry in entries:
+        timestamp = entry.get("timestamp") if isinstance(entry, dict) else None
+        if not timestamp:
+            continue  # Cannot be addressed by a cursor
+        count = count + 1 if timestamp == last else 1
+        last = timestamp
+        yield LogCursor(timestamp, count), entry
+
+def _with_cursors_backwards(entries):
+    # Entries sharing a timestamp are gathered first, so each gets the count it has in file order
+    run = []
+    for entry in entries:
+        timestamp = entry.get("timestamp") if isinstance(entry, dict) else None
+        if not timestamp:
+            continue
+        if run and timestamp != run[0]["timestamp"]:
+            yield from ((LogCursor(e["timestamp"], len(run) - i), e) for i, e in enumerate(run))
+            run = []
+        run.append(entry)
+    yield from ((LogCursor(e["timestamp"], len(run) - i), e) for i, e in enumerate(run))
+
+def matches_filters(entry, filters):
+    # "text" matches case-insensitively in the prompt or any input; other keys must equal the input of that name
+    inputs = entry.get("inputs") or {}
+    for key, value in (filters or {}).items():
+        if value is None or value == "":
+            continue
+        if key == "text":
+            needle = str(value).lower()
+            fields = [entry.get("generated_prompt", "")] + list(inputs.values())
+            if not any(needle in str(field).lower() for field in fields):
+                return False
+        elif inputs.get(key) != value:
+            return False
+    return True
+
+def iter_logs(log_file, start=None, limit=None, filters=None, reverse=False):
+    """Yields (cursor, entry) pairs oldest first, or newest first with reverse.
+
+    Reading begins just after start, a cursor from an earlier call, or at the
+    oldest (newest with reverse) entry if it is None. It stops after limit
+    entries that pass filters (see matches_filters). Pass the last cursor back
+    as start to get the next page. Only the files and offsets that the page
+    covers are read.
+    """
+    if reverse:
+        # Cached, as each older page re-enters the segment where the previous one stopped
+        entries = iter_entries_backwards(log_file, start.timestamp if start else None, cache=True)
+        pairs = _with_cursors_backwards(entries)
+    else:
+        pairs = _with_cursors(iter_log_entries(log_file, since=start.timestamp if start else None))
+    if limit == 0:
+        return
+    returned = 0
+    for cursor, entry in pairs:
+        if start is not None and not (cursor < start if reverse else cursor > start):
+            continue
+        if not matches_filters(entry, filters):
+            continue
+        yield cursor, entry
+        returned += 1
+        if limit is not None and returned >= limit:
+            return
+
+def load_segment_index(log_file):
+    try:
+        with open(f"{log_file}.index.json", "r", encoding="utf-8") as file:
+            return json.load(file)["segments"]
+    except FileNotFoundError:
+        return []
+
+def _save_segment_index(log_file, segments):
+    index_file = f"{log_file}.index.json"
+    with open(f"{index_file}.tmp", "w", encoding="utf-8") as file:
+        json.dump({"segments": segments}, file, indent=2)
+    os.replace(f"{index_file}.tmp", index_file)
+
+def rotate_log_file(log_file, compression="gzip"):
+    """Moves the active log into a new compressed segment and indexes it.
+
+    Returns the new segment's index record, or None if there was nothing to rotate.
+    A rotation interrupted by a crash is finished by the next call.
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown log compression {compression!r}, expected one of {tuple(COMPRESSIONS)}")
+    rotating = f"{log_file}.rotating"
+    if not os.path.exists(rotating):
+        if not os.path.exists(log_file) or os.path.getsize(log_file) == 0:
+            return None
+        migrate_log_file(log_file)
+        repair_partial_line(log_file)
+        # New entries start a fresh active file while the old one is compressed
+        with _rotation_lock:
+            os.replace(log_file, rotating)
+
+    segments = load_segment_index(log_file)
+    stat = os.stat(rotating)
+    source = f"{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+    if segments and segments[-1].get("source") == source:
+        # Already compressed and indexed before an interruption; only the cleanup is left
+        with _rotation_lock:
+            os.remove(rotating)
+        return segments[-1]
+
+    suffix, opener = COMPRESSIONS[compression]
+    number = max((segment["number"] for segment in segments), default=0) + 1
+    name = f"{os.path.basename(log_file)}.{number:06d}{suffix}"
+    path = os.path.join(os.path.dirname(log_file), name)
+    first = last = None
+    entries = 0
+    with opener(f"{path}.tmp", "wt", encoding="utf-8") as target:
+        for entry in _iter_file_entries(rotating):
+            target.write(json.dumps(entry) + "\n")
+            entries += 1
+            timestamp = entry.get("timestamp") if isinstance(entry, dict) else None
+            if timestamp:
+                first = timestamp if first is None else min(first, timestamp)
+                last = timestamp if last is None else max(last, timestamp)
+    os.replace(f"{path}.tmp", path)
+
+    segment = {"number": number, "file": name, "compression": compression, "first": first, "last": last,
+               "entries": entries, "bytes": stat.st_size, "source": source}
+    with _rotation_lock:
+        # The segment replaces the rotating file in one step as far as readers can tell
+        _save_segment_index(log_file, segments + [segment])
+        os.remove(rotating)
+    return segment
+
+def migrate_log_file(log_file):
+    """Rewrites an array-format log as JSON Lines. Returns True if the file was converted."""
+    if not os.path.exists(log_file) or not is_array_file(log_file):
+        return False
+    entries = list(_iter_file_entries(log_file))
+    temp_file = f"{log_file}.migrating"
+    with open(temp_file, "w", encoding="utf-8") as file:
+        for entry in entries:
+            file.write(json.dumps(entry) + "\n")
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_file, log_file)
+    logging.info(f"Converted {log_file} to JSON Lines ({len(entries)} entries)")
+    return True
+
+def repair_partial_line(log_file):
+    """Ends the file on a complete line, so the next append does not join a half-written entry.
+
+    A last line that still parses just gets its missing newline; one that does not is cut off.
+    Returns True if the file was changed.
+    """
+    try:
+        file = open(log_file, "rb+")
+    except FileNotFoundError:
+        return False
+    with file:
+        size = file.seek(0, os.SEEK_END)
+        if size == 0:
+            return False
+        file.seek(size - 1)
+        if file.read(1) == b"\n":
+            return False
+        # Walk back to the start of the last line
+        position = size
+        while position > 0:
+            step = min(65536, position)
+            file.seek(position - step)
+            block = file.read(step)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                position = position - step + newline + 1
+                break
+            position -= step
+        file.seek(position)
+        tail = file.read()
+        try:
+            json.loads(tail)
+            file.seek(size)
+            file.write(b"\n")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            logging.warning(f"Dropping incomplete last entry ({len(tail)} bytes) from {log_file}")
+            file.truncate(position)
+        return True
 
 class PromptLogger:
-    def __init__(self, log_file="prompt_log.json"):
+    def __init__(self, log_file="prompt_log.json", max_bytes=None, max_age=None, compression="gzip"):
+        # The active file is rotated once it holds max_bytes or its first entry is max_age
+        # (a timedelta or seconds) old; either limit can be left as None
         self.log_file = log_file
+        self.max_bytes = max_bytes
+        self.max_age = timedelta(seconds=max_age) if isinstance(max_age, (int, float)) else max_age
+        self.compression = compression
+        self.prepare()
+
+    def prepare(self):
+        # One-time conversion and crash recovery before anything is appended; compressing is left to defer()
+        migrate_log_file(self.log_file)
+        repair_partial_line(self.log_file)
+        self.active_bytes = os.path.getsize(self.log_file) if os.path.exists(self.log_file) else 0
+        first = next(_iter_file_entries(self.log_file), None)
+        self.active_since = first.get("timestamp") if isinstance(first, dict) else None
+        if os.path.exists(f"{self.log_file}.rotating") or self.should_rotate():
+            self.defer(self.catch_up)
+
+    def defer(self, task):
+        # Runs slow file maintenance; here at once, subclasses with a writer thread run it there
+        task()
+
+    def catch_up(self):
+        # Finishes a rotation interrupted by a crash, then rotates the active file if it is already due
+        if os.path.exists(f"{self.log_file}.rotating"):
+            rotate_log_file(self.log_file, self.compression)
+        if self.should_rotate():
+            self.rotate()
+
+    def should_rotate(self):
+        if self.max_bytes and self.active_bytes >= self.max_bytes:
+            return True
+        if self.max_age and self.active_since:
+            return datetime.now() - datetime.fromisoformat(self.active_since) >= self.max_age
+        return False
 
-    def log_prompt(self, inputs, generated_prompt):
+    def rotate(self):
+        segment = rotate_log_file(self.log_file, self.compression)
+        self.active_bytes = 0
+        self.active_since = None
+        return segment
+
+    def after_append(self, lines):
+        # Called with each batch of lines once it is on disk
+        self.active_bytes += sum(len(line.encode("utf-8")) for line in lines)
+        if self.active_since is None and lines:
+            self.active_since = json.loads(lines[0]).get("timestamp")
+        if self.should_rotate():
+            self.rotate()
+
+    def make_entry(self, inputs, generated_prompt, usage=None):
         log_entry = {
             "timestamp": datetime.now().isoformat(),
             "inputs": inputs,
             "generated_prompt": generated_prompt
         }
-        
-        try:
-            with open(self.log_file, "r+") as file:
-                try:
-                    logs = json.load(file)
-                except json.JSONDecodeError:
-                    logs = []
-                logs.append(log_entry)
-                file.seek(0)
-                json.dump(logs, file, indent=2)
-                file.truncate()
-        except FileNotFoundError:
-            with open(self.log_file, "w") as file:
-                json.dump([log_entry], file, indent=2)
+        if usage is not None:
+            log_entry["usage"] = usage
+        return log_entry
 
-    def get_logs(self):
-        try:
-            with open(self.log_file, "r") as file:
-                return json.load(file)
-        except FileNotFoundError:
-            return []
-class PromptLogger:
+    def log_prompt(self, inputs, generated_prompt, usage=None):
+        self.append(json.dumps(self.make_entry(inputs, generated_prompt, usage)) + "\n")
+
+    def append(self, line):
+        # One write of one complete line, so a crash can at worst leave a partial last line
+        with open(self.log_file, "a", encoding="utf-8") as file:
+            file.write(line)
+        self.after_append([line])
+
+    def get_logs(self, since=None, until=None):
+        return read_log_entries(self.log_file, since, until)
+
+    def iter_logs(self, start=None, limit=None, filters=None, reverse=False):
+        return iter_logs(self.log_file, start, limit, filters, reverse)
+
+class TextPromptLogger:
     def __init__(self, log_file="prompt_log.txt"):
         self.log_file = log_file
 
@@ -0,0 +1,85 @@
+# prompt_summarizer.py
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Set, Tuple
+
+# Word budgets matching what the length prompts ask the model for
+WORD_BUDGETS = {"concise": 20, "normal": 50}
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+CLAUSE_SPLIT = re.compile(r"\s*[,;:]\s+|\s+(?:--|–|—)\s+")
+WORD = re.compile(r"[A-Za-z][A-Za-z'-]*")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "her", "his", "in", "into", "is", "it",
+    "its", "of", "on", "onto", "or", "over", "that", "the", "their", "them", "there", "this", "through", "to",
+    "under", "while", "with", "within", "was", "were", "which", "who", "whose", "against", "across", "behind"
+}
+
+Clause = Tuple[int, int, str]  # (sentence index, clause index, text)
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+def split_clauses(text: str) -> List[Clause]:
+    clauses = []
+    for s, sentence in enumerate(SENTENCE_END.split(" ".join(text.split()))):
+        sentence = sentence.strip().rstrip(".!?").strip()
+        for c, clause in enumerate(CLAUSE_SPLIT.split(sentence)):
+            clause = clause.strip(" ,;:")
+            if clause:
+                clauses.append((s, c, clause))
+    return clauses
+
+def _content_words(text: str) -> List[str]:
+    return [w for w in (m.group(0).lower() for m in WORD.finditer(text)) if w not in STOPWORDS and len(w) > 2]
+
+def _truncate(text: str, words: int) -> str:
+    return " ".join(text.split()[:words]).rstrip(",;:")
+
+def summarize_prompt(text: str, word_budget: int) -> str:
+    """Shortens a visual prompt to at most word_budget words by keeping its highest-ranked clauses.
+
+    The opening clause, which carries the subject and action, is always kept.
+    Other clauses are ranked by how central their content words are to the
+    whole prompt and how early they appear, with clauses that mostly repeat
+    what was already kept passed over. The chosen clauses keep their original
+    order and sentence boundaries.
+    """
+    text = " ".join(text.split())
+    if count_words(text) <= word_budget:
+        return text
+    clauses = split_clauses(text)
+    if not clauses:
+        return _truncate(text, word_budget)
+
+    frequency = Counter(w for _, _, clause in clauses for w in set(_content_words(clause)))
+
+    def score(clause: Clause) -> float:
+        s, c, body = clause
+        words = set(_content_words(body))
+        centrality = sum(frequency[w] for w in words) / math.sqrt(count_words(body))
+        return centrality + 1.0 / (1 + s) + (0.5 if c == 0 else 0.0)
+
+    first = clauses[0]
+    chosen = {0: _truncate(first[2], word_budget)}
+    used = count_words(chosen[0])
+    covered: Set[str] = set(_content_words(chosen[0]))
+    for index in sorted(range(1, len(clauses)), key=lambda i: (-score(clauses[i]), i)):
+        body = clauses[index][2]
+        size = count_words(body)
+        words = set(_content_words(body))
+        if used + size > word_budget:
+            continue
+        if words and len(words - covered) <= len(words) * 0.2:
+            continue  # Mostly repeats what is already kept
+        chosen[index] = body
+        used += size
+        covered |= words
+
+    sentences: Dict[int, List[str]] = {}
+    for index in sorted(chosen):
+        sentences.setdefault(clauses[index][0], []).append(chosen[index])
+    return " ".join(", ".join(parts) + "." for parts in sentences.values())
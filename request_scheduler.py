@@ -0,0 +1,260 @@
+# request_scheduler.py
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+
+from metrics import metrics
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError"}
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_consume(self, amount: float) -> float:
+        # Returns 0 once the amount is taken, otherwise how long to wait before trying again
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+            self.updated = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.refill_per_second
+
+    def refund(self, amount: float) -> None:
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+class RequestScheduler:
+    """Gatekeeper for model calls: request and token budgets, Retry-After and jittered backoff.
+
+    Call sites pass a zero-argument callable that starts the request, so a
+    retried attempt issues a fresh call rather than re-awaiting a spent coroutine.
+    """
+
+    def __init__(self, requests_per_minute: float = 500, tokens_per_minute: float = 200000,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.retries = 0
+        self.failures = 0
+        self.configure(requests_per_minute, tokens_per_minute)
+
+    def configure(self, requests_per_minute: float, tokens_per_minute: float) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.request_bucket = TokenBucket(max(1.0, requests_per_minute / 60), requests_per_minute / 60)
+        self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+
+    async def run(self, call: Callable[[], Awaitable[T]], estimated_tokens: int = 0) -> T:
+        attempt = 0
+        while True:
+            await self._acquire(estimated_tokens)
+            try:
+                result = await call()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self._record_success()
+                return result
+            finally:
+                self._release()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def stream(self, start_stream: Callable[[], AsyncIterator[T]],
+                     estimated_tokens: int = 0) -> AsyncIterator[T]:
+        # A stream is only retried if it fails before producing its first item
+        attempt = 0
+        while True:
+            await self._acquire(estimated_tokens)
+            started = False
+            try:
+                async for item in start_stream():
+                    started = True
+                    yield item
+            except Exception as e:
+                delay = None if started else self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self._record_success()
+                return
+            finally:
+                self._release()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def run_sync(self, call: Callable[[], T], estimated_tokens: int = 0) -> T:
+        attempt = 0
+        while True:
+            self._acquire_sync(estimated_tokens)
+            try:
+                result = call()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self._record_success()
+                return result
+            finally:
+                self._release()
+            attempt += 1
+            time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "retries": self.retries,
+            "failures": self.failures,
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute
+        }
+
+    async def _acquire(self, estimated_tokens: int) -> None:
+        self._enter_queue()
+        try:
+            with metrics.span("scheduler_wait"):
+                while True:
+                    wait = self._budget_wait(estimated_tokens)
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(wait)
+        finally:
+            self._leave_queue()
+        self._start()
+
+    def _acquire_sync(self, estimated_tokens: int) -> None:
+        self._enter_queue()
+        try:
+            with metrics.span("scheduler_wait"):
+                while True:
+                    wait = self._budget_wait(estimated_tokens)
+                    if wait <= 0:
+                        break
+                    time.sleep(wait)
+        finally:
+            self._leave_queue()
+        self._start()
+
+    def _budget_wait(self, estimated_tokens: int) -> float:
+        paused = self._paused_until - time.monotonic()
+        if paused > 0:
+            return paused
+        wait = self.request_bucket.try_consume(1)
+        if wait > 0:
+            return wait
+        if estimated_tokens:
+            wait = self.token_bucket.try_consume(estimated_tokens)
+            if wait > 0:
+                # Hand the request slot back so it isn't lost while waiting on tokens
+                self.request_bucket.refund(1)
+        return wait
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        if attempt >= self.max_retries or not is_retryable(error):
+            with self._lock:
+                self.failures += 1
+            return None
+
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            # The server said when to come back: pause every queued request until then
+            delay = min(self.max_delay, retry_after) + random.uniform(0, self.base_delay)
+            with self._lock:
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        else:
+            # Full jitter keeps concurrent retries from landing at the same moment
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+        with self._lock:
+            self.retries += 1
+        logging.warning(f"Retrying model call in {delay:.2f}s after error (attempt {attempt + 1}): {error}")
+        return delay
+
+    def _enter_queue(self) -> None:
+        with self._lock:
+            self.queue_depth += 1
+
+    def _leave_queue(self) -> None:
+        with self._lock:
+            self.queue_depth -= 1
+
+    def _start(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def _record_success(self) -> None:
+        with self._lock:
+            self.completed += 1
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+def is_retryable(error: Exception) -> bool:
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or getattr(error, "headers", None)
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def estimate_tokens(text: str, completion_tokens: int = 256) -> int:
+    # Roughly four characters per token for English prose, plus room for the reply
+    return len(text) // 4 + completion_tokens
+
+scheduler = RequestScheduler()
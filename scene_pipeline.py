@@ -0,0 +1,312 @@
+# scene_pipeline.py
+
+import asyncio
+import json
+import logging
+import re
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from script_context import count_tokens
+
+SCENE_HEADING = re.compile(r"^[ \t]*(?:INT\.|EXT\.|INT\./EXT\.|EXT\./INT\.|INT/EXT|I/E)[^\n]*$", re.MULTILINE)
+
+SCENE_FIELDS = {
+    "setting": "setting", "location": "setting", "scene heading": "setting",
+    "characters": "characters", "characters present": "characters", "character": "characters",
+    "key actions": "actions", "actions": "actions", "action": "actions",
+    "description": "description", "summary": "description"
+}
+
+ANALYSIS_FIELDS = {
+    "key visual elements": "visual_elements", "visual elements": "visual_elements",
+    "mood": "mood", "atmosphere": "mood", "mood and atmosphere": "mood", "mood/atmosphere": "mood",
+    "potential camera shots": "camera_shots", "camera shots": "camera_shots", "camera": "camera_shots",
+    "shots": "camera_shots"
+}
+
+LABEL_LINE = re.compile(r"^[\s\-*•\d.)]*\**([A-Za-z][A-Za-z /']*?)\**\s*:\**\s*(.*)$")
+SCENE_START = re.compile(r"^[\s#*]*(?:scene\s*(\d+)|(\d+)[.)])\b", re.IGNORECASE)
+LIST_ITEM = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+
+def split_script(script: str, chunk_tokens: int = 1500) -> Iterator[str]:
+    """Yields consecutive pieces of the script, cut on scene headings, of about chunk_tokens each.
+
+    Scripts without recognisable headings are cut on blank lines instead. A
+    single scene larger than chunk_tokens is yielded on its own.
+    """
+    starts = [match.start() for match in SCENE_HEADING.finditer(script)]
+    if not starts:
+        starts = [match.end() for match in re.finditer(r"\n[ \t]*\n", script)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+
+    chunk_start = 0
+    for start, end in zip(starts, starts[1:] + [len(script)]):
+        if start > chunk_start and count_tokens(script[chunk_start:end]) > chunk_tokens:
+            if script[chunk_start:start].strip():
+                yield script[chunk_start:start]
+            chunk_start = start
+    if script[chunk_start:].strip():
+        yield script[chunk_start:]
+
+def _load_json(text: str) -> Any:
+    text = re.sub(r"```(?:json)?", "", text or "", flags=re.IGNORECASE)
+    for opening, closing in (("[", "]"), ("{", "}")):
+        start, end = text.find(opening), text.rfind(closing)
+        if start != -1 and end > start:
+            try:
+                return json.loads(text[start:end + 1])
+            except json.JSONDecodeError:
+                continue
+    return None
+
+def _labelled_sections(lines: List[str], aliases: Dict[str, str]) -> Dict[str, List[str]]:
+    # "Label: value" lines start a field; bullet or plain lines below it continue that field
+    sections: Dict[str, List[str]] = {}
+    current = None
+    for line in lines:
+        match = LABEL_LINE.match(line)
+        field = aliases.get(match.group(1).strip().lower()) if match else None
+        if field:
+            current = field
+            value = match.group(2).strip()
+            sections.setdefault(field, [])
+            if value:
+                sections[field].append(value)
+        elif current and line.strip():
+            sections[current].append(LIST_ITEM.sub("", line).strip(" *"))
+    return sections
+
+def _as_list(values: Any, separators: str = r",|;") -> List[str]:
+    if isinstance(values, str):
+        values = [values]
+    items = []
+    for value in values or []:
+        items.extend(part.strip() for part in re.split(separators, str(value)) if part.strip())
+    return items
+
+def _normalise_scene(raw: Dict[str, Any]) -> Dict[str, Any]:
+    fields = {SCENE_FIELDS.get(str(key).strip().lower().replace("_", " "), key): value for key, value in raw.items()}
+    actions = fields.get("actions", "")
+    if isinstance(actions, list):
+        actions = " ".join(str(a) for a in actions)
+    setting = fields.get("setting", "")
+    if isinstance(setting, list):
+        setting = " ".join(str(s) for s in setting)
+    scene = {
+        "setting": str(setting).strip(),
+        "characters": _as_list(fields.get("characters"), r",|;|\band\b"),
+        "actions": str(actions).strip()
+    }
+    description = fields.get("description") or " - ".join(part for part in (scene["setting"], scene["actions"]) if part)
+    scene["description"] = " ".join(description) if isinstance(description, list) else str(description).strip()
+    return scene
+
+def parse_scene_list(text: str) -> List[Dict[str, Any]]:
+    """Turns the model's scene breakdown into dicts with setting, characters, actions and description."""
+    data = _load_json(text)
+    if isinstance(data, dict):
+        data = data.get("scenes", [data])
+    if isinstance(data, list) and all(isinstance(item, dict) for item in data):
+        return [_normalise_scene(item) for item in data]
+
+    blocks: List[List[str]] = []
+    for line in (text or "").splitlines():
+        if SCENE_START.match(line) or not blocks:
+            blocks.append([])
+        blocks[-1].append(line)
+
+    scenes = []
+    for block in blocks:
+        # The scene heading line may itself carry a description, e.g. "Scene 1: Office at night"
+        heading = SCENE_START.sub("", block[0]).strip(" :*-#") if SCENE_START.match(block[0]) else ""
+        sections = _labelled_sections(block, SCENE_FIELDS)
+        if not sections and not heading:
+            continue
+        raw = {field: " ".join(values) if field != "characters" else values for field, values in sections.items()}
+        if heading and "setting" not in raw:
+            raw["setting"] = heading
+        scenes.append(_normalise_scene(raw))
+    return scenes
+
+def parse_scene_analysis(text: str) -> Dict[str, Any]:
+    """Turns the model's scene analysis into visual_elements, mood and camera_shots, keeping the full text as summary."""
+    analysis: Dict[str, Any] = {"visual_elements": [], "mood": "", "camera_shots": [], "summary": (text or "").strip()}
+    data = _load_json(text)
+    if isinstance(data, dict):
+        sections = {ANALYSIS_FIELDS.get(str(k).strip().lower().replace("_", " "), k): v for k, v in data.items()}
+    else:
+        sections = _labelled_sections((text or "").splitlines(), ANALYSIS_FIELDS)
+    for field in ("visual_elements", "camera_shots"):
+        values = sections.get(field, [])
+        analysis[field] = [str(v).strip() for v in values] if isinstance(values, list) and len(values) > 1 else _as_list(values)
+    mood = sections.get("mood", "")
+    analysis["mood"] = " ".join(str(m) for m in mood).strip() if isinstance(mood, list) else str(mood).strip()
+    return analysis
+
+class _Done:
+    pass
+
+_DONE = _Done()
+
+class ScenePipeline:
+    """Streams a script through parse, analyse, generate and format stages.
+
+    Each stage is a pool of workers reading from a bounded queue, so a slow
+    stage holds back the ones before it instead of letting work pile up, and
+    the stages overlap. At most max_in_flight scenes sit between parsing and
+    output at any time; rows are yielded in script order.
+    """
+
+    def __init__(self, parser, analyzer, generator, formatter, parse_workers: int = 2,
+                 analyze_workers: int = 4, generate_workers: int = 4, queue_size: int = 8,
+                 max_in_flight: int = 16, chunk_tokens: int = 1500):
+        self.parser = parser
+        self.analyzer = analyzer
+        self.generator = generator
+        self.formatter = formatter
+        self.parse_workers = parse_workers
+        self.analyze_workers = analyze_workers
+        self.generate_workers = generate_workers
+        self.queue_size = queue_size
+        self.max_in_flight = max_in_flight
+        self.chunk_tokens = chunk_tokens
+        self.last_run_stats: Dict[str, int] = {}
+
+    async def run(self, script: str, director_style: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        director_style = director_style or {}
+        stats = {"chunks": 0, "scenes": 0, "errors": 0, "peak_in_flight": 0}
+        self.last_run_stats = stats
+        chunk_slots = asyncio.Semaphore(self.parse_workers + self.queue_size)
+        scene_slots = asyncio.Semaphore(self.max_in_flight)
+        parse_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        parsed_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        analyze_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        generate_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        # Bounded by scene_slots, so it never needs to block the generate workers
+        output_queue: asyncio.Queue = asyncio.Queue()
+        in_flight = 0
+
+        async def feed() -> None:
+            for index, chunk in enumerate(split_script(script, self.chunk_tokens)):
+                # Slots are taken in script order, so the next chunk the sequencer waits for always holds one
+                await chunk_slots.acquire()
+                stats["chunks"] += 1
+                await parse_queue.put((index, chunk))
+            for _ in range(self.parse_workers):
+                await parse_queue.put(_DONE)
+
+        async def parse(item) -> tuple:
+            index, chunk = item
+            try:
+                return index, await self.parser.parse_script(chunk), None
+            except Exception as e:
+                logging.error(f"Error parsing script chunk {index}: {str(e)}")
+                return index, [{"description": chunk.strip().splitlines()[0][:80]}], str(e)
+
+        async def sequence() -> None:
+            nonlocal in_flight
+            pending: Dict[int, tuple] = {}
+            next_chunk = 0
+            seq = 0
+            while True:
+                item = await parsed_queue.get()
+                if item is _DONE:
+                    break
+                pending[item[0]] = item
+                while next_chunk in pending:
+                    _, scenes, error = pending.pop(next_chunk)
+                    next_chunk += 1
+                    chunk_slots.release()
+                    for scene in scenes:
+                        await scene_slots.acquire()
+                        in_flight += 1
+                        stats["peak_in_flight"] = max(stats["peak_in_flight"], in_flight)
+                        seq += 1
+                        scene["scene_number"] = seq
+                        await analyze_queue.put({"seq": seq, "scene": scene, "analysis": None, "prompt": None, "error": error})
+            for _ in range(self.analyze_workers):
+                await analyze_queue.put(_DONE)
+
+        async def analyze(item: Dict[str, Any]) -> Dict[str, Any]:
+            if item["error"] is None:
+                try:
+                    item["analysis"] = await self.analyzer.analyze_scene(item["scene"])
+                except Exception as e:
+                    logging.error(f"Error analysing scene {item['seq']}: {str(e)}")
+                    item["error"] = str(e)
+            return item
+
+        async def generate(item: Dict[str, Any]) -> Dict[str, Any]:
+            if item["error"] is None:
+                try:
+                    item["prompt"] = await self.generator.generate_prompt(item["analysis"], director_style)
+                except Exception as e:
+                    logging.error(f"Error generating prompt for scene {item['seq']}: {str(e)}")
+                    item["error"] = str(e)
+            return item
+
+        tasks = [
+            asyncio.ensure_future(feed()),
+            asyncio.ensure_future(self._stage(parse, parse_queue, parsed_queue, self.parse_workers, 1)),
+            asyncio.ensure_future(sequence()),
+            asyncio.ensure_future(self._stage(analyze, analyze_queue, generate_queue, self.analyze_workers, self.generate_workers)),
+            asyncio.ensure_future(self._stage(generate, generate_queue, output_queue, self.generate_workers, 1))
+        ]
+        for task in tasks:
+            task.add_done_callback(lambda finished: self._report_failure(finished, output_queue))
+
+        try:
+            pending: Dict[int, Dict[str, Any]] = {}
+            next_seq = 1
+            done = False
+            while not done or pending:
+                if next_seq in pending:
+                    item = pending.pop(next_seq)
+                    next_seq += 1
+                    in_flight -= 1
+                    scene_slots.release()
+                    stats["scenes"] += 1
+                    stats["errors"] += item["error"] is not None
+                    yield {
+                        "scene_number": item["seq"],
+                        "scene": item["scene"],
+                        "analysis": item["analysis"],
+                        "prompt": item["prompt"],
+                        "row": self.formatter.format_row(item["scene"], item["prompt"] or f"Error: {item['error']}"),
+                        "error": item["error"]
+                    }
+                    continue
+                if done:
+                    break
+                item = await output_queue.get()
+                if item is _DONE:
+                    done = True
+                elif isinstance(item, BaseException):
+                    raise item
+                else:
+                    pending[item["seq"]] = item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    async def _stage(handler: Callable[[Any], Awaitable[Any]], inbox: asyncio.Queue, outbox: asyncio.Queue,
+                     workers: int, downstream_workers: int) -> None:
+        async def worker() -> None:
+            while True:
+                item = await inbox.get()
+                if item is _DONE:
+                    return
+                await outbox.put(await handler(item))
+
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        for _ in range(downstream_workers):
+            await outbox.put(_DONE)
+
+    @staticmethod
+    def _report_failure(task: asyncio.Task, output_queue: asyncio.Queue) -> None:
+        # A crashed stage would otherwise leave the consumer waiting forever
+        if not task.cancelled() and task.exception() is not None:
+            output_queue.put_nowait(task.exception())
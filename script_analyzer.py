@@ -1,13 +1,17 @@
 from langchain.chains import LLMChain
 from langchain_core.prompts import PromptTemplate
-from langchain_community.llms import OpenAI
 from typing import Dict, List
 import logging
+from llm_clients import get_chat_model
 class ScriptAnalyzer:
-    def __init__(self):
+    def __init__(self, llm=None):
         self.entities = {}
         self.context = {}
-        self.llm = OpenAI(temperature=0.3)
+        self._llm = llm  # None looks the model up in the registry on each use
+
+    @property
+    def llm(self):
+        return self._llm or get_chat_model(temperature=0.3)
 
     def analyze_script(self, script: str):
         entity_chain = LLMChain(
@@ -0,0 +1,164 @@
+# script_context.py
+
+import hashlib
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has", "he", "her",
+    "his", "i", "in", "is", "it", "its", "of", "on", "or", "she", "that", "the", "their", "them",
+    "they", "this", "to", "was", "were", "with", "you"
+}
+
+def count_tokens(text: str) -> int:
+    # Roughly four characters per token, matching request_scheduler.estimate_tokens
+    return max(1, len(text) // 4)
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in re.findall(r"[a-z0-9']+", text.lower()) if word not in STOPWORDS]
+
+class Passage:
+    def __init__(self, start: int, end: int, text: str):
+        self.start = start
+        self.end = end
+        self.text = text
+        self.tokens = count_tokens(text)
+        self.term_counts = Counter(tokenize(text))
+        self.length = sum(self.term_counts.values())
+
+class ScriptIndex:
+    """BM25 index over consecutive passages of a script, with their character offsets."""
+
+    def __init__(self, script: str, passage_tokens: int = 120, k1: float = 1.5, b: float = 0.75):
+        self.script = script
+        self.k1 = k1
+        self.b = b
+        self.passages = self._split_passages(script, passage_tokens)
+        self.average_length = (sum(p.length for p in self.passages) / len(self.passages)) if self.passages else 0.0
+        document_frequency = Counter()
+        for passage in self.passages:
+            document_frequency.update(passage.term_counts.keys())
+        total = len(self.passages)
+        self.idf = {
+            term: math.log(1 + (total - count + 0.5) / (count + 0.5))
+            for term, count in document_frequency.items()
+        }
+
+    def score(self, query_terms: Iterable[str]) -> List[Tuple[float, int]]:
+        terms = set(query_terms)
+        scores = []
+        for i, passage in enumerate(self.passages):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * passage.length / self.average_length) if self.average_length else self.k1
+            for term in terms:
+                tf = passage.term_counts.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scores.append((score, i))
+        scores.sort(key=lambda item: (-item[0], item[1]))
+        return scores
+
+    def locate(self, text: str) -> List[int]:
+        text = text.strip()
+        if not text:
+            return []
+        start = self.script.find(text)
+        if start == -1:
+            return []
+        end = start + len(text)
+        return [i for i, p in enumerate(self.passages) if p.start < end and p.end > start]
+
+    @staticmethod
+    def _split_passages(script: str, passage_tokens: int) -> List[Passage]:
+        # Blank-line separated blocks (scene headings, action, dialogue) are merged up
+        # to the passage size; oversized blocks are broken on sentence boundaries
+        spans = []
+        for block in re.finditer(r"\S(?:[^\n]|\n(?![ \t]*\n))*", script):
+            if count_tokens(block.group()) <= passage_tokens * 2:
+                spans.append((block.start(), block.end()))
+                continue
+            for sentence in re.finditer(r"[^.!?]+(?:[.!?]+|$)", block.group()):
+                if sentence.group().strip():
+                    spans.append((block.start() + sentence.start(), block.start() + sentence.end()))
+
+        passages = []
+        current_start = current_end = None
+        for start, end in spans:
+            if current_start is None:
+                current_start, current_end = start, end
+            elif count_tokens(script[current_start:end]) > passage_tokens:
+                passages.append(Passage(current_start, current_end, script[current_start:current_end]))
+                current_start, current_end = start, end
+            else:
+                current_end = end
+        if current_start is not None:
+            passages.append(Passage(current_start, current_end, script[current_start:current_end]))
+        return passages
+
+class ScriptContextSelector:
+    """Picks the parts of a script worth sending with a prompt, within a token budget.
+
+    Passages around the highlighted text come first, widening outwards, then the
+    best BM25 matches for the active subjects and shot description. The index is
+    rebuilt only when the script changes.
+    """
+
+    def __init__(self, token_budget: int = 1500, window: int = 2, passage_tokens: int = 120):
+        self.token_budget = token_budget
+        self.window = window
+        self.passage_tokens = passage_tokens
+        self._index: Optional[ScriptIndex] = None
+        self._script_hash: Optional[str] = None
+
+    def index_for(self, script: str) -> ScriptIndex:
+        script_hash = hashlib.sha1(script.encode("utf-8")).hexdigest()
+        if self._index is None or script_hash != self._script_hash:
+            self._index = ScriptIndex(script, self.passage_tokens)
+            self._script_hash = script_hash
+        return self._index
+
+    def select(self, script: str, highlighted_text: str = "", subjects: Optional[List[Dict]] = None,
+               shot_description: str = "") -> str:
+        if count_tokens(script) <= self.token_budget:
+            return script
+
+        index = self.index_for(script)
+        selected: Set[int] = set()
+        remaining = self.token_budget
+
+        def add(i: int) -> None:
+            nonlocal remaining
+            if i not in selected and 0 <= i < len(index.passages) and index.passages[i].tokens <= remaining:
+                selected.add(i)
+                remaining -= index.passages[i].tokens
+
+        anchors = index.locate(highlighted_text)
+        for i in anchors:
+            add(i)
+        if anchors:
+            for offset in range(1, self.window + 1):
+                add(anchors[0] - offset)
+                add(anchors[-1] + offset)
+
+        query = " ".join([s.get("name", "") for s in subjects or []] + [shot_description, highlighted_text])
+        for _, i in index.score(tokenize(query)):
+            if remaining <= 0:
+                break
+            add(i)
+
+        if not selected:
+            add(0)
+        return self._join(index, sorted(selected))
+
+    @staticmethod
+    def _join(index: ScriptIndex, ordered: List[int]) -> str:
+        # Gaps between non-adjacent passages are marked so the model knows text was skipped
+        parts = []
+        for position, i in enumerate(ordered):
+            if position and i != ordered[position - 1] + 1:
+                parts.append("...")
+            parts.append(index.passages[i].text)
+        return "\n\n".join(parts)
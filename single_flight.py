@@ -0,0 +1,75 @@
+# single_flight.py
+
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_namespace: contextvars.ContextVar[str] = contextvars.ContextVar("single_flight_namespace", default="")
+
+class SingleFlight:
+    """Collapses concurrent identical requests onto one underlying task.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same task and receive the same result or error.
+    The key is forgotten once the task finishes, so later calls run afresh.
+    When every waiter has been cancelled the task is cancelled too.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.calls = 0
+        self.shared = 0
+        self.cancelled = 0
+
+    async def do(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        key = f"{_namespace.get()}:{key}"
+        task = self._in_flight.get(key)
+        if task is None or task.done():
+            self.calls += 1
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda finished: self._forget(key, finished))
+        else:
+            self.shared += 1
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            # Shielded so one cancelled waiter does not cancel the call for everyone else
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    # The last waiter was cancelled, so nobody is left to use the result
+                    self.cancelled += 1
+                    task.cancel()
+
+    @contextmanager
+    def namespace(self, name: str) -> Iterator[None]:
+        # Calls made inside the block only share with other calls in the same namespace,
+        # e.g. so a normal request never ends up waiting on a speculative one
+        token = _namespace.set(name)
+        try:
+            yield
+        finally:
+            _namespace.reset(token)
+
+    def in_flight(self, key: str) -> bool:
+        task = self._in_flight.get(f"{_namespace.get()}:{key}")
+        return task is not None and not task.done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "shared": self.shared, "cancelled": self.cancelled,
+                "in_flight": len(self._in_flight)}
+
+    def _forget(self, key: str, finished: asyncio.Task) -> None:
+        if self._in_flight.get(key) is finished:
+            del self._in_flight[key]
+        if not finished.cancelled():
+            finished.exception()  # Mark as retrieved when every waiter has gone away
+
+single_flight = SingleFlight()
@@ -0,0 +1,59 @@
+# template_registry.py
+
+import threading
+from string import Formatter
+from typing import Dict, List, Tuple
+
+from langchain_core.prompts import PromptTemplate
+
+class TemplateRegistry:
+    """Named prompt templates, validated when registered and compiled once on first use.
+
+    get() returns a shared PromptTemplate for chains; render() formats the raw
+    template string directly and skips PromptTemplate entirely.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Tuple[str, List[str]]] = {}
+        self._compiled: Dict[str, PromptTemplate] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, template: str, input_variables: List[str]) -> None:
+        fields = {field for _, field, _, _ in Formatter().parse(template) if field is not None}
+        if fields != set(input_variables):
+            raise ValueError(
+                f"Template '{name}' uses {sorted(fields)} but declares {sorted(input_variables)}"
+            )
+        with self._lock:
+            self._sources[name] = (template, list(input_variables))
+            self._compiled.pop(name, None)
+
+    def get(self, name: str) -> PromptTemplate:
+        compiled = self._compiled.get(name)
+        if compiled is None:
+            with self._lock:
+                compiled = self._compiled.get(name)
+                if compiled is None:
+                    template, input_variables = self._source(name)
+                    compiled = PromptTemplate(input_variables=input_variables, template=template)
+                    self._compiled[name] = compiled
+        return compiled
+
+    def render(self, name: str, **kwargs) -> str:
+        template, _ = self._source(name)
+        return template.format(**kwargs)
+
+    def compile_all(self) -> None:
+        for name in list(self._sources):
+            self.get(name)
+
+    def names(self) -> List[str]:
+        return list(self._sources)
+
+    def _source(self, name: str) -> Tuple[str, List[str]]:
+        try:
+            return self._sources[name]
+        except KeyError:
+            raise KeyError(f"No template registered under '{name}'")
+
+templates = TemplateRegistry()
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+from llm_cache import LLMResponseCache
+
+class TestLLMResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        self.cache = LLMResponseCache(cache_dir=self.cache_dir, max_memory_entries=2)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_key_depends_on_prompt_model_and_temperature(self):
+        key = LLMResponseCache.make_key("a prompt", "gpt-4o-mini", 0.7)
+        self.assertEqual(key, LLMResponseCache.make_key("a prompt", "gpt-4o-mini", 0.7))
+        self.assertNotEqual(key, LLMResponseCache.make_key("a prompt", "gpt-4o-mini", 0.3))
+        self.assertNotEqual(key, LLMResponseCache.make_key("a prompt", "gpt-3.5-turbo", 0.7))
+        self.assertNotEqual(key, LLMResponseCache.make_key("another prompt", "gpt-4o-mini", 0.7))
+
+    def test_miss_then_hit(self):
+        self.assertIsNone(self.cache.get("k"))
+        self.cache.set("k", "response")
+        self.assertEqual(self.cache.get("k"), "response")
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_memory_lru_falls_back_to_disk(self):
+        for key in ("a", "b", "c"):
+            self.cache.set(key, key.upper())
+        self.assertEqual(self.cache.stats()["memory_entries"], 2)
+        self.assertEqual(self.cache.get("a"), "A")
+        self.assertEqual(self.cache.stats()["disk_hits"], 1)
+
+    def test_disk_tier_survives_new_instance(self):
+        self.cache.set("k", "response")
+        fresh = LLMResponseCache(cache_dir=self.cache_dir)
+        self.assertEqual(fresh.get("k"), "response")
+
+    def test_disk_budget_evicts_oldest_entries(self):
+        cache = LLMResponseCache(cache_dir=self.cache_dir, max_disk_bytes=200)
+        for i in range(10):
+            cache.set(f"key{i}", "x" * 40)
+        self.assertLessEqual(cache.stats()["disk_bytes"], 200)
+        self.assertTrue(os.path.exists(os.path.join(self.cache_dir, "key9.json")))
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, "key0.json")))
+
+    def test_bypass_skips_reads_but_refreshes_entries(self):
+        self.cache.set("k", "old")
+        self.cache.bypass = True
+        self.assertIsNone(self.cache.get("k"))
+        self.cache.set("k", "new")
+        self.cache.bypass = False
+        self.assertEqual(self.cache.get("k"), "new")
+        self.assertEqual(self.cache.stats()["bypassed"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
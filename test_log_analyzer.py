@@ -0,0 +1,144 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from log_analyzer import LogColumns, build_report, format_report, iter_recent_entries, np, query_log, report_log
+from prompt_log import OffsetIndex, iter_lines_backwards, rotate_log_file
+
+def entry(timestamp, i):
+    return {"timestamp": timestamp.isoformat(), "inputs": {"i": i}, "generated_prompt": f"prompt {i}"}
+
+class TestLogAnalyzer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "prompt_log.json")
+        self.start = datetime(2024, 1, 1)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_entries(self, first, count):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for i in range(first, first + count):
+                f.write(json.dumps(entry(self.start + timedelta(minutes=i), i)) + "\n")
+
+    def test_backwards_lines_across_blocks(self):
+        self.write_entries(0, 50)
+        lines = list(iter_lines_backwards(self.path, block_size=17))
+        self.assertEqual([json.loads(line)["inputs"]["i"] for _, line in lines], list(range(49, -1, -1)))
+        with open(self.path, "rb") as f:
+            for offset, line in lines[:5]:
+                f.seek(offset)
+                self.assertEqual(f.readline().rstrip(b"\n"), line)
+
+    def test_recent_entries_stop_at_window(self):
+        self.write_entries(0, 100)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"timestamp": "2024-01-01T01:40:00", "inpu')  # Interrupted write
+        recent = list(iter_recent_entries(self.path, self.start + timedelta(minutes=95)))
+        self.assertEqual([e["inputs"]["i"] for e in recent], [99, 98, 97, 96, 95])
+
+    def test_recent_entries_continue_into_segments(self):
+        self.write_entries(0, 10)
+        rotate_log_file(self.path)
+        self.write_entries(10, 3)
+        recent = list(iter_recent_entries(self.path, self.start + timedelta(minutes=8)))
+        self.assertEqual([e["inputs"]["i"] for e in recent], [12, 11, 10, 9, 8])
+
+    def test_offset_index_range_query(self):
+        self.write_entries(0, 200)
+        index = OffsetIndex(self.path, stride=512)
+        entries = list(index.iter_range(self.start + timedelta(minutes=120), self.start + timedelta(minutes=124)))
+        self.assertEqual([e["inputs"]["i"] for e in entries], [120, 121, 122, 123, 124])
+        self.assertGreater(len(index.samples), 10)
+        self.assertGreater(index.seek_offset(self.start + timedelta(minutes=120)), 0)
+
+    def test_offset_index_extends_and_survives_reload(self):
+        self.write_entries(0, 100)
+        OffsetIndex(self.path, stride=512).refresh()
+        self.write_entries(100, 100)
+        index = OffsetIndex(self.path, stride=512)
+        before = len(index.samples)
+        index.refresh()
+        self.assertGreater(len(index.samples), before)
+        self.assertEqual(index.indexed_bytes, os.path.getsize(self.path))
+
+    def test_query_spans_segments_and_active_file(self):
+        self.write_entries(0, 10)
+        rotate_log_file(self.path)
+        self.write_entries(10, 10)
+        entries = list(query_log(self.path, self.start + timedelta(minutes=8), self.start + timedelta(minutes=11)))
+        self.assertEqual([e["inputs"]["i"] for e in entries], [8, 9, 10, 11])
+
+def generation(minute, style, length, words, usage=None):
+    inputs = {"style": style, "camera_shot": "Close-up", "camera_move": "", "length": length, "mode": "combined"}
+    logged = {"timestamp": (datetime(2024, 1, 1) + timedelta(minutes=minute)).isoformat(), "inputs": inputs,
+              "generated_prompt": " ".join(["word"] * words)}
+    if usage is not None:
+        logged["usage"] = usage
+    return logged
+
+class TestReport(unittest.TestCase):
+    def setUp(self):
+        self.entries = [generation(i * 20, "Film Noir" if i % 3 else "Western", ("concise", "normal", "detailed")[i % 3],
+                                   5 * (i + 1), {"input_tokens": 100 + i, "output_tokens": 10 * i,
+                                                 "total_tokens": 100 + 11 * i, "cost_usd": 0.001 * i} if i < 4 else None)
+                        for i in range(9)]
+
+    def test_counts_and_distributions(self):
+        report = build_report(LogColumns.from_entries(self.entries), use_numpy=False)
+        self.assertEqual(report["entries"], 9)
+        self.assertEqual(report["counts"]["style"], {"Film Noir": 6, "Western": 3})
+        self.assertEqual(report["counts"]["length"], {"concise": 3, "detailed": 3, "normal": 3})
+        self.assertEqual(report["counts"]["camera_move"], {"(none)": 9})
+        words = report["prompt_words"]
+        self.assertEqual((words["min"], words["max"], words["p50"], words["count"]), (5.0, 45.0, 25.0, 9))
+        self.assertEqual(sum(bucket["count"] for bucket in words["histogram"]), 9)
+        self.assertEqual(words["histogram"][0], {"upto": 10, "count": 2})
+        self.assertEqual(report["usage"]["input_tokens"]["count"], 4)
+        self.assertAlmostEqual(report["usage"]["input_tokens"]["p90"], 102.7)
+        self.assertNotIn("latency_ms", report["usage"])
+        self.assertEqual(report["per_hour"]["by_hour"], {"2024-01-01T00": 3, "2024-01-01T01": 3, "2024-01-01T02": 3})
+        self.assertEqual(report["first"], "2024-01-01T00:00:00")
+
+    def assertReportsMatch(self, first, second, path="report"):
+        # Floats are compared approximately: the two paths sum and interpolate in a different order
+        if isinstance(first, float) or isinstance(second, float):
+            self.assertAlmostEqual(first, second, places=9, msg=path)
+        elif isinstance(first, dict) and isinstance(second, dict):
+            self.assertEqual(sorted(first), sorted(second), path)
+            for key in first:
+                self.assertReportsMatch(first[key], second[key], f"{path}.{key}")
+        elif isinstance(first, list) and isinstance(second, list):
+            self.assertEqual(len(first), len(second), path)
+            for i, (a, b) in enumerate(zip(first, second)):
+                self.assertReportsMatch(a, b, f"{path}[{i}]")
+        else:
+            self.assertEqual(first, second, path)
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_numpy_matches_plain_python(self):
+        columns = LogColumns.from_entries(self.entries)
+        self.assertReportsMatch(build_report(columns, use_numpy=True), build_report(columns, use_numpy=False))
+
+    def test_report_reads_log_and_segments(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "prompt_log.json")
+            with open(path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(e) + "\n" for e in self.entries[:5])
+            rotate_log_file(path, "gzip")
+            with open(path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(e) + "\n" for e in self.entries[5:])
+            report = report_log(path)
+            self.assertEqual(report["entries"], 9)
+            self.assertIn("Film Noir", format_report(report))
+            self.assertEqual(report_log(path, since="2024-01-01T02:00:00")["entries"], 3)
+
+    def test_empty_log(self):
+        report = build_report(LogColumns(), use_numpy=False)
+        self.assertEqual((report["entries"], report["per_hour"], report["usage"]), (0, None, {}))
+        format_report(report)
+
+if __name__ == '__main__':
+    unittest.main()
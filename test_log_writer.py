@@ -0,0 +1,83 @@
+import os
+import tempfile
+import time
+import unittest
+from log_writer import BufferedLogWriter
+
+class TestBufferedLogWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "log.jsonl")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def read_lines(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r", encoding="utf-8") as f:
+            return f.read().splitlines()
+
+    def test_flush_writes_lines_in_order(self):
+        writer = BufferedLogWriter(self.path, max_batch=1000, flush_interval=60)
+        for i in range(10):
+            writer.write(f"{i}\n")
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(self.read_lines(), [str(i) for i in range(10)])
+        writer.close()
+
+    def test_writes_in_batches_of_max_batch(self):
+        writer = BufferedLogWriter(self.path, max_batch=5, flush_interval=60)
+        for i in range(10):
+            writer.write(f"{i}\n")
+        deadline = time.monotonic() + 5
+        while writer.lines_written < 10 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(writer.batches_written, 2)
+        writer.close()
+
+    def test_flushes_after_interval(self):
+        writer = BufferedLogWriter(self.path, max_batch=1000, flush_interval=0.05)
+        writer.write("entry\n")
+        deadline = time.monotonic() + 5
+        while not self.read_lines() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.read_lines(), ["entry"])
+        writer.close()
+
+    def test_close_writes_pending_and_rejects_writes(self):
+        writer = BufferedLogWriter(self.path, max_batch=1000, flush_interval=60)
+        writer.write("last\n")
+        writer.close()
+        writer.close()
+        self.assertEqual(self.read_lines(), ["last"])
+        with self.assertRaises(ValueError):
+            writer.write("late\n")
+
+    def test_on_batch_sees_written_lines(self):
+        batches = []
+        writer = BufferedLogWriter(self.path, max_batch=3, flush_interval=60, on_batch=batches.append)
+        for i in range(4):
+            writer.write(f"{i}\n")
+        writer.flush(timeout=5)
+        self.assertEqual(batches, [["0\n", "1\n", "2\n"], ["3\n"]])
+        writer.close()
+
+    def test_submitted_tasks_run_after_earlier_writes(self):
+        seen = []
+        writer = BufferedLogWriter(self.path, max_batch=1000, flush_interval=60)
+        writer.write("before\n")
+        writer.submit(lambda: seen.append(self.read_lines()))
+        writer.write("after\n")
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(seen, [["before"]])
+        self.assertEqual(self.read_lines(), ["before", "after"])
+        writer.close()
+
+    def test_flush_without_writes_returns_at_once(self):
+        writer = BufferedLogWriter(self.path)
+        self.assertTrue(writer.flush(timeout=0))
+        writer.close()
+
+if __name__ == '__main__':
+    unittest.main()
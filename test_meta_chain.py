@@ -0,0 +1,49 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from llm_cache import LLMResponseCache
+from llm_clients import configure_backend, get_chat_model
+from meta_chain import MODEL_NAME, MetaChain
+
+class TestRefineAndVariations(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        configure_backend("mock", latency_ms=0, tokens_per_second=0)
+        self.chain = MetaChain(SimpleNamespace(temperature=0.4))
+        self.chain.prompt_manager.save_file = os.path.join(self.tmpdir.name, "saved_prompts.json")
+        self.chain.cache = LLMResponseCache(cache_dir=os.path.join(self.tmpdir.name, "cache"))
+
+    def tearDown(self):
+        configure_backend("openai")
+        self.tmpdir.cleanup()
+
+    def model_calls(self, temperature=0.4):
+        return sum(get_chat_model(MODEL_NAME, temperature)._attempts.values())
+
+    def test_variations_run_in_parallel_with_distinct_focuses(self):
+        variations = asyncio.run(self.chain.agenerate_variations("A detective in the rain", 3))
+        self.assertEqual(len(variations), 3)
+        self.assertEqual(len(set(variations)), 3)
+        self.assertEqual(self.model_calls(), 3)
+
+    def test_variations_bypass_the_response_cache(self):
+        asyncio.run(self.chain.agenerate_variations("A detective in the rain", 2))
+        asyncio.run(self.chain.agenerate_variations("A detective in the rain", 2))
+        self.assertEqual(self.model_calls(), 4)
+        self.assertEqual(self.chain.cache.stats()["hits"], 0)
+
+    def test_refine_uses_core_temperature_and_cache(self):
+        first = asyncio.run(self.chain.arefine_prompt("A detective in the rain", "make it night"))
+        second = asyncio.run(self.chain.arefine_prompt("A detective in the rain", "make it night"))
+        self.assertTrue(first)
+        self.assertEqual(first, second)
+        self.assertEqual(self.model_calls(), 1)
+
+    def test_sync_versions_use_core_temperature(self):
+        self.chain.generate_variations("A detective in the rain", 2)
+        self.assertEqual(self.model_calls(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import json
+import unittest
+from metrics import Histogram, MetricsRegistry, STAGE_METRIC
+
+class TestHistogram(unittest.TestCase):
+    def test_quantiles_interpolate_within_buckets(self):
+        histogram = Histogram((1.0, 2.0, 4.0))
+        for value in (0.5, 1.5, 1.5, 3.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.count, 4)
+        self.assertEqual(histogram.counts, [1, 2, 1, 0])
+        self.assertAlmostEqual(histogram.quantile(0.5), 1.5)
+        self.assertIsNone(Histogram().quantile(0.5))
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.metrics = MetricsRegistry(buckets=(0.1, 1.0))
+
+    def test_span_records_stage_and_status(self):
+        with self.metrics.span("render_template", template="subjects"):
+            pass
+        with self.assertRaises(ValueError):
+            with self.metrics.span("llm_call"):
+                raise ValueError("boom")
+
+        series = {tuple(sorted(s["labels"].items())): s for s in self.metrics.to_dict()[STAGE_METRIC]}
+        self.assertEqual(series[(("stage", "render_template"), ("status", "ok"), ("template", "subjects"))]["count"], 1)
+        self.assertEqual(series[(("stage", "llm_call"), ("status", "error"))]["count"], 1)
+
+    def test_prometheus_output(self):
+        self.metrics.observe("latency_seconds", 0.05, stage="a")
+        self.metrics.observe("latency_seconds", 5.0, stage="a")
+        text = self.metrics.to_prometheus()
+        self.assertIn("# TYPE latency_seconds histogram", text)
+        self.assertIn('latency_seconds_bucket{stage="a",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{stage="a",le="+Inf"} 2', text)
+        self.assertIn('latency_seconds_count{stage="a"} 2', text)
+
+    def test_json_output_and_reset(self):
+        self.metrics.observe("latency_seconds", 0.5)
+        data = json.loads(self.metrics.to_json())
+        self.assertEqual(data["latency_seconds"][0]["buckets"], {"0.1": 0, "1": 1, "+Inf": 1})
+        self.metrics.reset()
+        self.assertEqual(self.metrics.to_dict(), {})
+
+    def test_disabled_registry_records_nothing(self):
+        self.metrics.enabled = False
+        with self.metrics.span("shot"):
+            pass
+        self.assertEqual(self.metrics.to_dict(), {})
+
+if __name__ == '__main__':
+    unittest.main()
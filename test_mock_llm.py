@@ -0,0 +1,72 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import patch
+from mock_llm import MockChatModel, MockRateLimitError, MockServerError
+from request_scheduler import get_retry_after, is_retryable
+
+class TestMockChatModel(unittest.TestCase):
+    def make_model(self, **kwargs):
+        settings = {"latency_ms": 0, "tokens_per_second": 0}
+        settings.update(kwargs)
+        return MockChatModel(**settings)
+
+    def test_replies_are_deterministic(self):
+        first = self.make_model().invoke("Generate a concise prompt based on the following information:").content
+        second = self.make_model().invoke("Generate a concise prompt based on the following information:").content
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, self.make_model(seed=1).invoke("Generate a concise prompt based on the following information:").content)
+
+    def test_multi_length_reply_is_json(self):
+        prompt = 'Respond with only a JSON object using exactly these keys: {"concise": "", "normal": "", "detailed": ""}'
+        reply = json.loads(self.make_model().invoke(prompt).content)
+        self.assertEqual(set(reply), {"concise", "normal", "detailed"})
+        self.assertLess(len(reply["concise"]), len(reply["detailed"]))
+
+    def test_single_variation_reply_is_one_prompt(self):
+        reply = self.make_model().invoke("Generate one variation of the above prompt that keeps its core elements").content
+        self.assertNotIn("\n", reply)
+        self.assertFalse(reply[0].isdigit())
+
+    def test_stream_matches_invoke(self):
+        model = self.make_model()
+
+        async def run():
+            return "".join([chunk.content async for chunk in model.astream("Generate a detailed prompt")])
+
+        self.assertEqual(asyncio.run(run()), model.invoke("Generate a detailed prompt").content)
+
+    def test_injected_errors_look_like_api_errors(self):
+        with self.assertRaises(MockRateLimitError) as raised:
+            self.make_model(rate_limit_error_rate=1.0, retry_after=2.5).invoke("hello")
+        self.assertTrue(is_retryable(raised.exception))
+        self.assertEqual(get_retry_after(raised.exception), 2.5)
+        with self.assertRaises(MockServerError) as raised:
+            self.make_model(server_error_rate=1.0).invoke("hello")
+        self.assertTrue(is_retryable(raised.exception))
+
+    def test_retries_can_succeed(self):
+        model = self.make_model(server_error_rate=0.5)
+        outcomes = set()
+        for _ in range(20):
+            try:
+                model.invoke("same prompt")
+                outcomes.add("ok")
+            except MockServerError:
+                outcomes.add("error")
+        self.assertEqual(outcomes, {"ok", "error"})
+
+    def test_attempt_counters_are_bounded(self):
+        model = self.make_model()
+        with patch("mock_llm.MAX_TRACKED_PROMPTS", 3):
+            for i in range(10):
+                model.invoke(f"prompt {i}")
+        self.assertEqual(len(model._attempts), 3)
+
+    def test_reports_token_usage(self):
+        message = self.make_model().invoke("Generate a normal prompt")
+        self.assertEqual(message.usage_metadata["total_tokens"],
+                         message.usage_metadata["input_tokens"] + message.usage_metadata["output_tokens"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from datetime import datetime, timedelta
+import prompt_log
+from prompt_log import (PromptLogger, iter_logs, load_segment_index, migrate_log_file, read_lines_after,
+                        read_lines_before, read_log_entries, repair_partial_line, rotate_log_file)
+
+class TestPromptLog(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "prompt_log.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, text):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def read(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def test_entries_are_appended_as_lines(self):
+        logger = PromptLogger(self.path)
+        logger.log_prompt({"shot_description": "rain"}, "first")
+        logger.log_prompt({"shot_description": "fog"}, "second", usage={"calls": 1})
+        lines = self.read().splitlines()
+        self.assertEqual([json.loads(line)["generated_prompt"] for line in lines], ["first", "second"])
+        self.assertEqual(logger.get_logs()[1]["usage"], {"calls": 1})
+
+    def test_array_file_is_migrated_once(self):
+        entries = [{"timestamp": "2024-01-01T00:00:00", "inputs": {}, "generated_prompt": str(i)} for i in range(3)]
+        self.write(json.dumps(entries, indent=2))
+        logger = PromptLogger(self.path)
+        self.assertFalse(migrate_log_file(self.path))
+        logger.log_prompt({}, "3")
+        self.assertEqual([e["generated_prompt"] for e in logger.get_logs()], ["0", "1", "2", "3"])
+        self.assertEqual(len(self.read().splitlines()), 4)
+
+    def test_reads_array_with_lines_appended_after_it(self):
+        self.write(json.dumps([{"generated_prompt": "old"}], indent=2) + '\n{"generated_prompt": "new"}\n')
+        self.assertEqual([e["generated_prompt"] for e in read_log_entries(self.path)], ["old", "new"])
+        self.assertTrue(migrate_log_file(self.path))
+        self.assertEqual(self.read(), '{"generated_prompt": "old"}\n{"generated_prompt": "new"}\n')
+
+    def test_incomplete_last_line_is_dropped(self):
+        self.write('{"generated_prompt": "kept"}\n{"generated_prompt": "cut sh')
+        self.assertEqual(read_log_entries(self.path), [{"generated_prompt": "kept"}])
+        self.assertTrue(repair_partial_line(self.path))
+        self.assertEqual(self.read(), '{"generated_prompt": "kept"}\n')
+
+    def test_complete_last_line_gets_its_newline(self):
+        self.write('{"generated_prompt": "a"}\n{"generated_prompt": "b"}')
+        PromptLogger(self.path).log_prompt({}, "c")
+        self.assertEqual([e["generated_prompt"] for e in read_log_entries(self.path)], ["a", "b", "c"])
+
+    def test_missing_file_has_no_logs(self):
+        self.assertEqual(PromptLogger(self.path).get_logs(), [])
+
+class TestLogRotation(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "prompt_log.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_entries(self, day, count):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for i in range(count):
+                f.write(json.dumps({"timestamp": f"2024-01-{day:02d}T{i:02d}:00:00", "generated_prompt": f"{day}-{i}"}) + "\n")
+
+    def test_rotates_by_size_into_indexed_segments(self):
+        logger = PromptLogger(self.path, max_bytes=400)
+        for i in range(12):
+            logger.log_prompt({"i": i}, "prompt " * 5)
+        segments = load_segment_index(self.path)
+        self.assertGreater(len(segments), 1)
+        self.assertTrue(all(os.path.exists(os.path.join(self.tmpdir.name, s["file"])) for s in segments))
+        self.assertEqual([e["inputs"]["i"] for e in logger.get_logs()], list(range(12)))
+
+    def test_time_window_skips_other_segments(self):
+        for day, compression in ((1, "gzip"), (2, "lzma"), (3, "gzip")):
+            self.write_entries(day, 3)
+            rotate_log_file(self.path, compression)
+        self.write_entries(4, 2)
+        segments = load_segment_index(self.path)
+        self.assertEqual([(s["first"], s["last"]) for s in segments][1], ("2024-01-02T00:00:00", "2024-01-02T02:00:00"))
+        # A segment outside the window is never opened, so removing it changes nothing
+        os.remove(os.path.join(self.tmpdir.name, segments[0]["file"]))
+        entries = read_log_entries(self.path, since=datetime(2024, 1, 2, 1), until="2024-01-04T00:00:00")
+        self.assertEqual([e["generated_prompt"] for e in entries], ["2-1", "2-2", "3-0", "3-1", "3-2", "4-0"])
+
+    def test_rotates_old_log_on_startup(self):
+        self.write_entries(1, 2)
+        PromptLogger(self.path, max_age=timedelta(days=1))
+        self.assertEqual(len(load_segment_index(self.path)), 1)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_interrupted_rotation_is_finished(self):
+        self.write_entries(1, 2)
+        os.replace(self.path, f"{self.path}.rotating")
+        logger = PromptLogger(self.path)
+        self.assertFalse(os.path.exists(f"{self.path}.rotating"))
+        self.assertEqual(len(logger.get_logs()), 2)
+        self.assertEqual(load_segment_index(self.path)[0]["entries"], 2)
+
+    def test_startup_rotation_is_deferred(self):
+        self.write_entries(1, 2)
+        deferred = []
+        class QueuedLogger(PromptLogger):
+            def defer(self, task):
+                deferred.append(task)
+        logger = QueuedLogger(self.path, max_age=timedelta(days=1))
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(load_segment_index(self.path), [])
+        for task in deferred:
+            task()
+        self.assertEqual(len(load_segment_index(self.path)), 1)
+        self.assertEqual(len(logger.get_logs()), 2)
+
+class TestIterLogs(unittest.TestCase):
+    def setUp(self):
+        prompt_log._segment_cache.clear()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "prompt_log.json")
+        with open(self.path, "w", encoding="utf-8") as f:
+            for i in range(30):
+                # Pairs of entries share a timestamp, as quick successive writes can
+                f.write(json.dumps({"timestamp": f"2024-01-01T00:{i // 2:02d}:00", "generated_prompt": f"prompt {i}",
+                                    "inputs": {"length": "Concise Prompt" if i % 3 == 0 else "Detailed Prompt"}}) + "\n")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def page_through(self, reverse, **kwargs):
+        seen, cursor = [], None
+        while True:
+            page = list(iter_logs(self.path, start=cursor, limit=7, reverse=reverse, **kwargs))
+            if not page:
+                return seen
+            seen += [int(entry["generated_prompt"].split()[1]) for _, entry in page]
+            cursor = page[-1][0]
+
+    def test_pages_forward_and_backward(self):
+        self.assertEqual(self.page_through(False), list(range(30)))
+        self.assertEqual(self.page_through(True), list(range(29, -1, -1)))
+
+    def test_cursor_survives_rotation(self):
+        page = list(iter_logs(self.path, limit=11))
+        rotate_log_file(self.path)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"timestamp": "2024-01-01T01:00:00", "generated_prompt": "prompt 30"}) + "\n")
+        rest = [entry["generated_prompt"] for _, entry in iter_logs(self.path, start=page[-1][0])]
+        self.assertEqual(rest, [f"prompt {i}" for i in range(11, 31)])
+        older = [entry["generated_prompt"] for _, entry in iter_logs(self.path, start=page[-1][0], limit=3, reverse=True)]
+        self.assertEqual(older, ["prompt 9", "prompt 8", "prompt 7"])
+
+    def test_backward_pages_decode_a_segment_once(self):
+        rotate_log_file(self.path)
+        with patch("prompt_log._decompress_segment", wraps=prompt_log._decompress_segment) as decode:
+            self.assertEqual(self.page_through(True), list(range(29, -1, -1)))
+        self.assertEqual(decode.call_count, 1)
+
+    def test_reading_backwards_leaves_the_segment_cache_alone(self):
+        rotate_log_file(self.path)
+        entries = list(prompt_log.iter_entries_backwards(self.path))
+        self.assertEqual([e["generated_prompt"] for e in entries], [f"prompt {i}" for i in range(29, -1, -1)])
+        self.assertEqual(len(prompt_log._segment_cache), 0)
+
+    def test_filters(self):
+        concise = self.page_through(False, filters={"length": "Concise Prompt"})
+        self.assertEqual(concise, list(range(0, 30, 3)))
+        self.assertEqual(self.page_through(True, filters={"text": "PROMPT 2"}), [29, 28, 27, 26, 25, 24, 23, 22, 21, 20, 2])
+
+class TestTextLogPages(unittest.TestCase):
+    def test_reads_pages_before_and_lines_after(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "app.log")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("".join(f"line {i}\n" for i in range(10)))
+            lines, end = read_lines_before(path, limit=4)
+            self.assertEqual(lines, ["line 9", "line 8", "line 7", "line 6"])
+            lines, _ = read_lines_before(path, end=end, limit=100)
+            self.assertEqual(lines, [f"line {i}" for i in range(5, -1, -1)])
+            tail = os.path.getsize(path)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("line 10\nline 1")
+            lines, tail = read_lines_after(path, tail)
+            self.assertEqual(lines, ["line 10"])
+            self.assertEqual(read_lines_after(path, tail)[0], [])
+
+if __name__ == '__main__':
+    unittest.main()
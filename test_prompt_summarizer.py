@@ -0,0 +1,38 @@
+import unittest
+from prompt_summarizer import WORD_BUDGETS, count_words, split_clauses, summarize_prompt
+
+DETAILED = ("Film noir A weathered detective leaning against a rain-streaked window in a cramped office, just after "
+            "midnight, light rain, rule-of-thirds framing, tense and brooding, dust motes drifting in a shaft of light, "
+            "reflections pooling on wet pavement below the window, a flickering desk lamp casting long shadows. "
+            "The detective holds a crumpled letter; his face half lit by neon from the street. Steam curls from a "
+            "forgotten coffee cup on the desk, and the clock is frozen at quarter past three.")
+
+class TestSummarizePrompt(unittest.TestCase):
+    def test_short_prompt_is_unchanged(self):
+        self.assertEqual(summarize_prompt("A detective  waits in the rain", 20), "A detective waits in the rain")
+
+    def test_respects_word_budgets(self):
+        for budget in WORD_BUDGETS.values():
+            summary = summarize_prompt(DETAILED, budget)
+            self.assertLessEqual(count_words(summary), budget)
+            self.assertGreater(count_words(summary), budget // 2)
+
+    def test_keeps_opening_clause_and_order(self):
+        summary = summarize_prompt(DETAILED, WORD_BUDGETS["concise"])
+        self.assertTrue(summary.startswith("Film noir A weathered detective"))
+        clauses = [clause for _, _, clause in split_clauses(DETAILED)]
+        positions = [clauses.index(clause) for _, _, clause in split_clauses(summary)]
+        self.assertEqual(positions, sorted(positions))
+
+    def test_skips_repeated_clauses(self):
+        text = ("A lighthouse keeper climbing the stairs, a lighthouse keeper climbing stairs, storm clouds gathering "
+                "over the sea, waves crashing on black rocks, a single lamp burning")
+        summary = summarize_prompt(text, 18)
+        self.assertEqual(summary.count("keeper"), 1)
+
+    def test_truncates_long_opening_clause(self):
+        summary = summarize_prompt(" ".join(f"word{i}" for i in range(40)), 10)
+        self.assertEqual(count_words(summary), 10)
+
+if __name__ == '__main__':
+    unittest.main()
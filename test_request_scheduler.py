@@ -0,0 +1,112 @@
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from request_scheduler import RequestScheduler, TokenBucket, get_retry_after, is_retryable
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+class TestTokenBucket(unittest.TestCase):
+    def test_consumes_until_empty_then_reports_wait(self):
+        bucket = TokenBucket(capacity=2, refill_per_second=1)
+        self.assertEqual(bucket.try_consume(1), 0)
+        self.assertEqual(bucket.try_consume(1), 0)
+        self.assertGreater(bucket.try_consume(1), 0)
+
+class TestErrorClassification(unittest.TestCase):
+    def test_retryable_status_codes(self):
+        self.assertTrue(is_retryable(FakeAPIError(429)))
+        self.assertTrue(is_retryable(FakeAPIError(503)))
+        self.assertFalse(is_retryable(FakeAPIError(400)))
+        self.assertFalse(is_retryable(ValueError("bad input")))
+        self.assertTrue(is_retryable(asyncio.TimeoutError()))
+
+    def test_retry_after_header(self):
+        self.assertEqual(get_retry_after(FakeAPIError(429, {"retry-after": "2"})), 2.0)
+        self.assertEqual(get_retry_after(FakeAPIError(429, {"retry-after-ms": "1500"})), 1.5)
+        self.assertIsNone(get_retry_after(FakeAPIError(429)))
+
+class TestRequestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = RequestScheduler(requests_per_minute=6000, tokens_per_minute=10 ** 6,
+                                          max_retries=3, base_delay=0.01, max_delay=0.05)
+
+    def test_retries_transient_errors(self):
+        attempts = []
+
+        async def call():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise FakeAPIError(500)
+            return "ok"
+
+        self.assertEqual(asyncio.run(self.scheduler.run(call)), "ok")
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(self.scheduler.stats()["retries"], 2)
+        self.assertEqual(self.scheduler.stats()["in_flight"], 0)
+
+    def test_does_not_retry_client_errors(self):
+        async def call():
+            raise FakeAPIError(400)
+
+        with self.assertRaises(FakeAPIError):
+            asyncio.run(self.scheduler.run(call))
+        self.assertEqual(self.scheduler.stats()["failures"], 1)
+
+    def test_gives_up_after_max_retries(self):
+        async def call():
+            raise FakeAPIError(429)
+
+        with self.assertRaises(FakeAPIError):
+            asyncio.run(self.scheduler.run(call))
+        self.assertEqual(self.scheduler.stats()["retries"], 3)
+
+    def test_honours_retry_after(self):
+        attempts = []
+
+        def call():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise FakeAPIError(429, {"retry-after": "0.05"})
+            return "ok"
+
+        self.assertEqual(self.scheduler.run_sync(call), "ok")
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.05)
+
+    def test_request_budget_spaces_out_calls(self):
+        # 600 requests per minute refills 10 per second with a burst of 10
+        scheduler = RequestScheduler(requests_per_minute=600, tokens_per_minute=10 ** 6)
+
+        async def call():
+            return time.monotonic()
+
+        async def run_all():
+            return await asyncio.gather(*(scheduler.run(call) for _ in range(12)))
+
+        started = time.monotonic()
+        finished = asyncio.run(run_all())
+        self.assertLess(sorted(finished)[9] - started, 0.05)
+        self.assertGreaterEqual(max(finished) - started, 0.15)
+        self.assertEqual(scheduler.stats()["queue_depth"], 0)
+
+    def test_stream_retries_before_first_item(self):
+        attempts = []
+
+        async def start_stream():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise FakeAPIError(503)
+            for chunk in ("a", "b"):
+                yield chunk
+
+        async def collect():
+            return [chunk async for chunk in self.scheduler.stream(start_stream)]
+
+        self.assertEqual(asyncio.run(collect()), ["a", "b"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import asyncio
+import random
+import unittest
+from scene_pipeline import ScenePipeline, parse_scene_analysis, parse_scene_list, split_script
+
+def make_script(scenes):
+    return "\n\n".join(f"INT. ROOM {i} - NIGHT\n\nSomeone waits in room {i}." for i in range(scenes))
+
+class FakeParser:
+    async def parse_script(self, chunk):
+        await asyncio.sleep(random.uniform(0, 0.003))
+        return [{"description": line} for line in chunk.splitlines() if line.startswith("INT.")]
+
+class FakeAnalyzer:
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.active = 0
+        self.events = []
+
+    async def analyze_scene(self, scene):
+        if scene["description"] == self.fail_on:
+            raise RuntimeError("analysis failed")
+        self.events.append(("analyze", scene["scene_number"]))
+        await asyncio.sleep(random.uniform(0, 0.003))
+        return {"summary": scene["description"]}
+
+class FakeGenerator:
+    def __init__(self, events):
+        self.events = events
+
+    async def generate_prompt(self, analysis, director_style):
+        self.events.append(("generate", analysis["summary"]))
+        await asyncio.sleep(random.uniform(0, 0.003))
+        return f"{director_style.get('name')}: {analysis['summary']}"
+
+class FakeFormatter:
+    def format_row(self, scene, prompt):
+        return f"{scene['description']},{prompt}\n"
+
+def make_pipeline(analyzer=None, **kwargs):
+    analyzer = analyzer or FakeAnalyzer()
+    return ScenePipeline(FakeParser(), analyzer, FakeGenerator(analyzer.events), FakeFormatter(), **kwargs)
+
+async def collect(pipeline, script):
+    return [row async for row in pipeline.run(script, {"name": "Noir"})]
+
+class TestSplitScript(unittest.TestCase):
+    def test_chunks_cover_script_on_scene_headings(self):
+        script = make_script(40)
+        chunks = list(split_script(script, chunk_tokens=50))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), script)
+        self.assertTrue(all(chunk.startswith("INT.") for chunk in chunks))
+
+class TestScenePipeline(unittest.TestCase):
+    def test_rows_come_out_in_script_order(self):
+        pipeline = make_pipeline(chunk_tokens=40, max_in_flight=5)
+        rows = asyncio.run(collect(pipeline, make_script(60)))
+        self.assertEqual([row["scene_number"] for row in rows], list(range(1, 61)))
+        self.assertEqual(rows[0]["prompt"], "Noir: INT. ROOM 0 - NIGHT")
+        self.assertEqual(rows[59]["row"], "INT. ROOM 59 - NIGHT,Noir: INT. ROOM 59 - NIGHT\n")
+
+    def test_in_flight_scenes_stay_bounded(self):
+        pipeline = make_pipeline(chunk_tokens=40, max_in_flight=4)
+        rows = asyncio.run(collect(pipeline, make_script(200)))
+        self.assertEqual(len(rows), 200)
+        self.assertLessEqual(pipeline.last_run_stats["peak_in_flight"], 4)
+
+    def test_stages_overlap(self):
+        analyzer = FakeAnalyzer()
+        asyncio.run(collect(make_pipeline(analyzer, chunk_tokens=40), make_script(30)))
+        first_generate = next(i for i, event in enumerate(analyzer.events) if event[0] == "generate")
+        last_analyze = max(i for i, event in enumerate(analyzer.events) if event[0] == "analyze")
+        self.assertLess(first_generate, last_analyze)
+
+    def test_failed_scene_yields_error_row(self):
+        analyzer = FakeAnalyzer(fail_on="INT. ROOM 3 - NIGHT")
+        rows = asyncio.run(collect(make_pipeline(analyzer), make_script(6)))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[3]["error"], "analysis failed")
+        self.assertIsNone(rows[3]["prompt"])
+        self.assertIsNone(rows[4]["error"])
+
+    def test_crashed_stage_is_raised(self):
+        class BrokenFormatter:
+            def format_row(self, scene, prompt):
+                raise ValueError("bad row")
+
+        pipeline = ScenePipeline(FakeParser(), FakeAnalyzer(), FakeGenerator([]), BrokenFormatter())
+        with self.assertRaises(ValueError):
+            asyncio.run(collect(pipeline, make_script(3)))
+
+class TestStructuring(unittest.TestCase):
+    def test_parse_scene_list_from_labelled_text(self):
+        text = (
+            "Scene 1:\n- Setting: Detective's office, night\n- Characters present: Jack and Lila\n"
+            "- Key actions: Jack reads a letter.\n\n"
+            "Scene 2: Rainy alley\nCharacters: Jack\nKey actions:\n- Jack runs\n- A shot rings out"
+        )
+        scenes = parse_scene_list(text)
+        self.assertEqual(len(scenes), 2)
+        self.assertEqual(scenes[0]["setting"], "Detective's office, night")
+        self.assertEqual(scenes[0]["characters"], ["Jack", "Lila"])
+        self.assertEqual(scenes[1]["setting"], "Rainy alley")
+        self.assertEqual(scenes[1]["actions"], "Jack runs A shot rings out")
+
+    def test_parse_scene_list_from_json(self):
+        scenes = parse_scene_list('```json\n{"scenes": [{"location": "Roof", "characters": ["Ana"], "actions": "Ana jumps"}]}\n```')
+        self.assertEqual(scenes, [{"setting": "Roof", "characters": ["Ana"], "actions": "Ana jumps",
+                                   "description": "Roof - Ana jumps"}])
+
+    def test_parse_scene_analysis(self):
+        text = "Key visual elements:\n- Neon sign\n- Wet pavement\nMood: Tense, lonely\nPotential camera shots: Wide shot, close-up"
+        analysis = parse_scene_analysis(text)
+        self.assertEqual(analysis["visual_elements"], ["Neon sign", "Wet pavement"])
+        self.assertEqual(analysis["mood"], "Tense, lonely")
+        self.assertEqual(analysis["camera_shots"], ["Wide shot", "close-up"])
+        self.assertEqual(analysis["summary"], text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from script_context import ScriptContextSelector, ScriptIndex, count_tokens
+
+def make_script(scenes):
+    blocks = []
+    for i in range(scenes):
+        blocks.append(f"INT. ROOM {i} - NIGHT\n\nFiller action line number {i} describing the room in some detail.")
+    return "\n\n".join(blocks)
+
+class TestScriptIndex(unittest.TestCase):
+    def test_passages_cover_script_in_order(self):
+        script = make_script(50)
+        index = ScriptIndex(script, passage_tokens=40)
+        self.assertGreater(len(index.passages), 1)
+        starts = [p.start for p in index.passages]
+        self.assertEqual(starts, sorted(starts))
+        for passage in index.passages:
+            self.assertEqual(script[passage.start:passage.end], passage.text)
+
+    def test_bm25_ranks_matching_passage_first(self):
+        script = make_script(30) + "\n\nMARGOT stands alone by the lighthouse.\n\n" + make_script(30)
+        index = ScriptIndex(script, passage_tokens=40)
+        best = index.score(["margot", "lighthouse"])[0][1]
+        self.assertIn("MARGOT", index.passages[best].text)
+
+class TestScriptContextSelector(unittest.TestCase):
+    def test_short_script_is_sent_whole(self):
+        script = make_script(2)
+        self.assertEqual(ScriptContextSelector(token_budget=1000).select(script), script)
+
+    def test_selection_stays_within_budget(self):
+        script = make_script(500)
+        selector = ScriptContextSelector(token_budget=200, passage_tokens=40)
+        context = selector.select(script, subjects=[{"name": "Room"}])
+        self.assertLessEqual(count_tokens(context), 220)
+
+    def test_highlight_and_subject_passages_are_included(self):
+        script = (make_script(100) + "\n\nThe ORACLE whispers a warning.\n\n" + make_script(100)
+                  + "\n\nVESPER polishes a silver revolver.\n\n" + make_script(100))
+        selector = ScriptContextSelector(token_budget=300, passage_tokens=40)
+        context = selector.select(script, highlighted_text="The ORACLE whispers a warning.",
+                                  subjects=[{"name": "Vesper"}])
+        self.assertIn("ORACLE whispers", context)
+        self.assertIn("VESPER polishes", context)
+        self.assertIn("...", context)
+
+    def test_index_is_reused_for_unchanged_script(self):
+        script = make_script(200)
+        selector = ScriptContextSelector(token_budget=100)
+        self.assertIs(selector.index_for(script), selector.index_for(script))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import asyncio
+import unittest
+from request_scheduler import RequestScheduler
+from single_flight import SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.single_flight = SingleFlight()
+        self.calls = 0
+
+    async def slow_call(self, value="result"):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return value
+
+    def test_concurrent_identical_requests_share_one_call(self):
+        async def run():
+            return await asyncio.gather(*(self.single_flight.do("key", self.slow_call) for _ in range(5)))
+
+        self.assertEqual(asyncio.run(run()), ["result"] * 5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.single_flight.stats()["shared"], 4)
+        self.assertEqual(self.single_flight.stats()["in_flight"], 0)
+
+    def test_different_keys_run_separately(self):
+        async def run():
+            return await asyncio.gather(
+                self.single_flight.do("a", lambda: self.slow_call("a")),
+                self.single_flight.do("b", lambda: self.slow_call("b"))
+            )
+
+        self.assertEqual(asyncio.run(run()), ["a", "b"])
+        self.assertEqual(self.calls, 2)
+
+    def test_sequential_requests_are_not_shared(self):
+        async def run():
+            await self.single_flight.do("key", self.slow_call)
+            await self.single_flight.do("key", self.slow_call)
+
+        asyncio.run(run())
+        self.assertEqual(self.calls, 2)
+
+    def test_errors_reach_every_waiter(self):
+        async def failing_call():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        async def run():
+            return await asyncio.gather(
+                *(self.single_flight.do("key", failing_call) for _ in range(3)),
+                return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+    def test_cancelled_waiter_does_not_cancel_others(self):
+        async def run():
+            first = asyncio.ensure_future(self.single_flight.do("key", self.slow_call))
+            second = asyncio.ensure_future(self.single_flight.do("key", self.slow_call))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        self.assertEqual(asyncio.run(run()), "result")
+        self.assertEqual(self.calls, 1)
+
+    def test_call_is_cancelled_with_its_last_waiter(self):
+        scheduler = RequestScheduler(requests_per_minute=6000, tokens_per_minute=1_000_000)
+        model_call_cancelled = False
+
+        async def model_call():
+            nonlocal model_call_cancelled
+            try:
+                await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                model_call_cancelled = True
+                raise
+            return "result"
+
+        async def run():
+            waiters = [asyncio.ensure_future(self.single_flight.do("key", lambda: scheduler.run(model_call)))
+                       for _ in range(2)]
+            await asyncio.sleep(0.01)
+            for waiter in waiters:
+                waiter.cancel()
+            await asyncio.sleep(0.1)
+
+        asyncio.run(run())
+        self.assertTrue(model_call_cancelled)
+        self.assertEqual(scheduler.completed, 0)
+        self.assertEqual(self.single_flight.stats()["cancelled"], 1)
+
+    def test_namespaces_do_not_share(self):
+        async def speculative():
+            with self.single_flight.namespace("speculative"):
+                return await self.single_flight.do("key", self.slow_call)
+
+        async def run():
+            return await asyncio.gather(speculative(), self.single_flight.do("key", self.slow_call))
+
+        self.assertEqual(asyncio.run(run()), ["result", "result"])
+        self.assertEqual(self.calls, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import asyncio
+import unittest
+from usage import UsageTracker
+
+class TestUsageTracker(unittest.TestCase):
+    def setUp(self):
+        self.usage = UsageTracker(prices={"gpt-4o": (2.0, 8.0), "gpt-4o-mini": (1.0, 4.0)})
+
+    def test_costs_use_longest_matching_model_prefix(self):
+        self.assertEqual(self.usage.price("gpt-4o-mini-2024-07-18"), (1.0, 4.0))
+        self.assertEqual(self.usage.price("gpt-4o-2024-08-06"), (2.0, 8.0))
+        self.assertEqual(self.usage.cost("unknown-model", 1000, 1000), 0.0)
+        self.assertAlmostEqual(self.usage.cost("gpt-4o", 1_000_000, 500_000), 6.0)
+
+    def test_calls_land_in_session_model_and_open_scopes(self):
+        self.usage.record("gpt-4o", 100, 20)
+        with self.usage.scope() as outer:
+            with self.usage.scope() as inner, self.usage.label("concise"):
+                self.usage.record("gpt-4o", 50, 10)
+            self.usage.record_cached()
+
+        summary = self.usage.summary()
+        self.assertEqual(summary["session"]["input_tokens"], 150)
+        self.assertEqual(summary["by_model"]["gpt-4o"]["calls"], 2)
+        self.assertEqual(outer.total.output_tokens, 10)
+        self.assertEqual(outer.total.cached_calls, 1)
+        self.assertEqual(inner.label_totals("concise")["total_tokens"], 60)
+        self.assertIsNone(inner.label_totals("detailed"))
+
+    def test_scopes_follow_asyncio_tasks(self):
+        batch = self.usage.new_batch()
+
+        async def shot(tokens):
+            await asyncio.sleep(0)
+            self.usage.record("gpt-4o", tokens, 0)
+
+        async def run():
+            with self.usage.scope(batch):
+                await asyncio.gather(shot(10), shot(20))
+            await shot(40)  # Outside the batch
+
+        asyncio.run(run())
+        self.assertEqual(self.usage.summary(batch.name)["input_tokens"], 30)
+        self.assertEqual(self.usage.summary()["session"]["input_tokens"], 70)
+
+    def test_input_fields_and_template_overhead(self):
+        with self.usage.scope() as shot:
+            self.usage.attribute_inputs({"full_script": "x" * 400, "directors_notes": ""}, prompt_text="x" * 480)
+        self.assertEqual(shot.input_fields, {"full_script": 100, "template": 20})
+
+    def test_estimates_are_flagged(self):
+        self.usage.record_estimate("gpt-4o", "a" * 40, "b" * 8)
+        session = self.usage.summary()["session"]
+        self.assertEqual((session["input_tokens"], session["output_tokens"], session["estimated_calls"]), (10, 2, 1))
+
+    def test_speculative_calls_count_at_once_and_move_on_adoption(self):
+        with self.usage.speculative() as abandoned, self.usage.label("detailed"):
+            self.usage.record("gpt-4o", 100, 20)
+        with self.usage.speculative() as adopted, self.usage.label("detailed"):
+            self.usage.record("gpt-4o", 50, 10)
+            self.usage.record_cached()
+            self.usage.attribute_inputs({"directors_notes": "x" * 40})
+        summary = self.usage.summary()
+        self.assertEqual(summary["session"]["calls"], 2)
+        self.assertEqual(summary["speculative"]["input_tokens"], 150)
+
+        with self.usage.scope() as shot:
+            self.usage.adopt(adopted)
+        self.assertEqual(shot.label_totals("detailed")["input_tokens"], 50)
+        self.assertEqual(shot.total.cached_calls, 1)
+        self.assertEqual(shot.input_fields, {"directors_notes": 10})
+        summary = self.usage.summary()
+        self.assertEqual(summary["session"]["input_tokens"], 150)
+        self.assertEqual(summary["speculative"]["input_tokens"], abandoned.total.input_tokens)
+        self.assertEqual(summary["speculative"]["by_label"]["detailed"]["cached_calls"], 0)
+        self.assertEqual(summary["speculative"]["input_tokens_by_field"], {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,10 +7,21 @@ import pyperclip
 from core import PromptForgeCore
 import os
 import asyncio
+import json
 import random
 from styles import predefined_styles
 from functools import partial
 from config import config
+import llm_clients
+from metrics import metrics
+from prompt_log import matches_filters, read_lines_after, read_lines_before
+
+STREAM_LENGTHS = ("concise", "normal", "detailed")
+STREAM_FLUSH_MS = 50  # How often streamed tokens are written to the results pane
+PREFETCH_DEBOUNCE_MS = 800  # How long the inputs must stay unchanged before generating speculatively
+APP_LOG_FILE = "promptforge.log"
+LOG_PAGE_SIZE = 200  # Lines or entries fetched per page in the log window
+LOG_TAIL_MS = 1000  # How often an open log window checks for new entries
 
 class ToolTip:
     def __init__(self, widget, text):
@@ -633,6 +644,154 @@ class PromptCard(ttk.Frame):
         self.master.cards.remove(self)
         self.destroy()
 
+class LogPager(ttk.Frame):
+    """A read-only text view that is filled a page at a time.
+
+    load_older() returns the next older page as a list of text blocks, newest
+    first, and is called when the view is scrolled to the top. load_newer()
+    returns blocks added since the last call, oldest first, and is polled
+    every LOG_TAIL_MS while the view is shown.
+    """
+
+    def __init__(self, master, load_older, load_newer):
+        super().__init__(master)
+        self.load_older = load_older
+        self.load_newer = load_newer
+        self.exhausted = False
+        self.fetch_pending = False
+        self.tail_timer = None
+        self.setup_ui()
+
+    def setup_ui(self):
+        self.text = tk.Text(self, wrap=tk.WORD, state="disabled")
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scroll)
+        self.text.configure(yscrollcommand=self.on_view_changed)
+        self.scrollbar.pack(side="right", fill="y")
+        self.text.pack(side="left", expand=True, fill="both")
+
+    def on_scroll(self, *args):
+        self.text.yview(*args)
+
+    def on_view_changed(self, first, last):
+        self.scrollbar.set(first, last)
+        # Hidden tabs report the whole text as visible, so only a view on screen pulls in older pages
+        if float(first) <= 0.0 and not self.exhausted and not self.fetch_pending and self.text.winfo_ismapped():
+            self.fetch_pending = True
+            self.after_idle(self.fetch_older)
+
+    def reset(self):
+        self.exhausted = False
+        self.set_text(lambda: self.text.delete("1.0", tk.END))
+        self.fetch_older()
+        self.text.see(tk.END)
+
+    def set_text(self, change):
+        self.text.configure(state="normal")
+        change()
+        self.text.configure(state="disabled")
+
+    def fetch_older(self):
+        self.fetch_pending = False
+        if self.exhausted:
+            return
+        blocks = self.load_older()
+        if not blocks:
+            self.exhausted = True
+            return
+        # Keep the line the user was looking at in place while the page is inserted above it
+        top = self.text.index("@0,0")
+        before = int(self.text.index("end-1c").split(".")[0])
+        self.set_text(lambda: self.text.insert("1.0", "".join(f"{block}\n" for block in reversed(blocks))))
+        added = int(self.text.index("end-1c").split(".")[0]) - before
+        self.text.yview(f"{int(top.split('.')[0]) + added}.0")
+
+    def start_tail(self):
+        if self.tail_timer is None:
+            self.tail()
+
+    def stop_tail(self):
+        if self.tail_timer is not None:
+            self.after_cancel(self.tail_timer)
+            self.tail_timer = None
+
+    def tail(self):
+        blocks = self.load_newer()
+        if blocks:
+            at_bottom = self.text.yview()[1] >= 1.0
+            self.set_text(lambda: self.text.insert(tk.END, "".join(f"{block}\n" for block in blocks)))
+            if at_bottom:
+                self.text.see(tk.END)
+        self.tail_timer = self.after(LOG_TAIL_MS, self.tail)
+
+class AppLogSource:
+    # Pages of a plain text log by byte offset: older pages end where the last one began,
+    # new lines are read from where the previous tail stopped
+    def __init__(self, path):
+        self.path = path
+        self.older_end = None
+        self.tail_offset = None
+
+    def reset(self):
+        self.older_end = None
+        self.tail_offset = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def load_older(self):
+        if self.older_end == 0 or not os.path.exists(self.path):
+            return []
+        end = self.tail_offset if self.older_end is None else self.older_end
+        lines, self.older_end = read_lines_before(self.path, end, LOG_PAGE_SIZE)
+        if not lines:
+            self.older_end = 0
+        return lines
+
+    def load_newer(self):
+        if not os.path.exists(self.path):
+            return []
+        lines, self.tail_offset = read_lines_after(self.path, self.tail_offset)
+        return lines
+
+class PromptLogSource:
+    # Pages of the prompt log by cursor, newest page first, with an optional text filter.
+    # The tail follows the last entry read whether or not it matched, so a filter that
+    # matches nothing never makes it re-read the log; the filter only picks what is shown.
+    def __init__(self, core):
+        self.core = core
+        self.filters = {}
+        self.older_cursor = None
+        self.tail_cursor = None
+        self.started = False
+
+    def reset(self, text_filter=""):
+        self.filters = {"text": text_filter}
+        self.older_cursor = None
+        newest = next(iter(self.core.iter_logs(None, 1, reverse=True, flush_timeout=0)), None)
+        self.tail_cursor = newest[0] if newest else None
+        self.started = True
+
+    def load_older(self):
+        if not self.started or self.tail_cursor is None:
+            return []
+        # The first page starts at the tail cursor itself; anything newer arrives through load_newer
+        start = self.older_cursor or self.tail_cursor._replace(count=self.tail_cursor.count + 1)
+        page = list(self.core.iter_logs(start, LOG_PAGE_SIZE, self.filters, reverse=True, flush_timeout=0))
+        if page:
+            self.older_cursor = page[-1][0]
+        return [self.format_entry(entry) for _, entry in page]
+
+    def load_newer(self):
+        if not self.started:
+            return []
+        page = list(self.core.iter_logs(self.tail_cursor, LOG_PAGE_SIZE, flush_timeout=0))
+        if page:
+            self.tail_cursor = page[-1][0]
+        return [self.format_entry(entry) for _, entry in page if matches_filters(entry, self.filters)]
+
+    @staticmethod
+    def format_entry(entry):
+        inputs = entry.get("inputs") or {}
+        header = f"[{entry.get('timestamp', '')}] {inputs.get('length', '')}: {inputs.get('shot_description', '')}"
+        return f"{header}\n{entry.get('generated_prompt', '')}\n"
+
 class PageToPromptUI:
     def __init__(self, master):
         self.master = master
@@ -927,7 +1086,10 @@ class PageToPromptUI:
             messagebox.showerror("Unexpected Error", f"An unexpected error occurred: {str(e)}\n\nPlease report this to the developer.")
 
     def generate_button_click(self):
-        asyncio.create_task(self.handle_generate_button_click())
+        # Ignore repeat clicks while a generation is still running
+        if self.generate_task is not None and not self.generate_task.done():
+            return
+        self.generate_task = asyncio.create_task(self.handle_generate_button_click())
 
     def add_prompt_to_timeline(self):
         selected_text = self.get_selected_sentence()
@@ -1023,59 +1185,174 @@ class PageToPromptUI:
         self.add_to_timeline_button = ttk.Button(button_frame, text="➕ Add to Timeline", command=self.add_prompt_to_timeline)
         self.add_to_timeline_button.pack(side="left", padx=2)
 
-    async def handle_generate_button_click(self):
-        try:
-            # Get input values
-            shot_description = self.shot_text.get("1.0", tk.END).strip()
-            style_prefix = self.style_prefix_entry.get().strip()
-            style_suffix = self.style_suffix_entry.get().strip()
-            directors_notes = self.notes_text.get("1.0", tk.END).strip()
-            stick_to_script = self.stick_to_script_var.get()
-            script = self.script_text.get("1.0", tk.END).strip() if stick_to_script else ""
-            end_parameters = self.end_parameters_entry.get()
-
-            style = f"{style_prefix}{style_suffix}"
+        self.refine_button = ttk.Button(button_frame, text="✏️ Refine", command=self.refine_prompt)
+        self.refine_button.pack(side="left", padx=2)
 
-            # Generate prompts
-            prompts = await self.core.generate_prompt(
-                style=style,
-                highlighted_text="",
-                shot_description=shot_description,
-                directors_notes=directors_notes,
-                script=script,
-                stick_to_script=stick_to_script,
-                end_parameters=end_parameters
-            )
+        self.variations_button = ttk.Button(button_frame, text="🔀 Variations", command=self.generate_variations)
+        self.variations_button.pack(side="left", padx=2)
 
-            # Display generated prompts
-            self.results_text.delete("1.0", tk.END)
-            for length, prompt in prompts.items():
-                self.results_text.insert(tk.END, f"{length}:\n{prompt}\n\n")
-
-            # Apply tags for bold text
-            self.results_text.tag_configure("bold", font=("Courier", 10, "bold"))
-            for tag in self.results_text.tag_names():
-                if tag != "sel":
-                    self.results_text.tag_delete(tag)
-
-            start = "1.0"
-            while True:
-                start = self.results_text.search(r'\*\*', start, tk.END, regexp=True)
-                if not start:
-                    break
-                end = self.results_text.search(r'\*\*', f"{start}+2c", tk.END, regexp=True)
-                if not end:
-                    break
-                self.results_text.delete(start, f"{start}+2c")
-                self.results_text.delete(f"{end}-2c", end)
-                self.results_text.tag_add("bold", start, end)
-                start = end
+    async def handle_generate_button_click(self):
+        try:
+            inputs = self.collect_generation_inputs()
+
+            prompts = await self.take_prefetched_prompts(inputs)
+            if prompts is None:
+                # Generate prompts, showing model output as it streams in
+                self.begin_stream_display()
+                try:
+                    prompts = await self.core.generate_prompt(**inputs, on_chunk=self.queue_stream_chunk)
+                finally:
+                    self.end_stream_display()
+
+            with metrics.span("ui_render"):
+                # Display generated prompts
+                self.results_text.delete("1.0", tk.END)
+                for length, prompt in prompts.items():
+                    self.results_text.insert(tk.END, f"{length}:\n{prompt}\n\n")
+
+                # Apply tags for bold text
+                self.results_text.tag_configure("bold", font=("Courier", 10, "bold"))
+                for tag in self.results_text.tag_names():
+                    if tag != "sel":
+                        self.results_text.tag_delete(tag)
+
+                start = "1.0"
+                while True:
+                    start = self.results_text.search(r'\*\*', start, tk.END, regexp=True)
+                    if not start:
+                        break
+                    end = self.results_text.search(r'\*\*', f"{start}+2c", tk.END, regexp=True)
+                    if not end:
+                        break
+                    self.results_text.delete(start, f"{start}+2c")
+                    self.results_text.delete(f"{end}-2c", end)
+                    self.results_text.tag_add("bold", start, end)
+                    start = end
 
         except ValueError as ve:
             messagebox.showerror("Input Error", str(ve))
         except Exception as e:
             messagebox.showerror("Unexpected Error", f"An unexpected error occurred: {str(e)}\n\nPlease report this to the developer.")
 
+    def collect_generation_inputs(self):
+        stick_to_script = self.stick_to_script_var.get()
+        return {
+            "style": f"{self.style_prefix_entry.get().strip()}{self.style_suffix_entry.get().strip()}",
+            # The script selection anchors which passages are sent with stick-to-script prompts
+            "highlighted_text": self.get_selected_sentence() or "",
+            "shot_description": self.shot_text.get("1.0", tk.END).strip(),
+            "directors_notes": self.notes_text.get("1.0", tk.END).strip(),
+            "script": self.script_text.get("1.0", tk.END).strip() if stick_to_script else "",
+            "stick_to_script": stick_to_script,
+            "end_parameters": self.end_parameters_entry.get()
+        }
+
+    def generation_key(self, inputs):
+        # inputs include the script selection. Active subjects feed the prompt too,
+        # so a speculative result is only reusable if they match as well
+        subjects = [(s.get("name"), s.get("description")) for s in self.core.subjects if s.get("active", False)]
+        return json.dumps([inputs, subjects], sort_keys=True)
+
+    def bind_prefetch_triggers(self):
+        for widget in (self.shot_text, self.notes_text, self.script_text, self.style_prefix_entry,
+                       self.style_suffix_entry, self.end_parameters_entry):
+            widget.bind("<KeyRelease>", self.on_inputs_changed, "+")
+        self.style_combo.bind("<<ComboboxSelected>>", self.on_inputs_changed, "+")
+        self.stick_to_script_var.trace_add("write", lambda *args: self.on_inputs_changed())
+
+    def on_inputs_changed(self, event=None):
+        # Debounced like on_script_selection; a speculative run for older inputs is cancelled at once
+        if self.prefetch_timer is not None:
+            self.master.after_cancel(self.prefetch_timer)
+        if self.prefetch_key is not None and self.prefetch_key != self.generation_key(self.collect_generation_inputs()):
+            self.cancel_prefetch()
+        self.prefetch_timer = self.master.after(PREFETCH_DEBOUNCE_MS, self.start_prefetch)
+
+    def start_prefetch(self):
+        self.prefetch_timer = None
+        if self.generate_task is not None and not self.generate_task.done():
+            return
+        inputs = self.collect_generation_inputs()
+        if not inputs["shot_description"]:
+            return
+        key = self.generation_key(inputs)
+        if key == self.prefetch_key:
+            return
+        self.cancel_prefetch()
+        self.prefetch_key = key
+        self.prefetch_task = asyncio.create_task(self.core.prefetch_prompt(**inputs))
+        self.prefetch_task.add_done_callback(self.on_prefetch_done)
+
+    def on_prefetch_done(self, task):
+        # Retrieve the exception so a failed speculative run is not reported as unhandled
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error in speculative prompt generation: {str(task.exception())}")
+
+    def cancel_prefetch(self):
+        if self.prefetch_task is not None and not self.prefetch_task.done():
+            self.prefetch_task.cancel()
+        self.prefetch_task = None
+        self.prefetch_key = None
+
+    async def take_prefetched_prompts(self, inputs):
+        # Returns the in-flight or finished speculative result for these inputs, or None to generate afresh
+        if self.prefetch_timer is not None:
+            self.master.after_cancel(self.prefetch_timer)
+            self.prefetch_timer = None
+        task, key = self.prefetch_task, self.prefetch_key
+        self.prefetch_task = None
+        self.prefetch_key = None
+        if task is None or key != self.generation_key(inputs):
+            if task is not None:
+                task.cancel()
+            return None
+        try:
+            prefetched = await task
+        except asyncio.CancelledError:
+            if task.cancelled():
+                return None
+            raise
+        except Exception:
+            return None
+        # Only now is the speculative run logged and its usage moved out of "speculative"
+        return self.core.adopt_prefetched(prefetched)
+
+    def begin_stream_display(self):
+        # Lay out one section per length and park a mark where each stream appends
+        self.results_text.delete("1.0", tk.END)
+        self.pending_chunks = []
+        for line, length in enumerate(STREAM_LENGTHS):
+            self.results_text.insert(tk.END, f"{length.capitalize()} Prompt:\n\n\n")
+            mark = f"stream_{length}"
+            self.results_text.mark_set(mark, f"{line * 3 + 2}.0")
+            self.results_text.mark_gravity(mark, tk.RIGHT)
+
+    def queue_stream_chunk(self, length, chunk):
+        # Chunks are batched and written once per UI tick rather than per token
+        self.pending_chunks.append((length, chunk))
+        if self.stream_flush_timer is None:
+            self.stream_flush_timer = self.master.after(STREAM_FLUSH_MS, self.flush_stream_chunks)
+
+    def flush_stream_chunks(self):
+        self.stream_flush_timer = None
+        if not self.pending_chunks:
+            return
+        batched = {}
+        for length, chunk in self.pending_chunks:
+            batched.setdefault(length, []).append(chunk)
+        self.pending_chunks = []
+        for length, chunks in batched.items():
+            self.results_text.insert(f"stream_{length}", "".join(chunks))
+        self.results_text.see(tk.END)
+
+    def end_stream_display(self):
+        if self.stream_flush_timer is not None:
+            self.master.after_cancel(self.stream_flush_timer)
+            self.stream_flush_timer = None
+        self.pending_chunks = []
+        for length in STREAM_LENGTHS:
+            self.results_text.mark_unset(f"stream_{length}")
+
     def save_prompt(self):
         prompt = self.results_text.get("1.0", tk.END).strip()
         if prompt:
@@ -1098,6 +1375,48 @@ class PageToPromptUI:
         else:
             messagebox.showwarning("Empty Prompt", "There is no prompt to save.")
 
+    def selected_result_text(self):
+        # The selected part of the results, or all of them if nothing is selected
+        try:
+            return self.results_text.get(tk.SEL_FIRST, tk.SEL_LAST).strip()
+        except tk.TclError:
+            return self.results_text.get("1.0", tk.END).strip()
+
+    def refine_prompt(self):
+        prompt = self.selected_result_text()
+        if not prompt:
+            messagebox.showwarning("Empty Prompt", "There is no prompt to refine.")
+            return
+        feedback = simpledialog.askstring("Refine Prompt", "What should change?", parent=self.master)
+        if feedback:
+            asyncio.create_task(self.async_refine_prompt(prompt, feedback))
+
+    async def async_refine_prompt(self, prompt, feedback):
+        try:
+            refined = await self.core.refine_prompt(prompt, feedback)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to refine prompt: {str(e)}")
+            return
+        self.results_text.insert(tk.END, f"\nRefined Prompt:\n{refined}\n")
+        self.results_text.see(tk.END)
+
+    def generate_variations(self):
+        prompt = self.selected_result_text()
+        if not prompt:
+            messagebox.showwarning("Empty Prompt", "There is no prompt to vary.")
+            return
+        asyncio.create_task(self.async_generate_variations(prompt))
+
+    async def async_generate_variations(self, prompt):
+        try:
+            variations = await self.core.generate_variations(prompt)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to generate variations: {str(e)}")
+            return
+        for i, variation in enumerate(variations, 1):
+            self.results_text.insert(tk.END, f"\nVariation {i}:\n{variation}\n")
+        self.results_text.see(tk.END)
+
     def copy_prompt_to_clipboard(self):
         prompt = self.results_text.get("1.0", tk.END).strip()
         pyperclip.copy(prompt)
@@ -1129,24 +1448,54 @@ class PageToPromptUI:
         self.all_prompts_window.lift()
 
     def show_logs(self):
-        log_window = tk.Toplevel(self.master)
-        log_window.title("Application Logs")
-        log_window.geometry("800x600")
-
-        log_text = scrolledtext.ScrolledText(log_window, wrap=tk.WORD)
-        log_text.pack(expand=True, fill="both", padx=10, pady=10)
-
-        # Read the log file and display its contents
-        try:
-            with open("promptforge.log", "r") as log_file:
-                log_content = log_file.read()
-                log_text.insert(tk.END, log_content)
-        except FileNotFoundError:
-            log_text.insert(tk.END, "Log file not found.")
-        except Exception as e:
-            log_text.insert(tk.END, f"Error reading log file: {str(e)}")
+        # The window is hidden rather than destroyed on close, so reopening it only tails what is new
+        if self.log_window is not None and self.log_window.winfo_exists():
+            self.log_window.deiconify()
+            for pager in self.log_pagers:
+                pager.start_tail()
+            self.log_window.lift()
+            return
 
-        log_window.lift()
+        self.log_window = tk.Toplevel(self.master)
+        self.log_window.title("Application Logs")
+        self.log_window.geometry("800x600")
+        self.log_window.protocol("WM_DELETE_WINDOW", self.hide_logs)
+
+        notebook = ttk.Notebook(self.log_window)
+        notebook.pack(expand=True, fill="both", padx=10, pady=10)
+
+        app_source = AppLogSource(APP_LOG_FILE)
+        app_pager = LogPager(notebook, app_source.load_older, app_source.load_newer)
+        notebook.add(app_pager, text="Application Log")
+
+        prompt_source = PromptLogSource(self.core)
+        prompt_frame = ttk.Frame(notebook)
+        filter_frame = ttk.Frame(prompt_frame)
+        filter_frame.pack(fill="x", pady=(0, 5))
+        ttk.Label(filter_frame, text="Filter:").pack(side="left")
+        filter_entry = ttk.Entry(filter_frame)
+        filter_entry.pack(side="left", expand=True, fill="x", padx=5)
+        prompt_pager = LogPager(prompt_frame, prompt_source.load_older, prompt_source.load_newer)
+        prompt_pager.pack(expand=True, fill="both")
+        notebook.add(prompt_frame, text="Prompt Log")
+
+        def apply_filter(event=None):
+            prompt_source.reset(filter_entry.get().strip())
+            prompt_pager.reset()
+        filter_entry.bind("<Return>", apply_filter)
+
+        app_source.reset()
+        app_pager.reset()
+        apply_filter()
+        self.log_pagers = [app_pager, prompt_pager]
+        for pager in self.log_pagers:
+            pager.start_tail()
+        self.log_window.lift()
+
+    def hide_logs(self):
+        for pager in self.log_pagers:
+            pager.stop_tail()
+        self.log_window.withdraw()
 
     # Removed update_model_list method as it's no longer needed
 
@@ -1154,6 +1503,7 @@ class PageToPromptUI:
         api_key = self.api_key_entry.get()
         if api_key:
             os.environ["OPENAI_API_KEY"] = api_key
+            llm_clients.registry.clear()  # Core, MetaChain and StyleHandler look clients up per use, so they get the new key
             messagebox.showinfo("Success", "API Key saved successfully!")
         else:
             messagebox.showerror("Error", "Please enter an API Key")
@@ -1269,8 +1619,17 @@ class PageToPromptUI:
         self.setup_ui()
         self.all_prompts_window = None
         self.all_prompts_text = None
+        self.log_window = None
+        self.log_pagers = []
         self.script_selection = None
         self.selection_timer = None
+        self.pending_chunks = []
+        self.stream_flush_timer = None
+        self.generate_task = None
+        self.prefetch_timer = None
+        self.prefetch_task = None
+        self.prefetch_key = None
+        self.bind_prefetch_triggers()
 
     def on_script_selection(self, event):
         if self.selection_timer is not None:
@@ -1279,10 +1638,14 @@ class PageToPromptUI:
 
     def handle_script_selection(self):
         try:
+            previous = self.script_selection
             if self.script_text.tag_ranges(tk.SEL):
                 self.script_selection = (self.script_text.index(tk.SEL_FIRST), self.script_text.index(tk.SEL_LAST))
             else:
                 self.script_selection = None
+            if self.script_selection != previous:
+                # The selection is a generation input, so a prefetch made for the old one is stale
+                self.on_inputs_changed()
         except Exception as e:
             print(f"Error in handle_script_selection: {str(e)}")
 
@@ -1301,9 +1664,7 @@ class PageToPromptUI:
     def generate_random_style(self):
         prefix = self.style_prefix_entry.get().strip()
         if prefix:
-            suffix = self.core.generate_style_details(prefix)
-            self.style_suffix_entry.delete(0, tk.END)
-            self.style_suffix_entry.insert(0, suffix)
+            asyncio.create_task(self.async_generate_style_details(prefix))
         else:
             messagebox.showerror("Error", "Please enter a style prefix first.")
 
@@ -1322,12 +1683,19 @@ class PageToPromptUI:
         prefix = self.style_prefix_entry.get()
         if prefix:
             # Call the AI model to generate detailed visual descriptors
-            suffix = self.core.generate_style_details(prefix)
-            self.style_suffix_entry.delete(0, tk.END)
-            self.style_suffix_entry.insert(0, suffix)
+            asyncio.create_task(self.async_generate_style_details(prefix))
         else:
             messagebox.showerror("Error", "Please enter a style prefix first.")
 
+    async def async_generate_style_details(self, prefix):
+        try:
+            suffix = await self.core.generate_style_details(prefix)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to generate style details: {str(e)}")
+            return
+        self.style_suffix_entry.delete(0, tk.END)
+        self.style_suffix_entry.insert(0, suffix)
+
 
     def maintain_selection(self, event):
         if event.widget == self.script_text:
@@ -1408,6 +1776,7 @@ def main():
     app = PageToPromptUI(root, PromptForgeCore())
     root.protocol("WM_DELETE_WINDOW", root.quit)  # Ensure the program closes properly
     root.mainloop()
+    app.core.close()
 
 if __name__ == "__main__":
     main()
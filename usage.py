@@ -0,0 +1,203 @@
+# usage.py
+
+import contextvars
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from script_context import count_tokens
+
+# USD per million tokens as (input, output); model names match on the longest prefix
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4": (30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 1.50)
+}
+
+class UsageTotals:
+    def __init__(self):
+        self.calls = 0
+        self.cached_calls = 0
+        self.estimated_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost_usd = 0.0
+
+    def add(self, input_tokens: int, output_tokens: int, cost_usd: float, estimated: bool = False) -> None:
+        self.calls += 1
+        self.estimated_calls += estimated
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.cost_usd += cost_usd
+
+    def merge(self, other: "UsageTotals", sign: int = 1) -> None:
+        # Adds other's counts, or takes them away with sign=-1
+        self.calls += sign * other.calls
+        self.cached_calls += sign * other.cached_calls
+        self.estimated_calls += sign * other.estimated_calls
+        self.input_tokens += sign * other.input_tokens
+        self.output_tokens += sign * other.output_tokens
+        self.cost_usd += sign * other.cost_usd
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "cached_calls": self.cached_calls,
+            "estimated_calls": self.estimated_calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.input_tokens + self.output_tokens,
+            "cost_usd": round(self.cost_usd, 6)
+        }
+
+class UsageScope:
+    """Usage collected while a shot, batch or other unit of work was running, split by label."""
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.total = UsageTotals()
+        self.by_label: Dict[str, UsageTotals] = {}
+        self.input_fields: Dict[str, int] = {}
+
+    def merge(self, other: "UsageScope", sign: int = 1) -> None:
+        self.total.merge(other.total, sign)
+        for label, totals in other.by_label.items():
+            self.by_label.setdefault(label, UsageTotals()).merge(totals, sign)
+        for name, size in other.input_fields.items():
+            self.input_fields[name] = self.input_fields.get(name, 0) + sign * size
+            if not self.input_fields[name]:
+                del self.input_fields[name]
+
+    def label_totals(self, label: Optional[str]) -> Optional[Dict[str, Any]]:
+        totals = self.by_label.get(label)
+        return totals.to_dict() if totals else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **self.total.to_dict(),
+            "by_label": {label: totals.to_dict() for label, totals in sorted(self.by_label.items())},
+            "input_tokens_by_field": dict(sorted(self.input_fields.items()))
+        }
+
+_scopes: contextvars.ContextVar[Tuple[UsageScope, ...]] = contextvars.ContextVar("usage_scopes", default=())
+_label: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("usage_label", default=None)
+
+class UsageTracker:
+    """Token and cost accounting for every model call in the process.
+
+    Calls are reported by the model callback in llm_clients. Each call is
+    added to the session totals, to its model and label, and to every scope
+    open in the calling context. Scopes follow asyncio tasks, so a batch
+    scope opened around a shot also sees the calls of that shot's subtasks.
+    """
+
+    def __init__(self, prices: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.prices = dict(MODEL_PRICES if prices is None else prices)
+        self._lock = threading.Lock()
+        self._batch_ids = itertools.count(1)
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.session = UsageScope("session")
+            self.by_model: Dict[str, UsageTotals] = {}
+            self.batches: Dict[str, UsageScope] = {}
+            # Speculative work that has not been used (yet); it is in the session totals all the same
+            self.unused_speculative = UsageScope("speculative")
+
+    def price(self, model: str) -> Tuple[float, float]:
+        matches = [name for name in self.prices if model.startswith(name)]
+        return self.prices[max(matches, key=len)] if matches else (0.0, 0.0)
+
+    def cost(self, model: str, input_tokens: int, output_tokens: int) -> float:
+        input_price, output_price = self.price(model)
+        return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+    @contextmanager
+    def scope(self, collector: Optional[UsageScope] = None) -> Iterator[UsageScope]:
+        collector = collector or UsageScope()
+        token = _scopes.set(_scopes.get() + (collector,))
+        try:
+            yield collector
+        finally:
+            _scopes.reset(token)
+
+    @contextmanager
+    def label(self, name: str) -> Iterator[None]:
+        # Names the calls made inside the block, e.g. the prompt length or template
+        token = _label.set(name)
+        try:
+            yield
+        finally:
+            _label.reset(token)
+
+    @contextmanager
+    def speculative(self) -> Iterator[UsageScope]:
+        # Calls inside the block are counted at once, in the session and under "speculative",
+        # and collected in the yielded scope; pass it to adopt() if the result gets used
+        with self.scope(self.unused_speculative), self.scope() as run:
+            yield run
+
+    def adopt(self, run: UsageScope) -> None:
+        # Moves a speculative run's usage from "speculative" to the scopes open in the calling context
+        with self._lock:
+            self.unused_speculative.merge(run, -1)
+            for target in _scopes.get():
+                target.merge(run)
+
+    def new_batch(self) -> UsageScope:
+        with self._lock:
+            batch = UsageScope(f"batch-{next(self._batch_ids)}")
+            self.batches[batch.name] = batch
+            return batch
+
+    def _targets(self) -> Tuple[UsageScope, ...]:
+        return (self.session,) + _scopes.get()
+
+    def record(self, model: str, input_tokens: int, output_tokens: int, estimated: bool = False) -> None:
+        cost = self.cost(model, input_tokens, output_tokens)
+        label = _label.get()
+        with self._lock:
+            self.by_model.setdefault(model, UsageTotals()).add(input_tokens, output_tokens, cost, estimated)
+            for target in self._targets():
+                target.total.add(input_tokens, output_tokens, cost, estimated)
+                if label:
+                    target.by_label.setdefault(label, UsageTotals()).add(input_tokens, output_tokens, cost, estimated)
+
+    def record_estimate(self, model: str, prompt_text: str, completion_text: str) -> None:
+        self.record(model, count_tokens(prompt_text), count_tokens(completion_text), estimated=True)
+
+    def record_cached(self) -> None:
+        label = _label.get()
+        with self._lock:
+            for target in self._targets():
+                target.total.cached_calls += 1
+                if label:
+                    target.by_label.setdefault(label, UsageTotals()).cached_calls += 1
+
+    def attribute_inputs(self, fields: Dict[str, str], prompt_text: Optional[str] = None) -> None:
+        # Approximate input tokens contributed by each prompt field for a call sent to the model;
+        # whatever the fields do not account for in prompt_text is the template's own wording
+        sizes = {name: count_tokens(value) for name, value in fields.items() if value}
+        if prompt_text is not None:
+            sizes["template"] = max(0, count_tokens(prompt_text) - sum(sizes.values()))
+        with self._lock:
+            for target in self._targets():
+                for name, size in sizes.items():
+                    target.input_fields[name] = target.input_fields.get(name, 0) + size
+
+    def summary(self, batch_id: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            if batch_id is not None:
+                return self.batches[batch_id].to_dict()
+            return {
+                "session": self.session.to_dict(),
+                "by_model": {model: totals.to_dict() for model, totals in sorted(self.by_model.items())},
+                "speculative": self.unused_speculative.to_dict(),
+                "batches": {name: batch.to_dict() for name, batch in self.batches.items()}
+            }
+
+usage = UsageTracker()